@@ -0,0 +1,113 @@
+"""
+Compare the latency of the "did you mean" lookup of database.fuzzy with the query it replaced,
+which OR-ed every trigram of the query and ranked all the names sharing any of them.
+
+    python benchmarks/bench_fuzzy.py --sizes 100000 1000000 3000000
+
+Median of 20 lookups of a name with one typo, SQLite 3.40.1:
+
+      names   OR every trigram   rarest trigrams (cold / cached counts)   same best match
+     100000            47.5ms        10.6ms /  6.5ms                           20/20
+    1000000           346.3ms        44.4ms / 20.2ms                           18/20
+    3000000          1459.0ms       103.0ms / 14.9ms                           19/20
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import insert, text
+
+from bounty_hunter_mw2.database.fuzzy import doc_counts, find_suggestions, rank, trigrams
+from bounty_hunter_mw2.database.models import ActivisionName, Base, make_engine
+
+
+SYLLABLES = [
+    "sn", "ip", "er", "god", "dark", "shadow", "killer", "pro", "xx", "the", "ghost", "wolf", "fire",
+    "ice", "king", "lord", "snip", "ace", "ninja", "beast", "toxic", "rage", "hunt", "viper", "storm",
+    "blade", "dead", "eye", "x", "z", "q", "lo", "rd", "mr", "lil"
+]
+
+OR_ALL_QUERY = text(
+    """
+    SELECT activision_name.name_key, activision_name.display, activision_name.occurrences
+    FROM activision_name_trigram
+    JOIN activision_name ON activision_name.id = activision_name_trigram.rowid
+    WHERE activision_name_trigram MATCH :match
+    ORDER BY rank
+    LIMIT 50
+    """
+)
+
+
+def make_names(count: int, rng: random.Random) -> list:
+    names = set()
+    while len(names) < count:
+        names.add(
+            "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+            + "".join(rng.choices("0123456789", k=rng.randint(0, 4)))
+        )
+    return sorted(names)
+
+
+def typo(name: str, rng: random.Random) -> str:
+    i = rng.randrange(len(name))
+    return name[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz0123456789") + name[i + 1:]
+
+
+async def seed(engine, names: list, chunk: int = 50000) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    for offset in range(0, len(names), chunk):
+        async with engine.begin() as conn:
+            await conn.execute(insert(ActivisionName), [
+                {"name_key": name, "display": name, "occurrences": 1}
+                for name in names[offset:offset + chunk]
+            ])
+
+
+async def timed(call) -> tuple:
+    started = time.perf_counter()
+    result = await call()
+    return (time.perf_counter() - started) * 1000, result
+
+
+async def main(args) -> None:
+    rng = random.Random(0)
+    for size in args.sizes:
+        names = make_names(size, rng)
+        queries = [typo(rng.choice(names), rng) for _ in range(args.queries)]
+        with tempfile.TemporaryDirectory() as directory:
+            engine = make_engine(f"sqlite+aiosqlite:///{os.path.join(directory, 'bench.db')}")
+            await seed(engine, names)
+            old, cold, warm, best, same = [], [], [], 0, 0
+            async with engine.connect() as conn:
+                doc_counts.clear()
+                for key in queries:
+                    match = " OR ".join(f'"{gram}"' for gram in sorted(trigrams(key)))
+                    elapsed, rows = await timed(lambda: conn.execute(OR_ALL_QUERY, {"match": match}))
+                    old.append(elapsed)
+                    expected = [s.score for s in rank(key, rows.all(), 5, 0.2)]
+                    elapsed, found = await timed(lambda: find_suggestions(conn, key))
+                    cold.append(elapsed)
+                    best += [s.score for s in found[:1]] == expected[:1]
+                    same += [s.score for s in found] >= expected
+                for key in queries:
+                    elapsed, _ = await timed(lambda: find_suggestions(conn, key))
+                    warm.append(elapsed)
+            print(
+                f"{size:>9} names  OR every trigram {statistics.median(old):8.2f}ms  "
+                f"rarest trigrams {statistics.median(cold):7.2f}ms cold, {statistics.median(warm):7.2f}ms cached counts  "
+                f"same best match {best}/{len(queries)}, top 5 as good {same}/{len(queries)}"
+            )
+            await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--queries", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,103 @@
+"""
+Compare the previous logging setup (a new Formatter per record, synchronous handlers)
+with helpers.logger.setup_logging: records formatted per second, and how long the
+event loop stalls while a burst of records is logged.
+
+    python benchmarks/bench_logging.py --records 50000
+"""
+import argparse
+import asyncio
+import io
+import logging
+import os
+import tempfile
+import time
+
+from bounty_hunter_mw2.helpers.logger import LoggingFormatter, setup_logging
+
+
+class PreviousLoggingFormatter(LoggingFormatter):
+    def format(self, record):
+        log_color = self.COLORS[record.levelno]
+        format = "(black){asctime}(reset) (levelcolor){levelname:<8}(reset) (green){name}(reset) {message}"
+        format = format.replace("(black)", self.black + self.bold)
+        format = format.replace("(reset)", self.reset)
+        format = format.replace("(levelcolor)", log_color)
+        format = format.replace("(green)", self.green + self.bold)
+        formatter = logging.Formatter(format, "%Y-%m-%d %H:%M:%S", style="{")
+        return formatter.format(record)
+
+
+def format_rate(formatter: logging.Formatter, records: int) -> float:
+    record = logging.LogRecord("discord_bot", logging.INFO, __file__, 1, "Executed %s command", ("ping",), None)
+    started = time.perf_counter()
+    for _ in range(records):
+        formatter.format(record)
+    return records / (time.perf_counter() - started)
+
+
+async def stall(logger: logging.Logger, records: int, burst: int = 100) -> tuple:
+    """
+    Log records in bursts from a task while a ticker measures how late the loop wakes it up.
+    """
+    lags = []
+    done = False
+
+    async def ticker():
+        while not done:
+            expected = time.perf_counter() + 0.001
+            await asyncio.sleep(0.001)
+            lags.append(max(time.perf_counter() - expected, 0.0))
+
+    async def producer():
+        nonlocal done
+        for i in range(0, records, burst):
+            for j in range(burst):
+                logger.info("Executed %s command by user %d", "ping", i + j)
+            await asyncio.sleep(0)
+        done = True
+
+    started = time.perf_counter()
+    await asyncio.gather(ticker(), producer())
+    elapsed = time.perf_counter() - started
+    lags.sort()
+    return records / elapsed, lags[len(lags) // 2] * 1000, lags[int(len(lags) * 0.99)] * 1000, lags[-1] * 1000
+
+
+def previous_logger(directory: str) -> logging.Logger:
+    logger = logging.getLogger("bench_previous")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    console = logging.StreamHandler(io.StringIO())
+    console.setFormatter(PreviousLoggingFormatter())
+    file_handler = logging.FileHandler(os.path.join(directory, "previous.log"), encoding="utf-8", mode="w")
+    file_handler.setFormatter(logging.Formatter("[{asctime}] [{levelname:<8}] {name}: {message}", "%Y-%m-%d %H:%M:%S", style="{"))
+    logger.addHandler(console)
+    logger.addHandler(file_handler)
+    return logger
+
+
+def main(args) -> None:
+    print(f"format previous: {format_rate(PreviousLoggingFormatter(), args.records):12.0f} records/s")
+    print(f"format current:  {format_rate(LoggingFormatter(), args.records):12.0f} records/s")
+
+    with tempfile.TemporaryDirectory() as directory:
+        logger = previous_logger(directory)
+        rate, p50, p99, worst = asyncio.run(stall(logger, args.records))
+        print(f"previous pipeline: {rate:10.0f} records/s  loop lag p50 {p50:.3f}ms p99 {p99:.3f}ms max {worst:.3f}ms")
+
+        logger = logging.getLogger("bench_current")
+        logger.propagate = False
+        listener = setup_logging(logger, filename=os.path.join(directory, "current.log"))
+        for handler in listener.handlers:
+            if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler):
+                handler.setStream(io.StringIO())
+        rate, p50, p99, worst = asyncio.run(stall(logger, args.records))
+        listener.stop()
+        print(f"queued pipeline:   {rate:10.0f} records/s  loop lag p50 {p50:.3f}ms p99 {p99:.3f}ms max {worst:.3f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=50000)
+    main(parser.parse_args())
@@ -0,0 +1,44 @@
+"""
+Measure the per-command overhead of the metrics hooks: starting the timer, marking the
+check and invoke phases, three database statements and one send, and recording the outcome.
+
+    python benchmarks/bench_metrics.py --commands 200000
+"""
+import argparse
+import asyncio
+import time
+
+from bounty_hunter_mw2.helpers.metrics import current_timings, metrics
+
+
+def one_command(guild_id: int) -> None:
+    timings = metrics.start_command()
+    timings.checks_done()
+    for _ in range(3):
+        started = time.perf_counter()
+        timings = current_timings.get()
+        timings.db += time.perf_counter() - started
+    started = time.perf_counter()
+    current_timings.get().send += time.perf_counter() - started
+    timings.invoke_done()
+    metrics.finish_command("ping", guild_id, "success", timings)
+
+
+async def main(args) -> None:
+    for i in range(1000):
+        one_command(i % 50)
+    started = time.perf_counter()
+    for i in range(args.commands):
+        one_command(i % 50)
+    elapsed = time.perf_counter() - started
+    print(f"{elapsed / args.commands * 1e6:.2f}us per command over {args.commands} commands")
+
+    started = time.perf_counter()
+    body = metrics.render_prometheus()
+    print(f"rendered {len(body.splitlines())} metric lines in {(time.perf_counter() - started) * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--commands", type=int, default=200000)
+    asyncio.run(main(parser.parse_args()))
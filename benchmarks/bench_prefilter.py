@@ -0,0 +1,71 @@
+"""
+Replay a synthetic channel stream through on_message with and without the command prefilter.
+Without it every message gets a Context built and its prefix resolved, as bot.process_commands does.
+
+    python benchmarks/bench_prefilter.py --messages 200000 --command-ratio 0.01
+"""
+import argparse
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+import discord
+from discord.ext import commands
+
+from bounty_hunter_mw2.helpers.prefilter import CommandPrefilter
+
+
+BOT_ID = 1000
+WORDS = ["gg", "who", "camping", "again", "lol", "that", "guy", "was", "cheating", "for", "sure", "nice", "shot"]
+
+
+def make_stream(count: int, command_ratio: float, prefix: str) -> list:
+    rng = random.Random(7)
+    stream = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < command_ratio / 2:
+            content = f"{prefix}ping"
+        elif roll < command_ratio:
+            content = f"<@{BOT_ID}> ping"
+        else:
+            content = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 12)))
+        author = SimpleNamespace(id=2000 + i % 500, bot=False)
+        stream.append(SimpleNamespace(content=content, author=author, guild=None, channel=None, _state=None))
+    return stream
+
+
+async def replay(bot: commands.Bot, stream: list, prefilter) -> tuple:
+    found = 0
+    started = time.perf_counter()
+    for message in stream:
+        if prefilter is not None and not prefilter.matches(message.content):
+            continue
+        context = await bot.get_context(message)
+        found += context.command is not None
+    return time.perf_counter() - started, found
+
+
+async def main(args) -> None:
+    bot = commands.Bot(command_prefix=commands.when_mentioned_or(args.prefix), intents=discord.Intents.default())
+    bot._connection.user = SimpleNamespace(id=BOT_ID)
+
+    @bot.command()
+    async def ping(context):
+        pass
+
+    stream = make_stream(args.messages, args.command_ratio, args.prefix)
+    prefilter = CommandPrefilter([args.prefix])
+    prefilter.set_user(BOT_ID)
+    for name, active in (("process_commands", None), ("prefilter", prefilter)):
+        elapsed, found = await replay(bot, stream, active)
+        print(f"{name:<17} {len(stream) / elapsed:>12,.0f} messages/s, {found} commands found")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--command-ratio", type=float, default=0.01)
+    parser.add_argument("--prefix", default="!")
+    asyncio.run(main(parser.parse_args()))
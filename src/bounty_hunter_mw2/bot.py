@@ -1,242 +1,439 @@
 import asyncio
 import json
 import logging
+import multiprocessing
 import os
 import platform
 import random
+import signal
 import sys
+import time
+from typing import Dict, List, Optional
 
 
 import discord
 from discord.ext import commands, tasks
-from discord.ext.commands import Bot, Context
-
-import bounty_hunter_mw2.exceptions
-from bounty_hunter_mw2.models import Base, BotUser, Report, engine, AioSession, init_db
+from discord.ext.commands import AutoShardedBot, Bot, Context
+
+from bounty_hunter_mw2 import cluster, exceptions
+from bounty_hunter_mw2.database.models import Base, BotUser, Report, engine, AioSession, init_db
+from bounty_hunter_mw2.config import Config
+from bounty_hunter_mw2.helpers import db_manager
+from bounty_hunter_mw2.helpers.dispatcher import OutboundDispatcher, channel_transport
+from bounty_hunter_mw2.helpers.help import help_cache
+from bounty_hunter_mw2.helpers.http import http_client
+from bounty_hunter_mw2.helpers.guild_settings import guild_prefix, guild_settings
+from bounty_hunter_mw2.helpers.command_sync import sync_if_changed
+from bounty_hunter_mw2.helpers.cog_loader import CogInfo, load_waves, scan_cogs, warm_imports
+from bounty_hunter_mw2.helpers.logger import setup_logging
+from bounty_hunter_mw2.helpers.members import member_cache, member_cache_flags
+from bounty_hunter_mw2.helpers.metrics import MetricsContext, instrument_engine, metrics, start_metrics_server
+from bounty_hunter_mw2.helpers.prefilter import CommandPrefilter
+from bounty_hunter_mw2.helpers.watchdog import LoopWatchdog
 
 
 
 cog_path = f"{os.path.realpath(os.path.dirname(__file__))}/cogs"
-config = Config.todict()
+config = Config.to_dict()
 
 intents = discord.Intents.default()
 intents.members = True
 intents.message_content = True
 
-
-bot = Bot(
-    command_prefix=commands.when_mentioned_or(config['prefix']),
-    intents=intents,
-    help_command=None
-)
-
-
-class LoggingFormatter(logging.Formatter):
-    black="\x1b[30m"
-    red = "\x1b[31m"
-    green = "\x1b[32m"
-    yellow = "\x1b[33m"
-    blue = "\x1b[34m"
-    gray = "\x1b[38m"
-
-    reset = "\x1b[0m"
-    bold = "\x1b[1m"
-
-    COLORS = {
-        logging.DEBUG: gray + bold,
-        logging.INFO: blue + bold,
-        logging.WARNING: yellow + bold,
-        logging.ERROR: red,
-        logging.CRITICAL: red + bold
-    }
-
-    def format(self, record):
-        log_color = self.COLORS[record.levelno]
-        format = "(black){asctime}(reset) (levelcolor){levelname:<8}(reset) (green){name}(reset) {message}"
-        format = format.replace("(black)", self.black + self.bold)
-        format = format.replace("(reset)", self.reset)
-        format = format.replace("(levelcolor)", log_color)
-        format = format.replace("(green)", self.green + self.bold)
-        formatter = logging.Formatter(format, "%Y-%m-%d %H:%M:%S", style="{")
-        return formatter.format(record)
-
-
 logger = logging.getLogger("discord_bot")
-logger.setLevel(logging.INFO)
-
-
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(LoggingFormatter())
-
-file_handler = logging.FileHandler(
-    filename="discord.log",
-    encoding="utf-8",
-    mode="w"
-)
-file_handler_formatter = logging.Formatter(
-    "[{asctime}] [{levelname:<8}] {name}: {message}",
-    "%Y-%m-%d %H:%M:%S",
-    style="{"
-)
-file_handler.setFormatter(file_handler_formatter)
-
 
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
-bot.logger = logger
 
-
-async def setup_db():
-    await init_db()
-
-
-bot.config = config
-
-
-@bot.event
-async def on_ready() -> None:
+class BountyHunterBot(Bot):
     """
-    The code in this event is called when the bot is ready.
+    The bot of one process. Nothing is built when this module is imported, run_bot() builds
+    it with the cluster and shard settings of the process, see create_bot().
     """
-    bot.logger.info(f"Logged in as {bot.user.name}.")
-    bot.logger.info(f"discord.py API version: {discord.__version__}")
-    bot.logger.info(f"Python version: {platform.python_version()}")
-    bot.logger.info(
-        f"Running on: {platform.system()} {platform.release()} ({os.name})"
-    )
-    bot.logger.info("-------------")
-    status_task.start()
-    if config['sync_commands_globally']:
-        bot.logger.info("Syncing commands globally.")
-        await bot.tree.sync()
-
-
-@tasks.loop(minutes=1.0)
-async def status_task() -> None:
-    """
-    Setup the game status of the bot.
-    """
-    statuses = [
-        "chillin",
-        "camping",
-        "grinding"
-    ]
-    await bot.change_presence(activity=discord.Game(random.choice(statuses)))
+    def __init__(self, *, cluster_id: int = 0, heartbeats: Optional[multiprocessing.Queue] = None, **options):
+        super().__init__(
+            command_prefix=guild_prefix(guild_settings),
+            intents=intents,
+            help_command=None,
+            member_cache_flags=member_cache_flags(config['member_cache']),
+            chunk_guilds_at_startup=config['chunk_guilds_at_startup'],
+            max_ratelimit_timeout=config['max_ratelimit_timeout'],
+            **options
+        )
+        self.config = config
+        self.logger = logger
+        # Only the first process of a cluster runs the database maintenance tasks.
+        self.cluster_id = cluster_id
+        self.heartbeats = heartbeats
+        self.prefilter = CommandPrefilter([config['prefix']])
+        # Notifications to many channels go through the dispatcher instead of channel.send.
+        self.dispatcher = OutboundDispatcher(channel_transport(self))
+        self.watchdog = LoopWatchdog(
+            logger,
+            interval=config['loop_lag_interval'],
+            threshold=config['loop_lag_threshold']
+        )
+        # Cogs whose prefix commands are rarely used, they are loaded on their first invocation.
+        self.deferred_cogs: Dict[str, CogInfo] = {}
+        self.closing = False
+        self.close_task: Optional[asyncio.Task] = None
+        metrics.add_collector(self.dispatcher.render_prometheus)
+        metrics.add_collector(self.watchdog.render_prometheus)
+        self.add_check(self.start_command_timer, call_once=True)
+        self.before_invoke(self.checks_done)
+        self.after_invoke(self.invoke_done)
+
+    async def get_context(self, origin, /, *, cls=MetricsContext):
+        return await super().get_context(origin, cls=cls)
+
+    async def setup_db(self) -> None:
+        await init_db()
+        instrument_engine(engine)
+        await db_manager.blacklist_cache.load()
+        self.logger.info(f"Loaded {len(db_manager.blacklist_cache)} blacklisted users into the cache")
+
+    async def setup_hook(self) -> None:
+        """
+        The code in this event is called once, before the bot connects to Discord.
+        """
+        self.watchdog.start()
+        self.prefilter.set_user(self.user.id)
+        # discord.py only closes the bot cleanly on SIGINT. SIGTERM, sent by Cluster.stop and by
+        # service managers, would end the process with the queued writes lost.
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self.close_soon)
+        except NotImplementedError:
+            pass
+        await self.setup_db()
+        await self.load_cogs()
+        if config['metrics_port']:
+            port = config['metrics_port'] + self.cluster_id
+            self.metrics_server = await start_metrics_server(config['metrics_host'], port)
+            self.logger.info(f"Serving metrics on http://{config['metrics_host']}:{port}/metrics")
+        if self.heartbeats is not None:
+            self.heartbeat_task = asyncio.create_task(cluster.send_heartbeats(self, self.cluster_id, self.heartbeats))
+
+    def close_soon(self) -> None:
+        if self.close_task is None:
+            self.close_task = asyncio.create_task(self.close())
+
+    async def close(self) -> None:
+        """
+        Send the queued notifications, commit the queued database writes and release the
+        shared resources, then disconnect. Runs for the shutdown command, on SIGINT and
+        SIGTERM and when run() returns.
+        """
+        if not self.closing:
+            self.closing = True
+            await self.dispatcher.drain()
+            self.watchdog.stop()
+            await http_client.close()
+            await db_manager.shutdown()
+        await super().close()
+
+    async def on_ready(self) -> None:
+        """
+        The code in this event is called when the bot is ready.
+        """
+        self.logger.info(f"Logged in as {self.user.name}.")
+        self.logger.info(f"discord.py API version: {discord.__version__}")
+        self.logger.info(f"Python version: {platform.python_version()}")
+        self.logger.info(
+            f"Running on: {platform.system()} {platform.release()} ({os.name})"
+        )
+        self.logger.info("-------------")
+        if not self.status_task.is_running():
+            self.status_task.start()
+        # on_ready runs again after every reconnect, the sync is skipped unless the commands changed.
+        # In a cluster the first process syncs for all of them.
+        if config['sync_commands_globally'] and self.cluster_id == 0:
+            if await sync_if_changed(self.tree):
+                self.logger.info("Synced commands globally.")
+            else:
+                self.logger.info("Commands have not changed since the last global sync, skipped it.")
+
+    @tasks.loop(minutes=1.0)
+    async def status_task(self) -> None:
+        """
+        Setup the game status of the bot.
+        """
+        statuses = [
+            "chillin",
+            "camping",
+            "grinding"
+        ]
+        await self.change_presence(activity=discord.Game(random.choice(statuses)))
+
+    async def on_message(self, message: discord.Message) -> None:
+        """
+        Executed when a message is sent
+
+        :param message: The message that was sent.
+        """
+        if message.author == self.user or message.author.bot:
+            return
+        if isinstance(message.author, discord.Member):
+            member_cache.touch(message.author)
+        if not self.prefilter.matches(message.content):
+            return
+        await self.process_commands(message)
+
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent) -> None:
+        """
+        Executed when a member leaves a guild, whether or not it is in the member cache.
+
+        :param payload: The guild ID and the user that left.
+        """
+        member_cache.forget(payload.guild_id, payload.user.id)
+
+    async def start_command_timer(self, context: Context) -> bool:
+        """
+        Start timing the command, this is the first check that runs for every command.
+        """
+        context.timings = metrics.start_command()
+        return True
+
+    async def checks_done(self, context: Context) -> None:
+        timings = getattr(context, "timings", None)
+        if timings is not None:
+            timings.checks_done()
+
+    async def invoke_done(self, context: Context) -> None:
+        timings = getattr(context, "timings", None)
+        if timings is not None:
+            timings.invoke_done()
+
+    async def on_command_completion(self, context: Context) -> None:
+        """
+        Executed when a command is successfully executed.
+
+        :param context: The context of the command.
+        """
+        metrics.finish_command(
+            context.command.qualified_name,
+            context.guild.id if context.guild is not None else None,
+            "success",
+            getattr(context, "timings", None)
+        )
+        full_command_name = context.command.qualified_name
+        split = full_command_name.split(" ")
+        executed_command = str(split[0])
+        if context.guild is not None:
+            self.logger.info(
+                f"Executed {executed_command} command in {context.guild.name} (ID: {context.guild.id}) by {context.author} (ID: {context.author.id})"
+            )
+        else:
+            self.logger.info(
+                f"Executed {executed_command} command by {context.author} (ID: {context.author.id})"
+            )
+
+    async def on_command_error(self, context: Context, error) -> None:
+        """
+        Executed when an error is caught on a command.
+
+        :param context: The context of the command
+        :param error: The error that was raised
+        """
+        if context.command is not None:
+            metrics.finish_command(
+                context.command.qualified_name,
+                context.guild.id if context.guild is not None else None,
+                type(error).__name__,
+                getattr(context, "timings", None)
+            )
+
+        if isinstance(error, commands.CommandNotFound):
+            if context.invoked_with and await self.load_deferred_cog(context.invoked_with):
+                context.command = self.get_command(context.invoked_with)
+                if context.command is not None:
+                    await self.invoke(context)
+            return
+
+        elif isinstance(error, commands.CommandOnCooldown):
+            minutes, seconds = divmod(error.retry_after, 60)
+            hours, minutes = divmod(minutes, 60)
+            hours = hours % 24
+            embed = discord.Embed(
+                description=f"**Please slow down** - You can use this command again in {f'{round(hours)} hours' if round(hours) > 0 else ''} {f'{round(minutes)} minutes' if round(minutes) > 0 else ''} {f'{round(seconds)} seconds' if round(seconds) > 0 else ''}",
+                color=0xE02B2B
+            )
+            if isinstance(error, exceptions.RateLimited):
+                embed.set_footer(
+                    text=f"The {error.scope} limit of {error.capacity} uses per {error.per:g} seconds is used up"
+                )
+            await context.send(embed=embed)
+
+        elif isinstance(error, exceptions.UserBlacklisted):
+            embed = discord.Embed(
+                description="You are blacklisted from using the bot!",
+                color=0xE02B2B
+            )
+            await context.send(embed=embed)
+            self.logger.warning(
+                f"{context.author} (ID: {context.author.id}) tried to execute a command in guild {context.guild.name} (ID: {context.guild.id}), but the user is blacklisted."
+            )
+
+        elif isinstance(error, exceptions.UserNotOwner):
+            embed = discord.Embed(
+                description="You are not the owner of the bot!",
+                color=0xE02B2B
+            )
+            await context.send(embed=embed)
+            self.logger.warning(
+                f"{context.author} (ID: {context.author.id}) tried to execute an owner command in {context.guild.name} (ID: {context.guild.id})"
+            )
+
+        elif isinstance(error, commands.MissingPermissions):
+            embed = discord.Embed(
+                description="You are missing the permission(s) `" + ", ".join(error.missing_permissions) + "` to execute this command.",
+                color=0xE02B2B
+            )
+            await context.send(embed=embed)
+
+        elif isinstance(error, commands.BotMissingPermissions):
+            embed = discord.Embed(
+                description="I am missing the permission(s) `" + ", ".join(error.missing_permissions) + "` to execute this command.",
+                color=0xE02B2B
+            )
+            await context.send(embed=embed)
+
+        elif isinstance(error, commands.MissingRequiredArgument):
+            embed = discord.Embed(
+                title="Error!",
+                description=str(error).capitalize(),
+                color=0xE02B2B
+            )
+            await context.send(embed=embed)
+
+        else:
+            raise error
+
+    async def load_cog(self, info: CogInfo) -> None:
+        """
+        Load one extension and log how long importing its dependencies and loading it took.
+
+        :param info: The scanned cog file.
+        """
+        started = time.perf_counter()
+        try:
+            # The dependencies are imported in a thread, concurrently with the other cogs of the wave.
+            # The cog module itself is only executed by load_extension, on the event loop.
+            await asyncio.to_thread(warm_imports, info.imports)
+            imported = time.perf_counter()
+            await self.load_extension(f"cogs.{info.name}")
+            loaded = time.perf_counter()
+            help_cache.invalidate()
+            self.logger.info(
+                f"Loaded extension '{info.name}' (dependencies {(imported - started) * 1000:.1f}ms, "
+                f"module and setup {(loaded - imported) * 1000:.1f}ms)"
+            )
+        except Exception as e:
+            exception = f"{type(e).__name__}: {e}"
+            self.logger.error(f"Failed to load extension '{info.name}'\n{exception}")
+
+    async def load_cogs(self) -> None:
+        """
+        The code in this function is executed when the bot starts.
+        Cogs are loaded concurrently in waves, each wave after the cogs its members list in their
+        REQUIRES constant. Deferred cogs are only loaded once one of their commands is used.
+        """
+        started = time.perf_counter()
+        cogs = scan_cogs(cog_path)
+        for name in config['deferred_cogs']:
+            if name not in cogs or any(name in info.requires for info in cogs.values()):
+                continue
+            if cogs[name].app_commands:
+                # Its slash commands would be missing from the tree when it is synced, and be deregistered.
+                self.logger.warning(f"Not deferring extension '{name}', it has slash commands")
+                continue
+            self.deferred_cogs[name] = cogs.pop(name)
+
+        for wave in load_waves(cogs):
+            await asyncio.gather(*(self.load_cog(cogs[extension]) for extension in wave))
+        self.logger.info(
+            f"Loaded {len(cogs)} extensions in {(time.perf_counter() - started) * 1000:.1f}ms, deferred {', '.join(self.deferred_cogs) or 'none'}"
+        )
 
+    async def load_deferred_cog(self, command_name: str) -> bool:
+        """
+        Load the deferred cog providing a command, if there is one.
 
-@bot.event
-async def on_message(message: discord.Message) -> None:
-    """
-    Executed when a message is sent
-    
-    :param message: The message that was sent.
-    """
-    if message.author == bot.user or message.author.bot:
-        return
-    await bot.process_commands(message)
+        :param command_name: The name the command was invoked with.
+        :return: True if a cog was loaded.
+        """
+        for name, info in list(self.deferred_cogs.items()):
+            if command_name in info.commands:
+                del self.deferred_cogs[name]
+                await self.load_cog(info)
+                return True
+        return False
 
 
-@bot.event
-async def on_command_completion(context: Context) -> None:
+class ShardedBountyHunterBot(BountyHunterBot, AutoShardedBot):
     """
-    Executed when a command is successfully executed.
-
-    :param context: The context of the command.
+    The bot of one process that runs several shards.
     """
-    full_command_name = context.command.qualified_name
-    split = full_command_name.split(" ")
-    executed_command = str(split[0])
-    if context.guild is not None:
-        bot.logger.info(
-            f"Executed {executed_command} command in {context.guild.name} (ID: {context.guild.id}) by {context.author} (ID: {context.author.id})"
-        )
-    else:
-        bot.logger.info(
-            f"Executed {executed_command} command by {context.author} (ID: {context.author.id})"
-        )
 
 
-@bot.event
-async def on_command_error(context: Context, error) -> None:
+def create_bot(
+    *,
+    cluster_id: int = 0,
+    shard_ids: Optional[List[int]] = None,
+    shard_count: int = 0,
+    heartbeats: Optional[multiprocessing.Queue] = None
+) -> BountyHunterBot:
     """
-    Executed when an error is caught on a command.
+    Build the bot for the shards run by this process.
 
-    :param context: The context of the command
-    :param error: The error that was raised
+    :param cluster_id: The index of this process in a cluster, only process 0 runs the maintenance tasks.
+    :param shard_ids: The shards this process connects, all of them when empty.
+    :param shard_count: The total number of shards, 0 runs the bot unsharded.
+    :param heartbeats: The queue the shard statuses are sent to the cluster launcher through.
     """
-    if isinstance(error, commands.CommandOnCooldown):
-        minutes, seconds = divmod(error.retry_after, 60)
-        hours, minutes = dibmod(minutes, 60)
-        hours = hours % 24
-        embed = discord.Embed(
-            description=f"**Please slow down** - You can use this command again in {f'{round(hours)} hours' if round(hours) > 0 else ''} {f'{round(minutes)} minutes' if round(minutes) > 0 else ''} {f'{round(seconds)} seconds' if round(seconds) > 0 else ''}",
-            color=0xE02B2B
-        )
-        await context.send(embed=embed)
-    
-    elif isinstance(error, exceptions.UserBlacklisted):
-        embed = discord.Embed(
-            description="You are blacklisted from using the bot!",
-            color=0xE02B2B
-        )
-        await context.send(embed=embed)
-        bot.logger.warning(
-            f"{context.author} (ID: {context.author.id}) tried to execute a command in guild {context.guild.name} (ID: {context.guild.id}), but the user is blacklisted."
-        )
-
-    elif isinstance(error, exceptions.UserNotOwner):
-        embed = discord.Embed(
-            description="You are not the owner of the bot!",
-            color=0xE02B2B
-        )
-        await context.send(embed=embed)
-        bot.logger.warning(
-            f"{context.author} (ID: {context.author.id}) tried to execute an owner command in {context.guild.name} (ID: {context.guild.id})"
-        )
-
-    elif isinstance(error, commands.MissingPermissions):
-        embed = discord.Embed(
-            description="You are missing the permission(s) `" + ", ".join(error.missing_permissions) + "` to execute this command.",
-            color=0xE02B2B
-        )
-        await context.send(embed=embed)
-        
-    elif isinstance(error, commands.BotMissingPermissions):
-        embed = discord.Embed(
-            description="I am missing the permission(s) `" + ", ".join(error.missing_permissions) + "` to execute this command.",
-            color=0xE02B2B
-        )
-        await context.send(embed=embed)
-
-    elif isinstance(error, commands.MissingRequiredArgument):
-        embed = discord.Embed(
-            title="Error!",
-            description=str(error).capitalize(),
-            color=0xE02B2B
-        )
-        await context.send(embed=embed)
-
-    else:
-        raise error
+    member_cache.members.maxsize = config['member_lru_size']
+    if not shard_count:
+        return BountyHunterBot(cluster_id=cluster_id, heartbeats=heartbeats)
+    return ShardedBountyHunterBot(
+        cluster_id=cluster_id,
+        heartbeats=heartbeats,
+        shard_count=shard_count,
+        shard_ids=shard_ids or None
+    )
 
 
-async def load_cogs() -> None:
+def run_bot(
+    *,
+    cluster_id: int = 0,
+    shard_ids: Optional[List[int]] = None,
+    shard_count: int = 0,
+    heartbeats: Optional[multiprocessing.Queue] = None
+) -> None:
     """
-    The code in this function is executed when the bot starts.
+    Set up logging, then build the bot and run it in this process until it closes.
+    Takes the same arguments as create_bot().
     """
-    for file in os.listdir(cog_path):
-        if file.endswith(".py"):
-            extension = file[:-3]
-            try:
-                await bot.load_extension(f"cogs.{extension}")
-                bot.logger.info(f"Loaded extension '{extension}'")
-            except Exception as e:
-                exception = f"{type(e).__name__}: {e}"
-                bot.logger.error(f"Failed to load extension '{extension}'\n{exception}")
-
+    log_listener = setup_logging(
+        logger,
+        filename=config['log_file'] if heartbeats is None else f"cluster-{cluster_id}-{config['log_file']}",
+        max_bytes=config['log_max_bytes'],
+        backup_count=config['log_backup_count'],
+        json_lines=config['log_json']
+    )
+    try:
+        create_bot(
+            cluster_id=cluster_id,
+            shard_ids=shard_ids,
+            shard_count=shard_count,
+            heartbeats=heartbeats
+        ).run(config['token'])
+    finally:
+        log_listener.stop()
 
 
 def start():
-    asyncio.run(load_cogs())
-    bot.run(config['token'])
-
+    if config['cluster_processes'] > 1:
+        cluster.launch(config['token'], config['cluster_processes'], config['shard_count'])
+        return
+    run_bot(
+        cluster_id=config['cluster_id'],
+        shard_ids=config['shard_ids'],
+        shard_count=config['shard_count']
+    )
@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from typing import Callable, Dict, List, NamedTuple
+
+import aiohttp
+
+
+HEARTBEAT_INTERVAL = 15.0
+HEARTBEAT_TIMEOUT = 90.0
+RESTART_BACKOFF = 5.0
+
+logger = logging.getLogger("discord_bot")
+
+
+class ShardStatus(NamedTuple):
+    shard_id: int
+    latency: float
+    closed: bool
+    guilds: int
+
+
+class Heartbeat(NamedTuple):
+    cluster_id: int
+    pid: int
+    shards: List[ShardStatus]
+    sent_at: float
+
+
+def shard_ranges(shard_count: int, processes: int) -> List[List[int]]:
+    """
+    Split the shards into contiguous, evenly sized ranges, one per process.
+
+    :param shard_count: The total number of shards.
+    :param processes: The number of worker processes, capped at shard_count.
+    """
+    processes = max(1, min(processes, shard_count))
+    size, extra = divmod(shard_count, processes)
+    ranges = []
+    start = 0
+    for cluster_id in range(processes):
+        end = start + size + (1 if cluster_id < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+async def recommended_shard_count(token: str) -> int:
+    """
+    Ask Discord how many shards the bot should use.
+    """
+    async with aiohttp.ClientSession() as session:
+        async with session.get(
+            "https://discord.com/api/v10/gateway/bot",
+            headers={"Authorization": f"Bot {token}"}
+        ) as response:
+            response.raise_for_status()
+            data = await response.json()
+    return int(data["shards"])
+
+
+def shard_statuses(bot) -> List[ShardStatus]:
+    """
+    Collect the latency and state of every shard run by this process.
+    """
+    guilds: Dict[int, int] = {}
+    for guild in bot.guilds:
+        guilds[guild.shard_id] = guilds.get(guild.shard_id, 0) + 1
+    return [
+        ShardStatus(shard_id, shard.latency, shard.is_closed(), guilds.get(shard_id, 0))
+        for shard_id, shard in sorted(bot.shards.items())
+    ]
+
+
+async def send_heartbeats(
+    bot,
+    cluster_id: int,
+    heartbeats: multiprocessing.Queue,
+    interval: float = HEARTBEAT_INTERVAL
+) -> None:
+    """
+    Report the shard statuses of this worker to the launcher until the bot closes.
+    """
+    while not bot.is_closed():
+        heartbeats.put(Heartbeat(cluster_id, os.getpid(), shard_statuses(bot), time.time()))
+        await asyncio.sleep(interval)
+
+
+def run_worker(cluster_id: int, shard_ids: List[int], shard_count: int, heartbeats: multiprocessing.Queue) -> None:
+    """
+    The entry point of a worker process, runs the bot for a range of shards.
+
+    The settings of the worker are passed to the bot as arguments. A spawned worker runs the
+    launcher's __main__ first, so Config has already read the launcher's environment by now.
+    """
+    from bounty_hunter_mw2 import bot
+    bot.run_bot(cluster_id=cluster_id, shard_ids=shard_ids, shard_count=shard_count, heartbeats=heartbeats)
+
+
+class Cluster(object):
+    """
+    Runs the bot's shards across several worker processes, restarting any worker that
+    exits or stops sending heartbeats.
+    """
+    def __init__(
+        self,
+        shard_count: int,
+        processes: int,
+        *,
+        target: Callable = run_worker,
+        heartbeat_timeout: float = HEARTBEAT_TIMEOUT,
+        restart_backoff: float = RESTART_BACKOFF,
+        start_method: str = "spawn"
+    ):
+        self.shard_count = shard_count
+        self.ranges = shard_ranges(shard_count, processes)
+        self.target = target
+        self.heartbeat_timeout = heartbeat_timeout
+        self.restart_backoff = restart_backoff
+        self.context = multiprocessing.get_context(start_method)
+        self.heartbeats = self.context.Queue()
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self.started_at: Dict[int, float] = {}
+        self.last_heartbeat: Dict[int, Heartbeat] = {}
+        self.restarts: Dict[int, int] = {cluster_id: 0 for cluster_id in range(len(self.ranges))}
+
+    def spawn(self, cluster_id: int) -> None:
+        process = self.context.Process(
+            target=self.target,
+            args=(cluster_id, self.ranges[cluster_id], self.shard_count, self.heartbeats),
+            name=f"cluster-{cluster_id}",
+            daemon=True
+        )
+        process.start()
+        self.processes[cluster_id] = process
+        self.started_at[cluster_id] = time.time()
+        self.last_heartbeat.pop(cluster_id, None)
+        logger.info(f"Started cluster {cluster_id} (pid {process.pid}) with shards {self.ranges[cluster_id]}")
+
+    def start(self) -> None:
+        for cluster_id in range(len(self.ranges)):
+            self.spawn(cluster_id)
+
+    def is_stale(self, cluster_id: int, now: float) -> bool:
+        heartbeat = self.last_heartbeat.get(cluster_id)
+        last_seen = heartbeat.sent_at if heartbeat is not None else self.started_at[cluster_id]
+        return now - last_seen > self.heartbeat_timeout
+
+    def restart(self, cluster_id: int, reason: str) -> None:
+        process = self.processes[cluster_id]
+        logger.warning(f"Restarting cluster {cluster_id} (pid {process.pid}): {reason}")
+        if process.is_alive():
+            process.terminate()
+        process.join(5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        self.restarts[cluster_id] += 1
+        self.spawn(cluster_id)
+
+    def poll(self, timeout: float = 1.0) -> None:
+        """
+        Collect the heartbeats that arrived within timeout seconds, then restart the
+        workers that died or went silent.
+        """
+        deadline = time.time() + timeout
+        while True:
+            try:
+                heartbeat = self.heartbeats.get(timeout=max(deadline - time.time(), 0))
+            except queue.Empty:
+                break
+            self.last_heartbeat[heartbeat.cluster_id] = heartbeat
+            for shard in heartbeat.shards:
+                if shard.closed:
+                    logger.warning(f"Shard {shard.shard_id} of cluster {heartbeat.cluster_id} is disconnected")
+
+        now = time.time()
+        for cluster_id, process in list(self.processes.items()):
+            if now - self.started_at[cluster_id] < self.restart_backoff:
+                continue
+            if not process.is_alive():
+                self.restart(cluster_id, f"exited with code {process.exitcode}")
+            elif self.is_stale(cluster_id, now):
+                self.restart(cluster_id, f"no heartbeat for {self.heartbeat_timeout:.0f}s")
+
+    def shard_statuses(self) -> List[ShardStatus]:
+        """
+        The latest known status of every shard in the cluster.
+        """
+        return sorted(
+            (shard for heartbeat in self.last_heartbeat.values() for shard in heartbeat.shards),
+            key=lambda shard: shard.shard_id
+        )
+
+    def stop(self) -> None:
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes.values():
+            process.join(10)
+
+    def run_forever(self) -> None:
+        self.start()
+        try:
+            while True:
+                self.poll()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+
+def launch(token: str, processes: int, shard_count: int = 0) -> None:
+    """
+    Run the bot as a cluster of worker processes.
+
+    :param token: The bot token, used to ask Discord for a shard count if none is given.
+    :param processes: The number of worker processes.
+    :param shard_count: The total number of shards, 0 uses Discord's recommendation.
+    """
+    if not shard_count:
+        shard_count = asyncio.run(recommended_shard_count(token))
+    Cluster(shard_count, processes).run_forever()
@@ -0,0 +1,150 @@
+import discord
+from discord import app_commands
+from discord.ext import commands, tasks
+from discord.ext.commands import Context
+
+from helpers import checks
+from bounty_hunter_mw2.helpers.guild_settings import guild_settings
+
+
+class Admin(commands.Cog, name="admin"):
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def cog_load(self) -> None:
+        self.prefix_task.change_interval(seconds=guild_settings.settings.ttl or 300)
+        self.prefix_task.start()
+
+    async def cog_unload(self) -> None:
+        self.prefix_task.cancel()
+
+    async def refresh_prefixes(self) -> None:
+        """
+        Let the message prefilter accept every prefix a guild has set.
+        """
+        prefilter = getattr(self.bot, "prefilter", None)
+        if prefilter is not None:
+            prefilter.set_prefixes(await guild_settings.prefixes_in_use())
+
+    @tasks.loop(minutes=5.0)
+    async def prefix_task(self) -> None:
+        """
+        Load the prefixes in use, and pick up the ones changed by the other processes of a cluster.
+        """
+        await self.refresh_prefixes()
+
+    async def send_settings(self, context: Context) -> None:
+        settings = await guild_settings.get(context.guild.id)
+        channel = f"<#{settings.report_channel_id}>" if settings.report_channel_id else "Not set"
+        embed = discord.Embed(
+            title="Server Settings",
+            color=0x9C84EF
+        )
+        embed.add_field(
+            name="Prefix",
+            value=f"`{settings.prefix or guild_settings.default_prefix}`",
+            inline=True
+        )
+        embed.add_field(
+            name="Report channel",
+            value=channel,
+            inline=True
+        )
+        embed.add_field(
+            name="Report threshold",
+            value=str(await guild_settings.report_threshold(context.guild.id)),
+            inline=True
+        )
+        await context.send(embed=embed)
+
+    @commands.hybrid_group(
+        name="settings",
+        description="Show the settings of this server."
+    )
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @checks.not_blacklisted()
+    async def settings(self, context: Context) -> None:
+        """
+        Lets you show or change the settings of this server.
+
+        :param context: The command context
+        """
+        if context.invoked_subcommand is None:
+            await self.send_settings(context)
+
+    @settings.command(
+        base="settings",
+        name="prefix",
+        description="Change the prefix of the bot in this server."
+    )
+    @app_commands.describe(prefix="The new prefix, leave it empty to use the default.")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @checks.not_blacklisted()
+    async def settings_prefix(self, context: Context, prefix: str = None) -> None:
+        """
+        Change the prefix of the bot in this server.
+
+        :param context: The command context.
+        :param prefix: The new prefix, None to use the default.
+        """
+        if prefix is not None and (len(prefix) > 16 or prefix.isspace()):
+            embed = discord.Embed(
+                description="The prefix must be at most 16 characters and not only whitespace.",
+                color=0xE02B2B
+            )
+            await context.send(embed=embed)
+            return
+        await guild_settings.update(context.guild.id, prefix=prefix)
+        await self.refresh_prefixes()
+        await self.send_settings(context)
+
+    @settings.command(
+        base="settings",
+        name="reportchannel",
+        description="Change the channel reports are posted in."
+    )
+    @app_commands.describe(channel="The channel reports are posted in, leave it empty to unset it.")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @checks.not_blacklisted()
+    async def settings_reportchannel(self, context: Context, channel: discord.TextChannel = None) -> None:
+        """
+        Change the channel reports are posted in.
+
+        :param context: The command context.
+        :param channel: The channel reports are posted in, None to unset it.
+        """
+        await guild_settings.update(context.guild.id, report_channel_id=channel.id if channel else None)
+        await self.send_settings(context)
+
+    @settings.command(
+        base="settings",
+        name="threshold",
+        description="Change how many reports flag a suspect in this server."
+    )
+    @app_commands.describe(reports="The number of reports, leave it empty to use the default.")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @checks.not_blacklisted()
+    async def settings_threshold(self, context: Context, reports: int = None) -> None:
+        """
+        Change how many reports flag a suspect in this server.
+
+        :param context: The command context.
+        :param reports: The number of reports, None to use the default.
+        """
+        if reports is not None and reports < 1:
+            embed = discord.Embed(
+                description="The threshold must be at least 1 report.",
+                color=0xE02B2B
+            )
+            await context.send(embed=embed)
+            return
+        await guild_settings.update(context.guild.id, report_threshold=reports)
+        await self.send_settings(context)
+
+
+async def setup(bot):
+    await bot.add_cog(Admin(bot))
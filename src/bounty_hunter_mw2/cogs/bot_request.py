@@ -1,13 +1,12 @@
-import platform
-import aiohttp
-from discord import app_commands
+import discord
 from discord.ext import commands
 from discord.ext.commands import Context
 
 from helpers import checks
+from bounty_hunter_mw2.helpers.http import HttpError, http_client
 
 
-class HttpRequest(commands.Cog, name="general"):
+class HttpRequest(commands.Cog, name="http"):
     def __init__(self, bot):
         self.bot = bot
 
@@ -19,23 +18,25 @@ class HttpRequest(commands.Cog, name="general"):
     async def bitcoin(self, context: Context) -> None:
         """
         Get the current price of bitcoin. THis is just to demonstrate asynchronous HTTP requests.
+        The price is fetched through the shared HTTP client and cached for a minute.
 
         :param context: The command context
         """
-        async with aiohttp.ClientSession() as session:
-            async with session.get("https://api.coindesk.com/v1/bpi/currentprice/BTC.json") as request:
-                if request.status == 200:
-                    data = await request.json(content_type="application/javascript")
-                    embed = discord.Embed(
-                        title="Bitcoin Price",
-                        description=f"The current price is {data['bpi']['USD']['rate']} :dollar:",
-                        color=0x9C84EF
-                    )
-                else:
-                    embed = discord.Embed(
-                        title="Error!",
-                        description="There's an error with the API, please try again later.",
-                        color=0xE02B2B
-                    )
-                await context.send(embed=embed)
+        try:
+            data = await http_client.get_json("https://api.coindesk.com/v1/bpi/currentprice/BTC.json", ttl=60)
+            embed = discord.Embed(
+                title="Bitcoin Price",
+                description=f"The current price is {data['bpi']['USD']['rate']} :dollar:",
+                color=0x9C84EF
+            )
+        except (HttpError, KeyError, TypeError):
+            embed = discord.Embed(
+                title="Error!",
+                description="There's an error with the API, please try again later.",
+                color=0xE02B2B
+            )
+        await context.send(embed=embed)
 
+
+async def setup(bot):
+    await bot.add_cog(HttpRequest(bot))
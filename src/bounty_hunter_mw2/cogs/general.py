@@ -1,4 +1,5 @@
 import platform
+from typing import List, Optional
 
 import discord
 from discord import app_commands
@@ -6,6 +7,27 @@ from discord.ext import commands
 from discord.ext.commands import Context
 
 from helpers import checks
+from bounty_hunter_mw2.helpers.guild_settings import guild_settings
+from bounty_hunter_mw2.helpers.help import help_cache
+from bounty_hunter_mw2.helpers.paginator import Paginator
+
+
+class HelpPaginator(Paginator):
+    """
+    Pages through the pre-rendered help embeds.
+    """
+    def __init__(self, context: Context, pages: List[discord.Embed]):
+        super().__init__(context)
+        self.pages = pages
+        self.index = -1
+
+    async def render(self, direction: Optional[str]) -> Optional[discord.Embed]:
+        index = self.index + (-1 if direction == "previous" else 1)
+        if not 0 <= index < len(self.pages):
+            return None
+        self.index = index
+        self.update_buttons(index > 0, index < len(self.pages) - 1)
+        return self.pages[index]
 
 
 class General(commands.Cog, name="general"):
@@ -18,26 +40,17 @@ class General(commands.Cog, name="general"):
     )
     @checks.not_blacklisted()
     async def help(self, context: Context) -> None:
-        prefix = self.bot.config['prefix']
-        embed = discord.Embed(
-            title="Help",
-            descfiption="List of available commands:",
-            color=0x9C84EF
-        )
-        for i in self.bot.cogs:
-            cog = self.bot.get_cog(i.lower())
-            commands = cog.get_commands()
-            data = []
-            for command in commands:
-                description = command.description.partition('\n')[0]
-                data.append(f"{prefix}{command.name} - {description}")
-            help_text = "\n".join(data)
-            embed.add_field(
-                name=i.capitalize(),
-                value=f'```{help_text}```',
-                inline=False
-            )
-        await context.send(embed=embed)
+        """
+        List all commands the bot has loaded, the pages are rendered once per prefix.
+
+        :param context: The command context
+        """
+        prefix = await guild_settings.prefix(context.guild.id if context.guild else None)
+        pages = help_cache.get(self.bot, prefix)
+        if len(pages) == 1:
+            await context.send(embed=pages[0])
+            return
+        await HelpPaginator(context, pages).start()
 
     @commands.hybrid_command(
         name="botinfo",
@@ -177,10 +190,13 @@ class General(commands.Cog, name="general"):
         embed = discord.Embed(
             description=f"Join the support server for the bot by clicking [here]({self.bot.config['support_guild_url']}).",
             color=0xD75BF4
+        )
         try:
             await context.author.send(embed=embed)
             await context.send("I sent you a private message.")
         except discord.Forbidden:
             await context.send(embed=embed)
 
-        
+
+async def setup(bot):
+    await bot.add_cog(General(bot))
@@ -1,43 +1,108 @@
-from typing import Optional, Literal
+import asyncio
+import io
+import resource
+from typing import List, Optional, Literal, Tuple
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 from discord.ext.commands import Context
 
-from helpers import checks, db_manager
+from helpers import checks
+from bounty_hunter_mw2.helpers import db_manager
+from bounty_hunter_mw2.helpers.command_sync import sync_if_changed
+from bounty_hunter_mw2.helpers.guild_settings import guild_settings
+from bounty_hunter_mw2.helpers.help import help_cache
+from bounty_hunter_mw2.helpers.members import member_cache, user_resolver
+from bounty_hunter_mw2.helpers.paginator import Paginator
+from bounty_hunter_mw2.helpers.profiling import memory_profiler, sample_cpu
+from bounty_hunter_mw2.helpers.metrics import metrics
+from bounty_hunter_mw2 import cluster
+from bounty_hunter_mw2.database import summary
+
+
+class BlacklistPaginator(Paginator):
+    """
+    Pages through the blacklisted users, resolving only the users of the page shown
+    and warming the cache with the users of the next page.
+    """
+    page_size = 25
+
+    def __init__(self, context: Context, blacklisted_users: List[Tuple[int, int]]):
+        super().__init__(context)
+        self.blacklisted_users = blacklisted_users
+        self.pages = (len(blacklisted_users) + self.page_size - 1) // self.page_size
+        self.index = -1
+        self.prefetch: Optional[asyncio.Task] = None
+
+    def page_ids(self, index: int) -> List[int]:
+        rows = self.blacklisted_users[index * self.page_size:(index + 1) * self.page_size]
+        return [user_id for user_id, _ in rows]
+
+    async def render(self, direction: Optional[str]) -> Optional[discord.Embed]:
+        index = self.index + (-1 if direction == "previous" else 1)
+        if not 0 <= index < self.pages:
+            return None
+        self.index = index
+        users = await user_resolver.resolve(self.context.bot, self.page_ids(index))
+        if index + 1 < self.pages and (self.prefetch is None or self.prefetch.done()):
+            self.prefetch = asyncio.create_task(user_resolver.resolve(self.context.bot, self.page_ids(index + 1)))
+
+        lines = []
+        for user_id, created_at in self.blacklisted_users[index * self.page_size:(index + 1) * self.page_size]:
+            user = users.get(user_id)
+            name = f"{user.mention} ({user})" if user is not None else f"<@{user_id}> (unknown user)"
+            lines.append(f"* {name} - Blacklisted <t:{created_at}>")
+        embed = discord.Embed(
+            title=f"Blacklisted Users ({len(self.blacklisted_users)})",
+            description="\n".join(lines),
+            color=0x9C84EF
+        )
+        stats = db_manager.blacklist_cache.stats()
+        embed.set_footer(
+            text=f"Page {index + 1}/{self.pages} - Cache: {stats['hits']} hits, {stats['fallbacks']} database fallbacks"
+        )
+        self.update_buttons(index > 0, index < self.pages - 1)
+        return embed
 
 
 class Owner(commands.Cog, name="owner"):
     def __init__(self, bot):
         self.bot = bot
+        self.profiling = False
 
     @commands.command(
         name="sync",
         description="Synchronizes the slash commands"
     )
-    @app_commands.describe(scope="The scope of the sync, can be 'global' or 'guild'")
+    @app_commands.describe(
+        scope="The scope of the sync, can be 'global' or 'guild'",
+        force="Sync even if the commands did not change since the last sync."
+    )
     @checks.is_owner()
-    async def sync(self, context: Context, scope: Literal['global', 'guild']) -> None:
+    async def sync(self, context: Context, scope: Literal['global', 'guild'], force: bool = False) -> None:
         """
-        Synchronizes the slash commands.
+        Synchronizes the slash commands, unless they did not change since the last sync.
 
         :param context: The command context.
         :param scope: The scope of the sync.
+        :param force: Sync even if the commands did not change since the last sync.
         """
         if scope == "global":
-            await context.bot.tree.sync()
+            synced = await sync_if_changed(context.bot.tree, force=force)
             embed = discord.Embed(
-                description="Slash Commands have been fully synchronized.",
+                description="Slash Commands have been fully synchronized." if synced else
+                "Slash commands did not change since the last global sync, skipped it.",
                 color=0x9C84EF
             )
             await context.send(embed=embed)
             return
         elif scope == "guild":
             context.bot.tree.copy_global_to(guild=context.guild)
-            await context.bot.tree.sync(guild=context.guild)
+            synced = await sync_if_changed(context.bot.tree, guild=context.guild, force=force)
             embed = discord.Embed(
-                description="Slash commands have been synchronized in this guild.",
+                description="Slash commands have been synchronized in this guild." if synced else
+                "Slash commands did not change since the last sync in this guild, skipped it.",
                 color=0x9C84EF
             )
             await context.send(embed=embed)
@@ -63,7 +128,7 @@ class Owner(commands.Cog, name="owner"):
         """
         if scope == "global":
             context.bot.tree.clear_commands(guild=None)
-            await context.bot.tree.sync()
+            await sync_if_changed(context.bot.tree, force=True)
             embed = discord.Embed(
                 description="Slash commands have been globally unsynchronized.",
                 color=0x9C84EF
@@ -73,7 +138,7 @@ class Owner(commands.Cog, name="owner"):
 
         elif scope == "guild":
             context.bot.tree.clear_commands(guild=context.guild)
-            await context.bot.tree.sync(guild=context.guild)
+            await sync_if_changed(context.bot.tree, guild=context.guild, force=True)
             embed = discord.Embed(
                 description="Slash commands have been unsynchronized in this guild.",
                 color=0x9C84EF
@@ -110,6 +175,7 @@ class Owner(commands.Cog, name="owner"):
             await context.send(embed=embed)
             return
 
+        help_cache.invalidate()
         embed = discord.Embed(
             description=f"Successfully loaded cog {cog}",
             color=0x9C84EF
@@ -139,6 +205,7 @@ class Owner(commands.Cog, name="owner"):
             await context.send(embed=embed)
             return
 
+        help_cache.invalidate()
         embed = discord.Embed(
             description=f"Successfully unloaded the cog '{cog}'.",
             color=0x9C84EF
@@ -168,6 +235,7 @@ class Owner(commands.Cog, name="owner"):
             await context.send(embed=embed)
             return
 
+        help_cache.invalidate()
         embed = discord.Embed(
             description=f"Successfully reloaded the cog '{cog}'",
             color=0x9C84EF
@@ -192,6 +260,297 @@ class Owner(commands.Cog, name="owner"):
         await context.send(embed=embed)
         await self.bot.close()
 
+    @commands.hybrid_command(
+        name="stats",
+        description="Show how often and how fast the commands run."
+    )
+    @checks.is_owner()
+    async def stats(self, context: Context) -> None:
+        """
+        Show the call counts and latency of the busiest commands since the bot started.
+
+        :param context: The command context.
+        """
+        rows = metrics.command_summary()[:20]
+        if len(rows) == 0:
+            embed = discord.Embed(
+                description="No commands have been executed yet.",
+                color=0xE02B2B
+            )
+            await context.send(embed=embed)
+            return
+
+        lines = [f"{'command':<16} {'ok':>6} {'err':>5} {'p50':>8} {'p95':>8}"]
+        for command, successes, errors, p50, p95 in rows:
+            lines.append(f"{command[:16]:<16} {successes:>6} {errors:>5} {p50 * 1000:>6.1f}ms {p95 * 1000:>6.1f}ms")
+        embed = discord.Embed(
+            title="Command Stats",
+            description="```" + "\n".join(lines) + "```",
+            color=0x9C84EF
+        )
+        await context.send(embed=embed)
+
+    @commands.hybrid_command(
+        name="lag",
+        description="Show how long the event loop has been blocked."
+    )
+    @checks.is_owner()
+    async def lag(self, context: Context) -> None:
+        """
+        Show the event loop lag percentiles and where the loop was last blocked.
+
+        :param context: The command context.
+        """
+        watchdog = self.bot.watchdog
+        embed = discord.Embed(
+            title="Event Loop Lag",
+            description=(
+                f"p50 {watchdog.lag.quantile(0.5) * 1000:.1f}ms, p95 {watchdog.lag.quantile(0.95) * 1000:.1f}ms, "
+                f"p99 {watchdog.lag.quantile(0.99) * 1000:.1f}ms, max {watchdog.max_lag * 1000:.0f}ms "
+                f"over {watchdog.lag.count} samples."
+            ),
+            color=0x9C84EF
+        )
+        embed.add_field(
+            name="Stalls",
+            value=f"{watchdog.stall_count} longer than {watchdog.threshold * 1000:.0f}ms",
+            inline=False
+        )
+        if watchdog.stalls:
+            stall = watchdog.stalls[-1]
+            # Keep the innermost frames, they are the ones that were blocking.
+            embed.add_field(
+                name=f"Last stall, {stall.lag * 1000:.0f}ms <t:{int(stall.at)}:R>",
+                value="```" + stall.stack[-1000:] + "```",
+                inline=False
+            )
+        await context.send(embed=embed)
+
+    @commands.hybrid_group(
+        name="profile",
+        description="Profile the CPU or memory use of the running bot."
+    )
+    @checks.is_owner()
+    async def profile(self, context: Context) -> None:
+        """
+        Lets you profile the CPU or memory use of the running bot.
+
+        :param context: The command context
+        """
+        if context.invoked_subcommand is None:
+            embed = discord.Embed(
+                description="You need to specify a subcommand.\n\n**Subcommands**\n`cpu` - Sample where the event loop spends its time.\n`memory` - Take a snapshot of the allocated memory.\n`diff` - Compare two memory snapshots.\n`stop` - Stop tracing memory and drop the snapshots.",
+                color=0xE02B2B
+            )
+            await context.send(embed=embed)
+
+    async def send_profile(self, context: Context, description: str, filename: str, report: str) -> None:
+        embed = discord.Embed(
+            description=description,
+            color=0x9C84EF
+        )
+        await context.send(embed=embed, file=discord.File(io.BytesIO(report.encode()), filename=filename))
+
+    async def start_profiling(self, context: Context) -> bool:
+        if self.profiling:
+            embed = discord.Embed(
+                description="A profile is already being taken, wait until it is done.",
+                color=0xE02B2B
+            )
+            await context.send(embed=embed)
+            return False
+        self.profiling = True
+        return True
+
+    @profile.command(
+        base="profile",
+        name="cpu",
+        description="Sample where the event loop spends its time."
+    )
+    @app_commands.describe(seconds="How long to sample for.")
+    @checks.is_owner()
+    async def profile_cpu(self, context: Context, seconds: app_commands.Range[int, 1, 300] = 10) -> None:
+        """
+        Sample the stack of the event loop for a while and send the busiest functions.
+
+        :param context: The command context.
+        :param seconds: How long to sample for.
+        """
+        if not await self.start_profiling(context):
+            return
+        try:
+            await context.defer()
+            profile = await sample_cpu(seconds)
+        finally:
+            self.profiling = False
+        await self.send_profile(
+            context,
+            f"Sampled the event loop {profile.samples} times over {seconds} seconds.",
+            "cpu-profile.txt",
+            profile.report()
+        )
+
+    @profile.command(
+        base="profile",
+        name="memory",
+        description="Trace allocations for a while and take a memory snapshot."
+    )
+    @app_commands.describe(
+        seconds="How long to trace allocations for before the snapshot.",
+        keep="Keep tracing afterwards, so later snapshots can be diffed against this one."
+    )
+    @checks.is_owner()
+    async def profile_memory(
+        self,
+        context: Context,
+        seconds: app_commands.Range[int, 1, 300] = 10,
+        keep: bool = False
+    ) -> None:
+        """
+        Trace allocations for a while, take a snapshot and send the biggest allocation sites.
+
+        :param context: The command context.
+        :param seconds: How long to trace allocations for before the snapshot.
+        :param keep: Keep tracing afterwards, so later snapshots can be diffed against this one.
+        """
+        if not await self.start_profiling(context):
+            return
+        try:
+            await context.defer()
+            snapshot_id, snapshot = await memory_profiler.capture(seconds, keep)
+        finally:
+            self.profiling = False
+        tracing = "Tracing stays on until `profile stop`." if memory_profiler.kept_on else "Tracing is off again."
+        # Grouping every traced block by traceback takes seconds on a big heap, keep it off the loop.
+        report = await asyncio.to_thread(memory_profiler.report, snapshot)
+        await self.send_profile(
+            context,
+            f"Took memory snapshot {snapshot_id}. {tracing}",
+            f"memory-snapshot-{snapshot_id}.txt",
+            report
+        )
+
+    @profile.command(
+        base="profile",
+        name="diff",
+        description="Show which allocation sites grew between two memory snapshots."
+    )
+    @app_commands.describe(first="The ID of the earlier snapshot.", second="The ID of the later snapshot.")
+    @checks.is_owner()
+    async def profile_diff(self, context: Context, first: int, second: int) -> None:
+        """
+        Show which allocation sites grew between two memory snapshots.
+
+        :param context: The command context.
+        :param first: The ID of the earlier snapshot.
+        :param second: The ID of the later snapshot.
+        """
+        try:
+            report = await asyncio.to_thread(memory_profiler.diff, first, second)
+        except KeyError:
+            snapshots = ", ".join(str(snapshot_id) for snapshot_id in memory_profiler.snapshot_ids()) or "none"
+            embed = discord.Embed(
+                description=f"Unknown snapshot, the snapshots kept are: {snapshots}.",
+                color=0xE02B2B
+            )
+            await context.send(embed=embed)
+            return
+        await self.send_profile(
+            context,
+            f"Compared memory snapshot {first} with {second}.",
+            f"memory-diff-{first}-{second}.txt",
+            report
+        )
+
+    @profile.command(
+        base="profile",
+        name="stop",
+        description="Stop tracing memory and drop the snapshots."
+    )
+    @checks.is_owner()
+    async def profile_stop(self, context: Context) -> None:
+        """
+        Stop tracing memory and drop the snapshots.
+
+        :param context: The command context.
+        """
+        memory_profiler.stop()
+        embed = discord.Embed(
+            description="Stopped tracing memory and dropped the snapshots.",
+            color=0x9C84EF
+        )
+        await context.send(embed=embed)
+
+    @commands.hybrid_command(
+        name="shards",
+        description="Show the latency and state of the shards run by this process."
+    )
+    @checks.is_owner()
+    async def shards(self, context: Context) -> None:
+        """
+        Show the latency and state of the shards run by this process.
+
+        :param context: The command context.
+        """
+        if not isinstance(self.bot, commands.AutoShardedBot):
+            embed = discord.Embed(
+                description=f"The bot is not sharded, the latency is {round(self.bot.latency * 1000)}ms.",
+                color=0x9C84EF
+            )
+            await context.send(embed=embed)
+            return
+
+        lines = [f"{'shard':<6} {'latency':>9} {'guilds':>7} state"]
+        for shard in cluster.shard_statuses(self.bot):
+            lines.append(
+                f"{shard.shard_id:<6} {shard.latency * 1000:>7.0f}ms {shard.guilds:>7} {'closed' if shard.closed else 'ok'}"
+            )
+        embed = discord.Embed(
+            title=f"Shards of cluster {getattr(self.bot, 'cluster_id', 0)}",
+            description="```" + "\n".join(lines) + "```",
+            color=0x9C84EF
+        )
+        await context.send(embed=embed)
+
+    @commands.hybrid_command(
+        name="memory",
+        description="Show how much of each guild's member list is held in memory."
+    )
+    @checks.is_owner()
+    async def memory(self, context: Context) -> None:
+        """
+        Show the cached members per guild, the recently active member cache and the memory used by the process.
+
+        :param context: The command context.
+        """
+        active = member_cache.per_guild()
+        guilds = sorted(self.bot.guilds, key=lambda guild: len(guild.members), reverse=True)
+        lines = [f"{'guild':<20} {'cached':>8} {'active':>7} {'members':>8} chunked"]
+        for guild in guilds[:15]:
+            lines.append(
+                f"{guild.name[:20]:<20} {len(guild.members):>8} {active.get(guild.id, 0):>7} {guild.member_count or 0:>8} {'yes' if guild.chunked else 'no'}"
+            )
+        stats = member_cache.members.stats()
+        # ru_maxrss is in KiB on Linux.
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        embed = discord.Embed(
+            title="Member Cache",
+            description="```" + "\n".join(lines) + "```",
+            color=0x9C84EF
+        )
+        embed.add_field(
+            name="Totals",
+            value=f"{sum(len(guild.members) for guild in guilds)} cached members in {len(guilds)} guilds",
+            inline=False
+        )
+        embed.add_field(
+            name="Recently active",
+            value=f"{stats['size']}/{stats['maxsize']} members",
+            inline=False
+        )
+        embed.set_footer(text=f"Peak memory: {peak_rss:.0f} MiB")
+        await context.send(embed=embed)
+
     @commands.hybrid_command(
         name="say",
         description="The bot will say anything you want."
@@ -226,6 +585,37 @@ class Owner(commands.Cog, name="owner"):
         )
         await context.send(embed=embed)
 
+    @commands.hybrid_command(
+        name="announce",
+        description="Post an announcement in the report channel of every server that has one."
+    )
+    @app_commands.describe(message="The announcement you want to post.")
+    @checks.is_owner()
+    async def announce(self, context: Context, *, message: str) -> None:
+        """
+        Post an announcement in the report channel of every server that has set one.
+
+        :param context: The command context.
+        :param message: The announcement you want to post.
+        """
+        await context.defer()
+        channels = await guild_settings.report_channels(guild.id for guild in self.bot.guilds)
+        announcement = discord.Embed(
+            title="Announcement",
+            description=message,
+            color=0x9C84EF
+        )
+        results = await asyncio.gather(
+            *self.bot.dispatcher.broadcast(channels, announcement),
+            return_exceptions=True
+        )
+        failed = sum(isinstance(result, Exception) for result in results)
+        embed = discord.Embed(
+            description=f"Posted the announcement in {len(channels) - failed} of {len(channels)} report channels.",
+            color=0x9C84EF if not failed else 0xE02B2B
+        )
+        await context.send(embed=embed)
+
     @commands.hybrid_group(
         name="blacklist",
         description="Get the list of all blacklisted users."
@@ -265,18 +655,7 @@ class Owner(commands.Cog, name="owner"):
             await context.send(embed=embed)
             return
 
-        embed = discord.Embed(
-            title="Blacklisted Users",
-            color=0x9C84EF
-        )
-        users = []
-        for bluser in blacklisted_users:
-            user = self.bot.get_user(int(bluser[0])) or await self.bot.fetch_user(int(bluser[0]))
-            users.append(
-                f"* {user.mention} ({user}) - Blacklisted <t:{bluser[1]}>"
-            )
-        embed.description = "\n".join(users)
-        await context.send(embed=embed)
+        await BlacklistPaginator(context, blacklisted_users).start()
 
     @blacklist.command(
         base="blacklist",
@@ -342,6 +721,72 @@ class Owner(commands.Cog, name="owner"):
         )
         await context.send(embed=embed)
 
+    @commands.hybrid_group(
+        name="summary",
+        description="Maintain the per-suspect report summary table."
+    )
+    @checks.is_owner()
+    async def summary(self, context: Context) -> None:
+        """
+        Lets you rebuild or check the per-suspect report summary table.
+
+        :param context: The command context
+        """
+        if context.invoked_subcommand is None:
+            embed = discord.Embed(
+                description="You need to specify a subcommand.\n\n**Subcommands**\n`rebuild` - Regenerate the summary from the reports.\n`check` - Compare the summary against the reports.",
+                color=0xE02B2B
+            )
+            await context.send(embed=embed)
+
+    @summary.command(
+        base="summary",
+        name="rebuild",
+        description="Regenerates the per-suspect summary from the reports."
+    )
+    @checks.is_owner()
+    async def summary_rebuild(self, context: Context) -> None:
+        """
+        Regenerates the per-suspect summary from the reports.
+
+        :param context: The command context
+        """
+        total = await summary.rebuild_suspect_summary()
+        embed = discord.Embed(
+            description=f"The summary has been rebuilt for {total} {'suspect' if total == 1 else 'suspects'}.",
+            color=0x9C84EF
+        )
+        await context.send(embed=embed)
+
+    @summary.command(
+        base="summary",
+        name="check",
+        description="Compares the per-suspect summary against the reports."
+    )
+    @checks.is_owner()
+    async def summary_check(self, context: Context) -> None:
+        """
+        Compares the per-suspect summary against the reports.
+
+        :param context: The command context
+        """
+        mismatched = await summary.check_suspect_summary()
+        if len(mismatched) == 0:
+            embed = discord.Embed(
+                description="The summary is consistent with the reports.",
+                color=0x9C84EF
+            )
+            await context.send(embed=embed)
+            return
+
+        embed = discord.Embed(
+            title="Inconsistent suspects",
+            description="\n".join(f"* `{key}`" for key in mismatched),
+            color=0xE02B2B
+        )
+        embed.set_footer(text="Run the summary rebuild command to fix them.")
+        await context.send(embed=embed)
+
 
 async def setup(bot):
     await bot.add_cog(Owner(bot))
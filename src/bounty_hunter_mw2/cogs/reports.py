@@ -0,0 +1,307 @@
+import asyncio
+from datetime import timezone
+from typing import Literal, Optional
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+from discord.ext.commands import Context
+
+from helpers import checks
+from bounty_hunter_mw2.helpers.guild_settings import guild_settings
+from bounty_hunter_mw2.helpers.metrics import untimed
+from bounty_hunter_mw2.helpers.paginator import Paginator
+from bounty_hunter_mw2.database import browse, export, fuzzy, search, summary
+
+
+class ReportPaginator(Paginator):
+    """
+    Pages through reports with keyset pagination, only the current page is held in memory.
+    """
+    def __init__(
+        self,
+        context: Context,
+        *,
+        guild_id: Optional[int],
+        suspect_activision: Optional[str],
+        include_archive: bool = False
+    ):
+        super().__init__(context)
+        self.guild_id = guild_id
+        self.suspect_activision = suspect_activision
+        self.include_archive = include_archive
+        self.page: Optional[browse.ReportPage] = None
+        self.number = 0
+
+    @property
+    def filters(self) -> dict:
+        return {
+            "guild_id": self.guild_id,
+            "suspect_activision": self.suspect_activision,
+            "include_archive": self.include_archive
+        }
+
+    async def render(self, direction: Optional[str]) -> Optional[discord.Embed]:
+        if direction is None:
+            page = await browse.fetch_page(**self.filters)
+        elif direction == "next":
+            page = await browse.fetch_page(**self.filters, cursor=self.page.last, direction="older")
+        else:
+            page = await browse.fetch_page(**self.filters, cursor=self.page.first, direction="newer")
+        if not page.reports:
+            return None
+
+        self.number += {None: 1, "next": 1, "previous": -1}[direction]
+        self.page = page
+        self.update_buttons(page.has_newer, page.has_older)
+
+        title = f"Reports against {self.suspect_activision}" if self.suspect_activision else "Reports"
+        embed = discord.Embed(title=title, color=0x9C84EF)
+        for report in page.reports:
+            embed.add_field(
+                name=f"{report.suspect_activision} ({report.platform})",
+                value=f"{report.message or '*No message*'}\n<t:{int(report.timestamp.replace(tzinfo=timezone.utc).timestamp())}:R> - Report `{report.id}`",
+                inline=False
+            )
+        embed.set_footer(text=f"Page {self.number}")
+        return embed
+
+
+class Reports(commands.Cog, name="reports"):
+    def __init__(self, bot):
+        self.bot = bot
+        self.exports = set()
+
+    async def cog_unload(self) -> None:
+        for task in self.exports:
+            task.cancel()
+
+    async def run_export(
+        self,
+        context: Context,
+        kind: Literal["reports", "users"],
+        fmt: Literal["csv", "jsonl"]
+    ) -> None:
+        """
+        Build the export in the background and post every part as soon as it is written.
+        """
+        parts = 0
+        try:
+            async for part in export.export_rows(kind, fmt, guild_id=context.guild.id):
+                parts += 1
+                with part.file:
+                    await context.channel.send(
+                        content=f"{context.author.mention} part {parts} of your {kind} export ({part.rows} rows)",
+                        file=discord.File(part.file, filename=part.filename)
+                    )
+        except Exception as e:
+            self.bot.logger.error(f"Export of {kind} for guild {context.guild.id} failed\n{type(e).__name__}: {e}")
+            embed = discord.Embed(
+                description=f"The {kind} export failed, please try again later.",
+                color=0xE02B2B
+            )
+            await context.channel.send(embed=embed)
+
+    @commands.hybrid_command(
+        name="search",
+        description="Search the reports for a suspect or for words in the report."
+    )
+    @app_commands.describe(
+        query="The words or Activision ID to search for.",
+        page="The page of results to show."
+    )
+    @commands.guild_only()
+    @checks.not_blacklisted()
+    @checks.rate_limit(user=(5, 30), guild=(30, 30), global_=(200, 30))
+    async def search(self, context: Context, query: str, page: Optional[int] = 1) -> None:
+        """
+        Search the reports made in this server, best matches first.
+
+        :param context: The command context.
+        :param query: The words or Activision ID to search for.
+        :param page: The page of results to show.
+        """
+        page = max(page or 1, 1)
+        per_page = 10
+        results, total = await search.search_reports(
+            query,
+            guild_id=context.guild.id,
+            page=page - 1,
+            per_page=per_page
+        )
+        if total == 0:
+            embed = discord.Embed(
+                description=f"No reports match `{query}`.",
+                color=0xE02B2B
+            )
+            await context.send(embed=embed)
+            return
+
+        pages = (total + per_page - 1) // per_page
+        embed = discord.Embed(
+            title=f"Reports matching \"{query}\"",
+            color=0x9C84EF
+        )
+        for result in results:
+            embed.add_field(
+                name=f"{result.suspect_activision} ({result.platform})",
+                value=f"{result.excerpt or '*No message*'}\nReport `{result.id}`",
+                inline=False
+            )
+        embed.set_footer(
+            text=f"Page {page}/{pages} - {total} {'match' if total == 1 else 'matches'}"
+        )
+        await context.send(embed=embed)
+
+    @commands.hybrid_command(
+        name="reports",
+        description="Browse the reports made in this server, newest first."
+    )
+    @app_commands.describe(
+        activision_id="Only show the reports against this Activision ID.",
+        archived="Also show reports that have been moved to the archive."
+    )
+    @commands.guild_only()
+    @checks.not_blacklisted()
+    @checks.rate_limit(user=(5, 30), guild=(30, 30))
+    async def reports(
+        self,
+        context: Context,
+        activision_id: Optional[str] = None,
+        archived: bool = False
+    ) -> None:
+        """
+        Browse the reports made in this server, newest first.
+
+        :param context: The command context.
+        :param activision_id: Only show the reports against this Activision ID.
+        :param archived: Also show reports that have been moved to the archive.
+        """
+        paginator = ReportPaginator(
+            context,
+            guild_id=context.guild.id,
+            suspect_activision=activision_id,
+            include_archive=archived
+        )
+        if not await paginator.start():
+            embed = discord.Embed(
+                description="There are no reports to show.",
+                color=0xE02B2B
+            )
+            await context.send(embed=embed)
+
+    @commands.hybrid_command(
+        name="export",
+        description="Export the reports or registered users of this server."
+    )
+    @app_commands.describe(
+        kind="Export the reports or the registered users.",
+        fmt="The file format of the export."
+    )
+    @commands.guild_only()
+    @commands.has_guild_permissions(manage_guild=True)
+    @checks.not_blacklisted()
+    @checks.rate_limit(user=(1, 600), guild=(2, 600), global_=(10, 600))
+    async def export(
+        self,
+        context: Context,
+        kind: Literal["reports", "users"] = "reports",
+        fmt: Literal["csv", "jsonl"] = "csv"
+    ) -> None:
+        """
+        Export the reports or registered users of this server as gzip-compressed files.
+        The export runs in the background and is posted in this channel when ready.
+
+        :param context: The command context.
+        :param kind: Export the reports or the registered users.
+        :param fmt: The file format of the export.
+        """
+        task = asyncio.create_task(untimed(self.run_export(context, kind, fmt)))
+        self.exports.add(task)
+        task.add_done_callback(self.exports.discard)
+        embed = discord.Embed(
+            description=f"Exporting the {kind} of this server as {fmt}, the files will be posted here when ready.",
+            color=0x9C84EF
+        )
+        await context.send(embed=embed)
+
+    @commands.hybrid_command(
+        name="lookup",
+        description="Find the reported Activision IDs that look like the one given."
+    )
+    @app_commands.describe(activision_id="The Activision ID to look up.")
+    @checks.not_blacklisted()
+    @checks.rate_limit(user=(10, 30), guild=(60, 30))
+    async def lookup(self, context: Context, *, activision_id: str) -> None:
+        """
+        Find the reported Activision IDs that look like the one given, ignoring case,
+        discriminators and look-alike characters.
+
+        :param context: The command context.
+        :param activision_id: The Activision ID to look up.
+        """
+        suggestions = await fuzzy.suggest_activision(activision_id)
+        if not suggestions:
+            embed = discord.Embed(
+                description=f"Nobody looking like `{activision_id}` has been reported.",
+                color=0xE02B2B
+            )
+            await context.send(embed=embed)
+            return
+
+        lines = [
+            f"* `{s.display}` - {s.occurrences} {'report' if s.occurrences == 1 else 'reports'} ({round(s.score * 100)}% match)"
+            for s in suggestions
+        ]
+        embed = discord.Embed(
+            title="Did you mean",
+            description="\n".join(lines),
+            color=0x9C84EF
+        )
+        await context.send(embed=embed)
+
+    @commands.hybrid_command(
+        name="suspect",
+        description="Show how often a suspect has been reported."
+    )
+    @app_commands.describe(activision_id="The Activision ID of the suspect.")
+    @checks.not_blacklisted()
+    @checks.rate_limit(user=(10, 30), guild=(60, 30))
+    async def suspect(self, context: Context, *, activision_id: str) -> None:
+        """
+        Show how often a suspect has been reported, on which platforms and in how many servers.
+
+        :param context: The command context.
+        :param activision_id: The Activision ID of the suspect.
+        """
+        suspect = await summary.get_suspect_summary(activision_id)
+        if suspect is None:
+            embed = discord.Embed(
+                description=f"`{activision_id}` has not been reported.",
+                color=0xE02B2B
+            )
+            await context.send(embed=embed)
+            return
+
+        threshold = await guild_settings.report_threshold(context.guild.id if context.guild else None)
+        flagged = suspect.report_count >= threshold
+        embed = discord.Embed(
+            title=f"{suspect.display} (flagged)" if flagged else suspect.display,
+            description=f"Reported {suspect.report_count} {'time' if suspect.report_count == 1 else 'times'} by {suspect.distinct_reporters} users in {suspect.distinct_guilds} servers.",
+            color=0xE02B2B if flagged else 0x9C84EF
+        )
+        embed.add_field(
+            name="Platforms",
+            value=f"Playstation: {suspect.playstation_count}\nXbox: {suspect.xbox_count}\nBattle.net: {suspect.battlenet_count}\nUnknown: {suspect.unknown_count}",
+            inline=True
+        )
+        embed.add_field(
+            name="Seen",
+            value=f"First: {suspect.first_seen}\nLast: {suspect.last_seen}",
+            inline=True
+        )
+        await context.send(embed=embed)
+
+
+async def setup(bot):
+    await bot.add_cog(Reports(bot))
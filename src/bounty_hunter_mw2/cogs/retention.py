@@ -0,0 +1,54 @@
+import discord
+from discord import app_commands
+from discord.ext import commands, tasks
+from discord.ext.commands import Context
+
+from helpers import checks
+from bounty_hunter_mw2.database import retention
+
+
+class Retention(commands.Cog, name="retention"):
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def cog_load(self) -> None:
+        # In a cluster only the first process runs the maintenance tasks.
+        if getattr(self.bot, "cluster_id", 0) == 0:
+            self.archive_task.start()
+
+    async def cog_unload(self) -> None:
+        self.archive_task.cancel()
+
+    @tasks.loop(hours=1.0)
+    async def archive_task(self) -> None:
+        """
+        Move the reports older than the retention period into the monthly archives.
+        """
+        total = await retention.archive_old_reports()
+        if total:
+            self.bot.logger.info(f"Archived {total} reports older than {retention.RETENTION_DAYS} days")
+
+    @commands.hybrid_command(
+        name="archive",
+        description="Move old reports into the monthly archives now."
+    )
+    @app_commands.describe(days="Archive the reports older than this many days.")
+    @checks.is_owner()
+    async def archive(self, context: Context, days: int = retention.RETENTION_DAYS) -> None:
+        """
+        Move old reports into the monthly archives now.
+
+        :param context: The command context.
+        :param days: Archive the reports older than this many days.
+        """
+        await context.defer()
+        total = await retention.archive_old_reports(days)
+        embed = discord.Embed(
+            description=f"Archived {total} {'report' if total == 1 else 'reports'} older than {days} days.",
+            color=0x9C84EF
+        )
+        await context.send(embed=embed)
+
+
+async def setup(bot):
+    await bot.add_cog(Retention(bot))
@@ -0,0 +1,67 @@
+from datetime import time
+from typing import Literal
+
+import discord
+from discord import app_commands
+from discord.ext import commands, tasks
+from discord.ext.commands import Context
+
+from helpers import checks
+from bounty_hunter_mw2.database import scoring
+
+
+class Scoring(commands.Cog, name="scoring"):
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def cog_load(self) -> None:
+        # In a cluster only the first process runs the maintenance tasks.
+        if getattr(self.bot, "cluster_id", 0) == 0:
+            self.nightly_scoring.start()
+            self.incremental_scoring.start()
+
+    async def cog_unload(self) -> None:
+        self.nightly_scoring.cancel()
+        self.incremental_scoring.cancel()
+
+    @tasks.loop(time=time(hour=4))
+    async def nightly_scoring(self) -> None:
+        """
+        Rescore every user once a night.
+        """
+        total = await scoring.run_scoring("full")
+        self.bot.logger.info(f"Nightly scoring rescored {total} users")
+
+    @tasks.loop(minutes=15.0)
+    async def incremental_scoring(self) -> None:
+        """
+        Rescore the users touched by new reports since the last run.
+        """
+        total = await scoring.run_scoring("incremental")
+        if total:
+            self.bot.logger.info(f"Incremental scoring rescored {total} users")
+
+    @commands.hybrid_command(
+        name="rescore",
+        description="Recompute the trust rating and notoriety of users."
+    )
+    @app_commands.describe(mode="Rescore everyone ('full') or only recently touched users ('incremental').")
+    @checks.is_owner()
+    async def rescore(self, context: Context, mode: Literal["full", "incremental"] = "incremental") -> None:
+        """
+        Recompute the trust rating and notoriety of users.
+
+        :param context: The command context.
+        :param mode: Rescore everyone or only recently touched users.
+        """
+        await context.defer()
+        total = await scoring.run_scoring(mode)
+        embed = discord.Embed(
+            description=f"Rescored {total} {'user' if total == 1 else 'users'} ({mode}).",
+            color=0x9C84EF
+        )
+        await context.send(embed=embed)
+
+
+async def setup(bot):
+    await bot.add_cog(Scoring(bot))
@@ -10,13 +10,58 @@ class Config(object):
     PERMISSIONS = int(os.environ.get("PERMISSIONS_INTEGER"))
     APPLICATION_ID = int(os.environ.get("APPLICATION_ID"))
     OWNERS = [int(os.environ.get("OWNER"))]
+    LOG_FILE = os.environ.get("LOG_FILE", "discord.log")
+    LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", 10 * 1024 * 1024))
+    LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", 5))
+    LOG_JSON = os.environ.get("LOG_JSON", "0") == "1"
+    METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.environ.get("METRICS_PORT", 0))
+    SHARD_COUNT = int(os.environ.get("SHARD_COUNT", 0))
+    SHARD_IDS = [int(shard) for shard in os.environ.get("SHARD_IDS", "").split(",") if shard]
+    CLUSTER_ID = int(os.environ.get("CLUSTER_ID", 0))
+    CLUSTER_PROCESSES = int(os.environ.get("CLUSTER_PROCESSES", 1))
+    MEMBER_CACHE = os.environ.get("MEMBER_CACHE", "all")
+    CHUNK_GUILDS_AT_STARTUP = os.environ.get("CHUNK_GUILDS_AT_STARTUP", "1") == "1"
+    MEMBER_LRU_SIZE = int(os.environ.get("MEMBER_LRU_SIZE", 10000))
+    REPORT_THRESHOLD = int(os.environ.get("REPORT_THRESHOLD", 5))
+    SETTINGS_CACHE_SIZE = int(os.environ.get("SETTINGS_CACHE_SIZE", 5000))
+    SETTINGS_CACHE_TTL = float(os.environ.get("SETTINGS_CACHE_TTL", 300))
+    SYNC_COMMANDS_GLOBALLY = os.environ.get("SYNC_COMMANDS_GLOBALLY", "1") == "1"
+    LOOP_LAG_INTERVAL = float(os.environ.get("LOOP_LAG_INTERVAL", 0.25))
+    LOOP_LAG_THRESHOLD = float(os.environ.get("LOOP_LAG_THRESHOLD", 0.25))
+    # Rate limits longer than this raise discord.RateLimited instead of being slept out inside
+    # discord.py, so the outbound dispatcher can requeue the batch. discord.py's minimum is 30.
+    MAX_RATELIMIT_TIMEOUT = max(float(os.environ.get("MAX_RATELIMIT_TIMEOUT", 30)), 30.0)
+    # Only cogs without slash commands can be deferred, see load_cogs.
+    DEFERRED_COGS = [cog for cog in os.environ.get("DEFERRED_COGS", "").split(",") if cog]
 
-    @staticmethod
-    def to_dict():
+    @classmethod
+    def to_dict(cls):
         return {
-            "prefix": self.PREFIX,
-            "token": self.TOKEN,
-            "permissions": self.PERMISSIONS,
-            "application_id": self.APPLICATION_ID,
-            "owners": self.OWNERS
+            "prefix": cls.PREFIX,
+            "token": cls.TOKEN,
+            "permissions": cls.PERMISSIONS,
+            "application_id": cls.APPLICATION_ID,
+            "owners": cls.OWNERS,
+            "log_file": cls.LOG_FILE,
+            "log_max_bytes": cls.LOG_MAX_BYTES,
+            "log_backup_count": cls.LOG_BACKUP_COUNT,
+            "log_json": cls.LOG_JSON,
+            "metrics_host": cls.METRICS_HOST,
+            "metrics_port": cls.METRICS_PORT,
+            "shard_count": cls.SHARD_COUNT,
+            "shard_ids": cls.SHARD_IDS,
+            "cluster_id": cls.CLUSTER_ID,
+            "cluster_processes": cls.CLUSTER_PROCESSES,
+            "member_cache": cls.MEMBER_CACHE,
+            "chunk_guilds_at_startup": cls.CHUNK_GUILDS_AT_STARTUP,
+            "member_lru_size": cls.MEMBER_LRU_SIZE,
+            "report_threshold": cls.REPORT_THRESHOLD,
+            "settings_cache_size": cls.SETTINGS_CACHE_SIZE,
+            "settings_cache_ttl": cls.SETTINGS_CACHE_TTL,
+            "sync_commands_globally": cls.SYNC_COMMANDS_GLOBALLY,
+            "loop_lag_interval": cls.LOOP_LAG_INTERVAL,
+            "loop_lag_threshold": cls.LOOP_LAG_THRESHOLD,
+            "max_ratelimit_timeout": cls.MAX_RATELIMIT_TIMEOUT,
+            "deferred_cogs": cls.DEFERRED_COGS
         }
@@ -0,0 +1,157 @@
+from datetime import datetime
+from typing import AsyncIterator, List, Literal, NamedTuple, Optional
+
+from sqlalchemy import select, tuple_
+
+from bounty_hunter_mw2.database import retention
+from bounty_hunter_mw2.database.models import AioSession, Report, normalize_activision
+
+
+
+class Cursor(NamedTuple):
+    """
+    The (timestamp, id) position of a report in the listing, newest first.
+    """
+    timestamp: datetime
+    id: int
+
+
+class ReportPage(NamedTuple):
+    reports: List[Report]
+    has_newer: bool
+    has_older: bool
+
+    @property
+    def first(self) -> Optional[Cursor]:
+        return Cursor(self.reports[0].timestamp, self.reports[0].id) if self.reports else None
+
+    @property
+    def last(self) -> Optional[Cursor]:
+        return Cursor(self.reports[-1].timestamp, self.reports[-1].id) if self.reports else None
+
+
+def reports_query(
+    *,
+    entity=Report,
+    guild_id: Optional[int] = None,
+    suspect_activision: Optional[str] = None,
+    before: Optional[Cursor] = None,
+    after: Optional[Cursor] = None
+):
+    """
+    Build the keyset query over (timestamp, id). Rows come newest first unless after is
+    given, in which case they come oldest first starting right after that cursor.
+    entity can be the hot+archive entity from retention.attached_reports() instead of Report.
+    """
+    query = select(entity)
+    if guild_id is not None:
+        query = query.where(entity.guild_id == guild_id)
+    if suspect_activision is not None:
+        query = query.where(entity.suspect_key == normalize_activision(suspect_activision))
+    key = tuple_(entity.timestamp, entity.id)
+    if after is not None:
+        return query.where(key > tuple_(*after)).order_by(entity.timestamp, entity.id)
+    if before is not None:
+        query = query.where(key < tuple_(*before))
+    return query.order_by(entity.timestamp.desc(), entity.id.desc())
+
+
+def archive_groups(cursor: Optional[Cursor] = None, newest_first: bool = True) -> List[List[str]]:
+    """
+    The archive months that can hold reports on the listed side of a cursor, in groups
+    that can be attached at once. Reports are archived oldest first, so each group only
+    holds reports older than the groups before it when going newest first.
+    """
+    months = retention.list_archives()
+    if cursor is not None:
+        month = cursor.timestamp.strftime("%Y-%m")
+        months = [m for m in months if (m <= month if newest_first else m >= month)]
+    # The hot table is queried with the newest group, so there is always at least one.
+    groups = retention.archive_batches(months) or [[]]
+    return groups if newest_first else groups[::-1]
+
+
+async def iter_reports(
+    *,
+    guild_id: Optional[int] = None,
+    suspect_activision: Optional[str] = None,
+    before: Optional[Cursor] = None,
+    chunk_size: int = 500,
+    include_archive: bool = False
+) -> AsyncIterator[Report]:
+    """
+    Stream every matching report, newest first, holding at most chunk_size rows in memory.
+
+    :param guild_id: Only list reports made in this guild, if given.
+    :param suspect_activision: Only list reports against this suspect, if given.
+    :param before: Start right after this cursor instead of at the newest report.
+    :param chunk_size: The number of rows fetched from the database at a time.
+    :param include_archive: Also list the reports moved to the monthly archives.
+    """
+    filters = {"guild_id": guild_id, "suspect_activision": suspect_activision, "before": before}
+    async with AioSession() as session:
+        if not include_archive:
+            result = await session.stream_scalars(reports_query(**filters).execution_options(yield_per=chunk_size))
+            async for report in result:
+                yield report
+            return
+
+        groups = archive_groups(before)
+        for number, months in enumerate(groups):
+            async with retention.attached_reports(await session.connection(), months, include_hot=number == 0) as entity:
+                result = await session.stream_scalars(
+                    reports_query(entity=entity, **filters).execution_options(yield_per=chunk_size)
+                )
+                async for report in result:
+                    yield report
+                await result.close()
+
+
+async def fetch_page(
+    *,
+    guild_id: Optional[int] = None,
+    suspect_activision: Optional[str] = None,
+    cursor: Optional[Cursor] = None,
+    direction: Literal["older", "newer"] = "older",
+    per_page: int = 10,
+    include_archive: bool = False
+) -> ReportPage:
+    """
+    Fetch one page of reports next to a cursor, newest first.
+    The cost of a page does not depend on how deep into the listing it is.
+
+    :param cursor: The first report of the current page when going newer, its last report when going older.
+        None starts at the newest report.
+    :param direction: Which side of the cursor the page is on.
+    :param per_page: The number of reports per page.
+    :param include_archive: Also list the reports moved to the monthly archives.
+    """
+    newer = direction == "newer" and cursor is not None
+    filters = {"guild_id": guild_id, "suspect_activision": suspect_activision}
+    if newer:
+        filters["after"] = cursor
+    else:
+        filters["before"] = cursor
+
+    async with AioSession() as session:
+        if include_archive:
+            # Only a few archives can be attached at once, the page is filled from one group
+            # after the other until it is full.
+            reports = []
+            groups = archive_groups(cursor, newest_first=not newer)
+            for number, months in enumerate(groups):
+                hot = number == (len(groups) - 1 if newer else 0)
+                async with retention.attached_reports(await session.connection(), months, include_hot=hot) as entity:
+                    query = reports_query(entity=entity, **filters).limit(per_page + 1 - len(reports))
+                    reports.extend((await session.scalars(query)).all())
+                if len(reports) > per_page:
+                    break
+        else:
+            reports = list((await session.scalars(reports_query(**filters).limit(per_page + 1))).all())
+    has_more = len(reports) > per_page
+    reports = reports[:per_page]
+
+    if newer:
+        reports.reverse()
+        return ReportPage(reports, has_newer=has_more, has_older=True)
+    return ReportPage(reports, has_newer=cursor is not None, has_older=has_more)
@@ -0,0 +1,132 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import tempfile
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, IO, List, Literal, NamedTuple, Optional
+
+from sqlalchemy import select
+
+from bounty_hunter_mw2.database.models import AioSession, BotUser, Report
+
+
+
+REPORT_COLUMNS = [
+    "id", "suspect_activision", "platform", "timestamp", "message",
+    "admin_notes", "proof_link", "guild_id", "bot_user_id"
+]
+# passkey_hash is deliberately never exported.
+BOT_USER_COLUMNS = [
+    "id", "guild_id", "twitter_name", "activision_id", "joined_on", "trust_rating", "notoriety"
+]
+CHUNK_SIZE = 1000
+# Discord's default attachment limit, minus room for the gzip trailer and a chunk larger
+# than any before it.
+MAX_PART_BYTES = 8 * 1024 * 1024 - 512 * 1024
+
+
+class ExportPart(NamedTuple):
+    filename: str
+    file: IO[bytes]
+    rows: int
+
+
+class PartWriter(object):
+    """
+    Writes rows as gzip-compressed CSV or JSONL into a temporary file on disk.
+    """
+    def __init__(self, columns: List[str], fmt: Literal["csv", "jsonl"]):
+        self.columns = columns
+        self.fmt = fmt
+        self.file = tempfile.TemporaryFile()
+        self.gzip = gzip.GzipFile(fileobj=self.file, mode="wb")
+        self.text = io.TextIOWrapper(self.gzip, encoding="utf-8", newline="")
+        self.csv = csv.writer(self.text) if fmt == "csv" else None
+        self.rows = 0
+        self.size = 0
+        self.largest_chunk = 0
+        if self.csv is not None:
+            self.csv.writerow(columns)
+
+    @staticmethod
+    def encode(value):
+        return value.isoformat() if isinstance(value, datetime) else value
+
+    def write_rows(self, rows: List[tuple]) -> int:
+        """
+        Write a chunk of rows and return the compressed size of the part so far.
+        The compressor is sync-flushed first, so the size counts every row written.
+        """
+        for row in rows:
+            values = [self.encode(value) for value in row]
+            if self.csv is not None:
+                self.csv.writerow(values)
+            else:
+                self.text.write(json.dumps(dict(zip(self.columns, values)), ensure_ascii=False))
+                self.text.write("\n")
+        self.rows += len(rows)
+        self.text.flush()
+        self.gzip.flush(zlib.Z_SYNC_FLUSH)
+        size = self.file.tell()
+        self.largest_chunk = max(self.largest_chunk, size - self.size)
+        self.size = size
+        return size
+
+    def is_full(self, max_bytes: int) -> bool:
+        """
+        Whether another chunk as large as the largest one so far could take the part past max_bytes.
+        """
+        return self.size + self.largest_chunk > max_bytes
+
+    def close(self) -> IO[bytes]:
+        self.text.close()
+        self.file.seek(0)
+        return self.file
+
+
+async def export_rows(
+    kind: Literal["reports", "users"],
+    fmt: Literal["csv", "jsonl"],
+    *,
+    guild_id: Optional[int] = None,
+    max_part_bytes: int = MAX_PART_BYTES
+) -> AsyncIterator[ExportPart]:
+    """
+    Stream reports or registered users out of the database into compressed files.
+
+    Rows are fetched and written CHUNK_SIZE at a time, so memory use does not depend
+    on the size of the export. A new part is started before the next chunk could take the
+    current one past max_part_bytes, and each part is yielded as soon as it is complete.
+
+    :param kind: Whether to export reports or registered users.
+    :param fmt: The file format, "csv" or "jsonl".
+    :param guild_id: Only export the rows of this guild, if given.
+    :param max_part_bytes: The compressed size a part should stay under.
+    """
+    if kind == "reports":
+        model, columns = Report, REPORT_COLUMNS
+        order = (Report.timestamp, Report.id)
+    else:
+        model, columns = BotUser, BOT_USER_COLUMNS
+        order = (BotUser.id,)
+    query = select(*(getattr(model, column) for column in columns)).order_by(*order)
+    if guild_id is not None:
+        query = query.where(model.guild_id == guild_id)
+
+    stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    number = 1
+    writer = PartWriter(columns, fmt)
+    async with AioSession() as session:
+        result = await session.stream(query.execution_options(yield_per=CHUNK_SIZE))
+        async for partition in result.partitions(CHUNK_SIZE):
+            await asyncio.to_thread(writer.write_rows, [tuple(row) for row in partition])
+            if writer.is_full(max_part_bytes):
+                yield ExportPart(f"{kind}-{stamp}-part{number}.{fmt}.gz", writer.close(), writer.rows)
+                number += 1
+                writer = PartWriter(columns, fmt)
+
+    if writer.rows or number == 1:
+        yield ExportPart(f"{kind}-{stamp}-part{number}.{fmt}.gz", writer.close(), writer.rows)
@@ -0,0 +1,201 @@
+import asyncio
+import heapq
+import math
+from itertools import combinations
+from typing import Dict, Iterable, List, NamedTuple, Set, Tuple
+
+from sqlalchemy import bindparam, select, text
+
+from bounty_hunter_mw2.database.models import AioSession, ActivisionName, normalize_activision
+from bounty_hunter_mw2.helpers.cache import MISSING, LRUCache
+
+
+
+CANDIDATE_QUERY = text(
+    """
+    SELECT activision_name.name_key, activision_name.display, activision_name.occurrences
+    FROM activision_name_trigram
+    JOIN activision_name ON activision_name.id = activision_name_trigram.rowid
+    WHERE activision_name_trigram MATCH :match
+    LIMIT :limit
+    """
+)
+
+DOC_COUNT_QUERY = text(
+    "SELECT term, doc FROM activision_name_trigram_vocab WHERE term IN :terms"
+).bindparams(bindparam("terms", expanding=True))
+
+# The most postings of rare trigrams a lookup searches. The rarest trigrams of the query are
+# used until their postings add up to this, so the cost of a lookup does not grow with the
+# number of names.
+POSTINGS_BUDGET = 50000
+# The most trigrams searched, every pair of them is a term of the MATCH expression.
+MAX_TRIGRAMS = 6
+# The most candidates scored per lookup.
+MAX_CANDIDATES = 20000
+
+# How many names contain each trigram. Counting them reads the whole posting list, and
+# they barely move as names are added, so they are kept for a while.
+doc_counts: LRUCache[int] = LRUCache(maxsize=65536, ttl=3600)
+
+
+class Suggestion(NamedTuple):
+    name_key: str
+    display: str
+    occurrences: int
+    score: float
+
+
+def trigrams(key: str) -> Set[str]:
+    """
+    Return the set of three character substrings of a normalized key.
+    """
+    return {key[i:i + 3] for i in range(len(key) - 2)}
+
+
+def similarity(a: str, b: str) -> float:
+    """
+    Jaccard similarity of the trigram sets of two normalized keys, between 0 and 1.
+    """
+    if a == b:
+        return 1.0
+    ta, tb = trigrams(a), trigrams(b)
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+def required_shared(key: str, min_score: float) -> int:
+    """
+    The number of trigrams a name has to share with key to be at least min_score similar,
+    the union of both trigram sets is never smaller than the trigrams of key.
+    """
+    return max(math.ceil(min_score * len(trigrams(key)) - 1e-9), 1)
+
+
+def candidate_trigrams(
+    counts: Dict[str, int],
+    budget: int = POSTINGS_BUDGET,
+    most: int = MAX_TRIGRAMS
+) -> List[str]:
+    """
+    Pick the trigrams of the query whose postings are searched for candidates, rarest first,
+    until their postings add up to budget. Common trigrams like "the" or "xx" are skipped,
+    they are shared with a large part of the names and say little about them.
+
+    :param counts: The number of names containing each trigram of the query.
+    :param budget: The most postings to search.
+    :param most: The most trigrams to pick.
+    """
+    present = sorted((gram for gram, count in counts.items() if count > 0), key=lambda gram: (counts[gram], gram))
+    chosen: List[str] = []
+    total = 0
+    for gram in present[:most]:
+        if len(chosen) >= 2 and total + counts[gram] > budget:
+            break
+        chosen.append(gram)
+        total += counts[gram]
+    return chosen
+
+
+def candidate_match(grams: List[str], shared: int) -> str:
+    """
+    Build the MATCH expression finding the names that contain two of grams, or one of them
+    when a single shared trigram is enough to be similar.
+
+    A name sharing `shared` of the n trigrams of the query that exist contains two of any
+    n - shared + 2 of them. So when grams hold that many, searching for pairs loses nothing,
+    otherwise only names that share nothing but common trigrams with the query are missed.
+    """
+    if shared < 2 or len(grams) < 2:
+        return " OR ".join(f'"{gram}"' for gram in grams)
+    return " OR ".join(f'("{a}" AND "{b}")' for a, b in combinations(grams, 2))
+
+
+async def trigram_counts(session, grams: Iterable[str]) -> Dict[str, int]:
+    """
+    Get the number of names containing each trigram, from doc_counts when it is known.
+    """
+    counts = {gram: doc_counts.get(gram, MISSING) for gram in grams}
+    missing = [gram for gram, count in counts.items() if count is MISSING]
+    if missing:
+        found = dict((await session.execute(DOC_COUNT_QUERY, {"terms": missing})).all())
+        for gram in missing:
+            counts[gram] = found.get(gram, 0)
+            doc_counts.set(gram, counts[gram])
+    return counts
+
+
+def rank(key: str, rows: Iterable[Tuple[str, str, int]], limit: int, min_score: float) -> List[Suggestion]:
+    """
+    Score the candidates against key with similarity() and keep the best limit of them.
+    """
+    query = trigrams(key)
+    suggestions = []
+    for name_key, display, occurrences in rows:
+        if name_key == key:
+            score = 1.0
+        else:
+            grams = trigrams(name_key)
+            shared = len(query & grams)
+            score = shared / (len(query) + len(grams) - shared) if query and grams else 0.0
+        if score >= min_score:
+            suggestions.append(Suggestion(name_key, display, occurrences, score))
+    return heapq.nlargest(limit, suggestions, key=lambda s: (s.score, s.occurrences))
+
+
+async def find_suggestions(
+    session,
+    key: str,
+    *,
+    limit: int = 5,
+    candidates: int = MAX_CANDIDATES,
+    min_score: float = 0.2
+) -> List[Suggestion]:
+    """
+    Find the names that look most like a normalized key, best match first.
+
+    :param session: The session or connection the queries run on.
+    :param key: The normalized Activision ID.
+    """
+    if len(key) < 3:
+        result = await session.execute(
+            select(ActivisionName.name_key, ActivisionName.display, ActivisionName.occurrences)
+            .where(ActivisionName.name_key == key)
+        )
+        return rank(key, result.all(), limit, min_score)
+
+    counts = await trigram_counts(session, trigrams(key))
+    grams = candidate_trigrams(counts)
+    if not grams:
+        return []
+    match = candidate_match(grams, required_shared(key, min_score))
+    rows = (await session.execute(CANDIDATE_QUERY, {"match": match, "limit": candidates})).all()
+    # Thousands of candidates can be scored, which would hold up the event loop.
+    return await asyncio.to_thread(rank, key, rows, limit, min_score)
+
+
+async def suggest_activision(
+    activision_id: str,
+    *,
+    limit: int = 5,
+    candidates: int = MAX_CANDIDATES,
+    min_score: float = 0.2
+) -> List[Suggestion]:
+    """
+    Find the Activision IDs that look most like the one given, best match first.
+
+    The trigram index narrows millions of names down to the candidates sharing two of the
+    rarest trigrams of the query, only those candidates are scored in Python.
+
+    :param activision_id: The Activision ID as typed by a user.
+    :param limit: The number of suggestions to return.
+    :param candidates: The most candidates fetched from the index before ranking.
+    :param min_score: Suggestions less similar than this are dropped.
+    """
+    key = normalize_activision(activision_id)
+    if not key:
+        return []
+
+    async with AioSession() as session:
+        return await find_suggestions(session, key, limit=limit, candidates=candidates, min_score=min_score)
@@ -1,10 +1,14 @@
+import os
+import re
+import unicodedata
 from typing import Optional, Literal
 
 from hashlib import sha256
 from datetime import datetime, timedelta
 
-from sqlalchemy import BigInteger, Column, Integer, Boolean, DateTime, Date, ForeignKey, Table, String, Float
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import BigInteger, Column, Integer, Boolean, DateTime, Date, ForeignKey, Index, Table, String, Float, event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship, validates
 from discord import Member, User, Message
 
@@ -13,6 +17,42 @@ from discord import Member, User, Message
 Base = declarative_base()
 
 
+# Characters reporters commonly swap for look-alikes, mapped to one canonical letter.
+CONFUSABLES = str.maketrans({
+    "0": "o",
+    "1": "l",
+    "i": "l",
+    "|": "l",
+    "!": "l",
+    "3": "e",
+    "4": "a",
+    "@": "a",
+    "5": "s",
+    "$": "s",
+    "7": "t",
+    "8": "b"
+})
+DISCRIMINATOR_RE = re.compile(r"#\d*$")
+NON_ALNUM_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_activision(activision_id: Optional[str]) -> Optional[str]:
+    """
+    Reduce an Activision ID to the key used for duplicate and fuzzy lookups.
+    Case, accents, the #1234 discriminator, separators and look-alike characters
+    are all ignored, so "Sn1per_G0d#123456" and "sniper god" share the key "snlpergod".
+
+    :param activision_id: The Activision ID as typed by a user.
+    """
+    if activision_id is None:
+        return None
+    key = unicodedata.normalize("NFKD", activision_id.strip())
+    key = "".join(c for c in key if not unicodedata.combining(c))
+    key = DISCRIMINATOR_RE.sub("", key.casefold())
+    key = key.translate(CONFUSABLES)
+    return NON_ALNUM_RE.sub("", key)
+
+
 class BotUser(Base):
     """
     A Database Model class to represent registered users of the bot.
@@ -23,11 +63,14 @@ class BotUser(Base):
     guild_id = Column(BigInteger, index=True)
     twitter_name = Column(String(32), index=True, unique=True)
     activision_id = Column(String(128), index=True, unique=True)
+    activision_key = Column(String(128), index=True)
     passkey_hash = Column(String(128))
     joined_on = Column(DateTime)
     trust_rating = Column(Float, default=0.0)
     notoriety = Column(Float, default=0.0)
 
+    reports = relationship("Report", back_populates="bot_user")
+
     def __init__(
         self,
         *,
@@ -43,15 +86,26 @@ class BotUser(Base):
         self.twitter_name = twitter_name
         self.joined_on = datetime.utcnow()
 
+    @validates("activision_id")
+    def validate_activision_id(self, key, activision_id):
+        self.activision_key = normalize_activision(activision_id)
+        return activision_id
 
 
 class Report(Base):
     """ The id and primary key for this table should be a big integer [id of the message that made the report]"""
     __tablename__ = "report"
+    __table_args__ = (
+        Index("ix_report_suspect_key_bot_user_id", "suspect_key", "bot_user_id"),
+        Index("ix_report_suspect_key_guild_id", "suspect_key", "guild_id"),
+        Index("ix_report_guild_id_timestamp_id", "guild_id", "timestamp", "id"),
+        Index("ix_report_suspect_key_timestamp_id", "suspect_key", "timestamp", "id"),
+    )
     id = Column(BigInteger, primary_key=True, autoincrement=False)
     suspect_activision = Column(String(32), index=True)
+    suspect_key = Column(String(32), index=True)
     platform = Column(String(32), index=True, default="Unknown")
-    timestamp = Column(DateTime, index=True)
+    timestamp = Column(DateTime, index=True, default=datetime.utcnow)
 
     message = Column(String(144), default="")
     admin_notes = Column(String(256), default="")
@@ -80,22 +134,393 @@ class Report(Base):
         self.message = message
         self.proof_link = proof_link
 
-o    
+    @validates("suspect_activision")
+    def validate_suspect_activision(self, key, suspect_activision):
+        self.suspect_key = normalize_activision(suspect_activision)
+        return suspect_activision
+
+class Blacklist(Base):
+    """
+    A Database Model class for users that are not allowed to use the bot.
+    user_id is the Unique ID of the discord User object.
+    """
+    __tablename__ = "blacklist"
+    user_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class GuildSettings(Base):
+    """
+    A Database Model class for the settings a guild has changed from the defaults,
+    a column left as None means the default from Config is used.
+    """
+    __tablename__ = "guild_settings"
+    guild_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    prefix = Column(String(16))
+    report_channel_id = Column(BigInteger)
+    report_threshold = Column(Integer)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class CommandSync(Base):
+    """
+    A Database Model class for the hash of the application command tree that was last synced,
+    scope is "global" or "guild:<guild id>".
+    """
+    __tablename__ = "command_sync"
+    scope = Column(String(32), primary_key=True)
+    tree_hash = Column(String(64), nullable=False)
+    synced_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ActivisionName(Base):
+    """
+    A Database Model class holding every distinct normalized Activision ID seen in
+    reports or registrations, with a trigram index over it for "did you mean" lookups.
+    """
+    __tablename__ = "activision_name"
+    id = Column(Integer, primary_key=True)
+    name_key = Column(String(128), unique=True, nullable=False)
+    display = Column(String(128))
+    occurrences = Column(Integer, default=0)
+
+
+class SuspectSummary(Base):
+    """
+    A Database Model class holding per-suspect report aggregates, keyed by the
+    normalized Activision ID. Rows are maintained by triggers on report inserts and
+    deletes, so they are always committed in the same transaction as the report.
+    Reports moved to the archive are still counted.
+    """
+    __tablename__ = "suspect_summary"
+    suspect_key = Column(String(32), primary_key=True)
+    display = Column(String(32))
+    report_count = Column(Integer, default=0, index=True)
+    playstation_count = Column(Integer, default=0)
+    xbox_count = Column(Integer, default=0)
+    battlenet_count = Column(Integer, default=0)
+    unknown_count = Column(Integer, default=0)
+    distinct_reporters = Column(Integer, default=0)
+    distinct_guilds = Column(Integer, default=0)
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime)
+
+
+class SuspectReporter(Base):
+    """
+    A Database Model class counting the reports each user made about a suspect, archived
+    reports included, so distinct_reporters of suspect_summary does not depend on the hot table.
+    """
+    __tablename__ = "suspect_reporter"
+    suspect_key = Column(String(32), primary_key=True)
+    bot_user_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    report_count = Column(Integer, default=0)
+
+
+class SuspectGuild(Base):
+    """
+    A Database Model class counting the reports about a suspect made in each guild, archived
+    reports included, so distinct_guilds of suspect_summary does not depend on the hot table.
+    """
+    __tablename__ = "suspect_guild"
+    suspect_key = Column(String(32), primary_key=True)
+    guild_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    report_count = Column(Integer, default=0)
+
+
+class ScoringRun(Base):
+    """
+    A Database Model class recording each pass of the trust/notoriety scoring job,
+    incremental passes rescore the users touched since the last finished run.
+    """
+    __tablename__ = "scoring_run"
+    id = Column(Integer, primary_key=True)
+    mode = Column(String(16))
+    started_at = Column(DateTime, index=True)
+    finished_at = Column(DateTime)
+    users_scored = Column(Integer, default=0)
+
+
+# Admin notes are left out, every user can search the index.
+REPORT_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS report_fts USING fts5(
+        suspect_activision, message,
+        content='report', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS report_fts_insert AFTER INSERT ON report BEGIN
+        INSERT INTO report_fts(rowid, suspect_activision, message)
+        VALUES (new.id, new.suspect_activision, new.message);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS report_fts_delete AFTER DELETE ON report BEGIN
+        INSERT INTO report_fts(report_fts, rowid, suspect_activision, message)
+        VALUES ('delete', old.id, old.suspect_activision, old.message);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS report_fts_update AFTER UPDATE OF suspect_activision, message ON report BEGIN
+        INSERT INTO report_fts(report_fts, rowid, suspect_activision, message)
+        VALUES ('delete', old.id, old.suspect_activision, old.message);
+        INSERT INTO report_fts(rowid, suspect_activision, message)
+        VALUES (new.id, new.suspect_activision, new.message);
+    END
+    """
+]
+
+# Drops the index and its triggers, for databases whose index still covers admin_notes.
+REPORT_FTS_DROP = [
+    "DROP TRIGGER IF EXISTS report_fts_insert",
+    "DROP TRIGGER IF EXISTS report_fts_delete",
+    "DROP TRIGGER IF EXISTS report_fts_update",
+    "DROP TABLE IF EXISTS report_fts"
+]
+
+
+ACTIVISION_NAME_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS activision_name_trigram USING fts5(
+        name_key, content='activision_name', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    # The number of names containing each trigram, fuzzy lookups search the rarest ones.
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS activision_name_trigram_vocab USING fts5vocab(
+        activision_name_trigram, 'row'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS activision_name_trigram_insert AFTER INSERT ON activision_name BEGIN
+        INSERT INTO activision_name_trigram(rowid, name_key) VALUES (new.id, new.name_key);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS activision_name_trigram_delete AFTER DELETE ON activision_name BEGIN
+        INSERT INTO activision_name_trigram(activision_name_trigram, rowid, name_key)
+        VALUES ('delete', old.id, old.name_key);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS report_activision_name AFTER INSERT ON report
+    WHEN new.suspect_key IS NOT NULL AND new.suspect_key != '' BEGIN
+        INSERT INTO activision_name(name_key, display, occurrences)
+        VALUES (new.suspect_key, new.suspect_activision, 1)
+        ON CONFLICT(name_key) DO UPDATE SET occurrences = occurrences + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS bot_user_activision_name AFTER INSERT ON bot_user
+    WHEN new.activision_key IS NOT NULL AND new.activision_key != '' BEGIN
+        INSERT INTO activision_name(name_key, display, occurrences)
+        VALUES (new.activision_key, new.activision_id, 1)
+        ON CONFLICT(name_key) DO UPDATE SET occurrences = occurrences + 1;
+    END
+    """
+]
+
+
+SUSPECT_SUMMARY_DDL = [
+    # Holds a row while reports are being moved to the archive, see retention.archive_batch.
+    "CREATE TABLE IF NOT EXISTS report_archiving (id INTEGER PRIMARY KEY)",
+    # Both triggers are recreated so databases made before suspect_reporter and suspect_guild
+    # existed stop counting distinct reporters and guilds from the hot table.
+    "DROP TRIGGER IF EXISTS suspect_summary_insert",
+    """
+    CREATE TRIGGER suspect_summary_insert AFTER INSERT ON report
+    WHEN new.suspect_key IS NOT NULL BEGIN
+        INSERT INTO suspect_reporter(suspect_key, bot_user_id, report_count)
+        SELECT new.suspect_key, new.bot_user_id, 1 WHERE new.bot_user_id IS NOT NULL
+        ON CONFLICT(suspect_key, bot_user_id) DO UPDATE SET report_count = report_count + 1;
+        INSERT INTO suspect_guild(suspect_key, guild_id, report_count)
+        SELECT new.suspect_key, new.guild_id, 1 WHERE new.guild_id IS NOT NULL
+        ON CONFLICT(suspect_key, guild_id) DO UPDATE SET report_count = report_count + 1;
+        INSERT OR IGNORE INTO suspect_summary(
+            suspect_key, display, report_count, playstation_count, xbox_count, battlenet_count,
+            unknown_count, distinct_reporters, distinct_guilds, first_seen, last_seen
+        ) VALUES (new.suspect_key, new.suspect_activision, 0, 0, 0, 0, 0, 0, 0, new.timestamp, new.timestamp);
+        UPDATE suspect_summary SET
+            display = new.suspect_activision,
+            report_count = report_count + 1,
+            playstation_count = playstation_count + (new.platform IS 'Playstation'),
+            xbox_count = xbox_count + (new.platform IS 'Xbox'),
+            battlenet_count = battlenet_count + (new.platform IS 'Battle.net'),
+            unknown_count = unknown_count + (coalesce(new.platform, '') NOT IN ('Playstation', 'Xbox', 'Battle.net')),
+            distinct_reporters = (SELECT count(*) FROM suspect_reporter WHERE suspect_key = new.suspect_key),
+            distinct_guilds = (SELECT count(*) FROM suspect_guild WHERE suspect_key = new.suspect_key),
+            first_seen = CASE WHEN first_seen IS NULL OR new.timestamp < first_seen THEN new.timestamp ELSE first_seen END,
+            last_seen = CASE WHEN last_seen IS NULL OR new.timestamp > last_seen THEN new.timestamp ELSE last_seen END
+        WHERE suspect_key = new.suspect_key;
+    END
+    """,
+    "DROP TRIGGER IF EXISTS suspect_summary_delete",
+    # Archived reports can not be read from a trigger, so first_seen and last_seen are only
+    # looked up again in the hot table when the deleted report was the first or the last one.
+    """
+    CREATE TRIGGER suspect_summary_delete AFTER DELETE ON report
+    WHEN old.suspect_key IS NOT NULL AND NOT EXISTS (SELECT 1 FROM report_archiving) BEGIN
+        UPDATE suspect_reporter SET report_count = report_count - 1
+        WHERE suspect_key = old.suspect_key AND bot_user_id = old.bot_user_id;
+        DELETE FROM suspect_reporter
+        WHERE suspect_key = old.suspect_key AND bot_user_id = old.bot_user_id AND report_count <= 0;
+        UPDATE suspect_guild SET report_count = report_count - 1
+        WHERE suspect_key = old.suspect_key AND guild_id = old.guild_id;
+        DELETE FROM suspect_guild
+        WHERE suspect_key = old.suspect_key AND guild_id = old.guild_id AND report_count <= 0;
+        UPDATE suspect_summary SET
+            report_count = report_count - 1,
+            playstation_count = playstation_count - (old.platform IS 'Playstation'),
+            xbox_count = xbox_count - (old.platform IS 'Xbox'),
+            battlenet_count = battlenet_count - (old.platform IS 'Battle.net'),
+            unknown_count = unknown_count - (coalesce(old.platform, '') NOT IN ('Playstation', 'Xbox', 'Battle.net')),
+            distinct_reporters = (SELECT count(*) FROM suspect_reporter WHERE suspect_key = old.suspect_key),
+            distinct_guilds = (SELECT count(*) FROM suspect_guild WHERE suspect_key = old.suspect_key),
+            first_seen = CASE WHEN old.timestamp > first_seen THEN first_seen ELSE coalesce(
+                (SELECT min(timestamp) FROM report WHERE suspect_key = old.suspect_key), first_seen
+            ) END,
+            last_seen = CASE WHEN old.timestamp < last_seen THEN last_seen ELSE coalesce(
+                (SELECT max(timestamp) FROM report WHERE suspect_key = old.suspect_key), last_seen
+            ) END
+        WHERE suspect_key = old.suspect_key;
+        DELETE FROM suspect_summary WHERE suspect_key = old.suspect_key AND report_count <= 0;
+    END
+    """
+]
+
+
+@event.listens_for(Base.metadata, "after_create")
+def create_report_fts(target, connection, **kw):
+    """
+    Create the FTS5 index over report and the triggers that keep it in sync.
+    Reports that already existed before the index was created are indexed once.
+    An index made when admin notes were still searchable is replaced.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    exists = connection.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'report_fts'"
+    ).scalar()
+    if exists is not None and "admin_notes" in exists:
+        for statement in REPORT_FTS_DROP:
+            connection.exec_driver_sql(statement)
+        exists = None
+    for statement in REPORT_FTS_DDL:
+        connection.exec_driver_sql(statement)
+    if exists is None:
+        connection.exec_driver_sql("INSERT INTO report_fts(report_fts) VALUES ('rebuild')")
+
 
-engine = create_async_engine("sqlite+aiosqlite:///data.db")
+@event.listens_for(Base.metadata, "after_create")
+def create_activision_name_index(target, connection, **kw):
+    """
+    Create the trigram index over activision_name and the triggers that fill it
+    from report and bot_user inserts.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    for statement in ACTIVISION_NAME_DDL:
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def create_suspect_summary_triggers(target, connection, **kw):
+    """
+    Create the triggers that keep suspect_summary up to date with report.
+    When suspect_reporter and suspect_guild are new they are filled once from the hot table,
+    a summary rebuild also counts the reports that were archived before they existed.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    for statement in SUSPECT_SUMMARY_DDL:
+        connection.exec_driver_sql(statement)
+    for table, column in (("suspect_reporter", "bot_user_id"), ("suspect_guild", "guild_id")):
+        if connection.exec_driver_sql(f"SELECT 1 FROM {table} LIMIT 1").first() is None:
+            connection.exec_driver_sql(
+                f"""
+                INSERT INTO {table}(suspect_key, {column}, report_count)
+                SELECT suspect_key, {column}, count(*) FROM report
+                WHERE suspect_key IS NOT NULL AND {column} IS NOT NULL
+                GROUP BY suspect_key, {column}
+                """
+            )
+
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite+aiosqlite:///data.db")
+
+
+def make_engine(
+    url: str = DATABASE_URL,
+    *,
+    pool_size: int = int(os.environ.get("DATABASE_POOL_SIZE", 5)),
+    max_overflow: int = int(os.environ.get("DATABASE_MAX_OVERFLOW", 10)),
+    cache_size_kib: int = int(os.environ.get("DATABASE_CACHE_KIB", 65536)),
+    mmap_size: int = int(os.environ.get("DATABASE_MMAP_SIZE", 268435456)),
+    busy_timeout_ms: int = int(os.environ.get("DATABASE_BUSY_TIMEOUT_MS", 5000)),
+    wal: bool = os.environ.get("DATABASE_WAL", "1") != "0"
+) -> AsyncEngine:
+    """
+    Create the async engine used by the bot.
+
+    Connections are kept in a pool and reused, and every new SQLite connection gets
+    its PRAGMAs applied once on connect. In WAL mode readers do not block behind a writer.
+
+    :param url: The SQLAlchemy database URL.
+    :param pool_size: The number of connections kept open in the pool.
+    :param max_overflow: The number of extra connections allowed under load.
+    :param cache_size_kib: The page cache size of each connection, in KiB.
+    :param mmap_size: The number of bytes of the database file to memory map.
+    :param busy_timeout_ms: How long a connection waits on a locked database.
+    :param wal: Whether to use write-ahead logging.
+    """
+    new_engine = create_async_engine(
+        url,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow
+    )
+
+    if new_engine.dialect.name == "sqlite":
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            if wal:
+                cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA cache_size=-{int(cache_size_kib)}")
+            cursor.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+            cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            cursor.close()
+
+    return new_engine
+
+
+engine = make_engine()
 AioSession = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
 
 async def init_db():
-    """ create the tables and columns if they don'st exist
+    """ create the tables and columns if they don't exist.
+    The engine and its pooled connections stay open until close_db() is called.
     """
     async with engine.begin() as conn:
         #wait conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
+
+
+async def close_db():
+    """ close every pooled connection, called once when the bot shuts down.
+    """
     await engine.dispose()
 
 
 if __name__ == "__main__":
     import asyncio
-    asyncio.run(init_db())
+    async def main():
+        await init_db()
+        await close_db()
+
+    asyncio.run(main())
 
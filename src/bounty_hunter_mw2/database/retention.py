@@ -0,0 +1,179 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import MetaData, select, text, union_all
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.orm import aliased
+
+from bounty_hunter_mw2.database.models import Report, engine
+
+
+
+RETENTION_DAYS = int(os.environ.get("REPORT_RETENTION_DAYS", 365))
+ARCHIVE_DIR = os.environ.get("REPORT_ARCHIVE_DIR", "archive")
+# SQLite allows 10 attached databases by default, main counts as one.
+MAX_ATTACHED = 9
+
+
+def archive_alias(month: str) -> str:
+    return f"archive_{month.replace('-', '_')}"
+
+
+def archive_path(month: str) -> str:
+    return os.path.join(ARCHIVE_DIR, f"report-{month}.db")
+
+
+def list_archives() -> List[str]:
+    """
+    Return the months ("YYYY-MM") that have an archive database, oldest first.
+    """
+    if not os.path.isdir(ARCHIVE_DIR):
+        return []
+    return sorted(
+        name[len("report-"):-len(".db")]
+        for name in os.listdir(ARCHIVE_DIR)
+        if name.startswith("report-") and name.endswith(".db")
+    )
+
+
+async def attach(conn: AsyncConnection, month: str) -> str:
+    alias = archive_alias(month)
+    await conn.exec_driver_sql(f"ATTACH DATABASE ? AS {alias}", (archive_path(month),))
+    return alias
+
+
+async def detach(conn: AsyncConnection, alias: str) -> None:
+    await conn.exec_driver_sql(f"DETACH DATABASE {alias}")
+
+
+def archive_batches(months: Optional[List[str]] = None) -> List[List[str]]:
+    """
+    Split the archive months into groups of at most MAX_ATTACHED, newest first, so
+    every group can be attached to a connection at once.
+
+    :param months: The archive months, every archive by default.
+    """
+    months = list_archives() if months is None else sorted(months)
+    return [
+        months[max(end - MAX_ATTACHED, 0):end]
+        for end in range(len(months), 0, -MAX_ATTACHED)
+    ]
+
+
+@asynccontextmanager
+async def attached_reports(conn: AsyncConnection, months: Optional[List[str]] = None, include_hot: bool = True):
+    """
+    Attach archive databases to a connection and yield an entity that can be queried like
+    Report but spans the hot table and every attached archive.
+
+    Only MAX_ATTACHED archives can be attached at once, when more months are given the
+    most recent ones are used. archive_batches() splits the months to go through all of them.
+
+    :param conn: The connection to attach the archives to, no write transaction may be open on it.
+    :param months: The archive months to include, the most recent ones by default.
+    :param include_hot: Also include the hot report table.
+    """
+    months = (list_archives() if months is None else months)[-MAX_ATTACHED:]
+    aliases = []
+    try:
+        for month in months:
+            aliases.append(await attach(conn, month))
+        tables = ([Report.__table__] if include_hot else []) + [
+            Report.__table__.to_metadata(MetaData(), schema=alias) for alias in aliases
+        ]
+        selects = [select(table) for table in tables]
+        combined = (union_all(*selects) if len(selects) > 1 else selects[0]).subquery("report_all")
+        # Matched by name, the columns of an archive table do not derive from the report table.
+        yield aliased(Report, combined, adapt_on_names=True)
+    finally:
+        for alias in aliases:
+            await detach(conn, alias)
+
+
+async def archive_batch(conn: AsyncConnection, cutoff: datetime, batch_size: int) -> int:
+    """
+    Move up to batch_size of the oldest reports before cutoff into their monthly archive.
+    All moved reports come from the same month, the move is one short transaction.
+
+    :return: The number of reports moved.
+    """
+    oldest = (await conn.execute(
+        select(Report.timestamp).where(Report.timestamp < cutoff).order_by(Report.timestamp).limit(1)
+    )).scalar()
+    if oldest is None:
+        return 0
+
+    month_start = oldest.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    month_end = (month_start + timedelta(days=32)).replace(day=1)
+    month = month_start.strftime("%Y-%m")
+    alias = await attach(conn, month)
+    try:
+        await conn.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {alias}.report AS SELECT * FROM main.report WHERE 0"
+        )
+        await conn.exec_driver_sql(f"CREATE UNIQUE INDEX IF NOT EXISTS {alias}.ix_report_id ON report (id)")
+        await conn.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS {alias}.ix_report_timestamp_id ON report (timestamp, id)"
+        )
+        await conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {alias}.ix_report_guild_id ON report (guild_id)")
+        await conn.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS {alias}.ix_report_suspect_key ON report (suspect_key)"
+        )
+        await conn.commit()
+
+        ids = (await conn.execute(
+            select(Report.id)
+            .where(Report.timestamp >= month_start, Report.timestamp < min(month_end, cutoff))
+            .order_by(Report.timestamp, Report.id)
+            .limit(batch_size)
+        )).scalars().all()
+        if ids:
+            id_params = {f"id{i}": report_id for i, report_id in enumerate(ids)}
+            placeholders = ", ".join(f":{name}" for name in id_params)
+            await conn.execute(
+                text(f"INSERT OR IGNORE INTO {alias}.report SELECT * FROM main.report WHERE id IN ({placeholders})"),
+                id_params
+            )
+            # The guard row keeps the suspect_summary delete trigger from counting the archived
+            # reports out, it only exists inside this transaction.
+            await conn.exec_driver_sql("INSERT INTO main.report_archiving DEFAULT VALUES")
+            await conn.execute(text(f"DELETE FROM main.report WHERE id IN ({placeholders})"), id_params)
+            await conn.exec_driver_sql("DELETE FROM main.report_archiving")
+        await conn.commit()
+        return len(ids)
+    finally:
+        await detach(conn, alias)
+
+
+async def archive_old_reports(
+    max_age_days: int = RETENTION_DAYS,
+    *,
+    batch_size: int = 500,
+    pause: float = 0.05
+) -> int:
+    """
+    Move every report older than max_age_days out of the hot table into monthly archive
+    databases, a small batch at a time so the write lock is never held for long.
+
+    The search index only covers the reports still in the hot table. suspect_summary keeps
+    counting the archived reports, so /suspect and the scoring corroboration do not change
+    when reports get old.
+
+    :param max_age_days: Reports older than this many days are archived.
+    :param batch_size: The number of reports moved per transaction.
+    :param pause: Seconds to wait between batches so other writers get the lock.
+    :return: The total number of reports moved.
+    """
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+    total = 0
+    async with engine.connect() as conn:
+        while True:
+            moved = await archive_batch(conn, cutoff, batch_size)
+            if moved == 0:
+                return total
+            total += moved
+            await asyncio.sleep(pause)
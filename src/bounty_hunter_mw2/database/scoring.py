@@ -0,0 +1,218 @@
+import asyncio
+from datetime import datetime
+from typing import Literal, NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy import func, or_, select, update
+
+from bounty_hunter_mw2.database.models import AioSession, BotUser, Report, ScoringRun, SuspectSummary
+
+
+
+CHUNK_SIZE = 100000
+UPDATE_CHUNK_SIZE = 10000
+# A report counts as corroborated once this many different users reported the suspect.
+CORROBORATION_THRESHOLD = 2
+# Trust given to reports from users that are not registered with the bot.
+UNREGISTERED_TRUST = 0.5
+NOTORIETY_HALF_LIFE_DAYS = 90.0
+
+
+class ReportColumns(NamedTuple):
+    reporter: np.ndarray
+    suspect_user: np.ndarray
+    corroborated: np.ndarray
+    age_days: np.ndarray
+
+
+def positions(sorted_ids: np.ndarray, ids: np.ndarray):
+    """
+    Find where each of ids sits in sorted_ids.
+
+    :return: The positions, and a mask of the ids that were actually found.
+    """
+    if len(sorted_ids) == 0:
+        return np.zeros(len(ids), dtype=np.int64), np.zeros(len(ids), dtype=bool)
+    pos = np.searchsorted(sorted_ids, ids).clip(max=len(sorted_ids) - 1)
+    return pos, sorted_ids[pos] == ids
+
+
+def compute_scores(
+    user_ids: np.ndarray,
+    stored_trust: np.ndarray,
+    rescore: np.ndarray,
+    columns: ReportColumns,
+    half_life_days: float = NOTORIETY_HALF_LIFE_DAYS
+):
+    """
+    Compute trust ratings and notoriety for every user at once.
+
+    The trust rating of a user is the smoothed share of their reports that other users
+    corroborated. The notoriety of a user is the sum of the reports against their
+    Activision ID, weighted by the trust of each reporter and decayed with age.
+
+    :param user_ids: The sorted IDs of all registered users.
+    :param stored_trust: The trust rating currently saved for each user.
+    :param rescore: A mask of the users whose scores should be recomputed.
+    :param columns: The report columns covering every user in rescore.
+    :return: The trust and notoriety arrays, aligned with user_ids.
+    """
+    n = len(user_ids)
+    reporter_pos, reporter_found = positions(user_ids, columns.reporter)
+    reports_made = np.bincount(reporter_pos[reporter_found], minlength=n)
+    corroborated = np.bincount(
+        reporter_pos[reporter_found],
+        weights=columns.corroborated[reporter_found],
+        minlength=n
+    )
+    trust = np.where(rescore, (corroborated + 1.0) / (reports_made + 2.0), stored_trust)
+
+    reporter_trust = np.where(reporter_found, trust[reporter_pos], UNREGISTERED_TRUST)
+    weight = reporter_trust * np.exp2(-columns.age_days / half_life_days)
+    suspect_pos, suspect_found = positions(user_ids, columns.suspect_user)
+    notoriety = np.bincount(suspect_pos[suspect_found], weights=weight[suspect_found], minlength=n)
+    return trust, notoriety
+
+
+def report_columns_query(since: Optional[datetime]):
+    """
+    Build the query returning one row per report relevant to the users being rescored.
+    With since set, only reports of users connected to a suspect reported after it are returned.
+
+    activision_key is not unique, look-alike IDs share it. The reports against a key are
+    only counted for the user with the lowest ID among them, so no report is counted twice.
+    """
+    suspect_user = (
+        select(BotUser.activision_key, func.min(BotUser.id).label("id"))
+        .where(BotUser.activision_key.is_not(None))
+        .group_by(BotUser.activision_key)
+        .subquery()
+    )
+    query = (
+        select(
+            func.coalesce(Report.bot_user_id, -1),
+            func.coalesce(suspect_user.c.id, -1),
+            func.coalesce(SuspectSummary.distinct_reporters, 0),
+            func.coalesce(func.strftime("%s", Report.timestamp), 0)
+        )
+        .select_from(Report)
+        .outerjoin(SuspectSummary, SuspectSummary.suspect_key == Report.suspect_key)
+        .outerjoin(suspect_user, suspect_user.c.activision_key == Report.suspect_key)
+    )
+    if since is not None:
+        affected = affected_users_query(since)
+        query = query.where(or_(
+            Report.bot_user_id.in_(affected),
+            suspect_user.c.id.in_(affected)
+        ))
+    return query
+
+
+def affected_users_query(since: datetime):
+    """
+    Build the query returning the users whose scores can have changed since a given time:
+    everyone who reported a suspect that got a new report, and the suspects themselves.
+    """
+    touched_keys = select(Report.suspect_key).where(Report.timestamp > since).distinct()
+    return (
+        select(Report.bot_user_id)
+        .where(Report.suspect_key.in_(touched_keys), Report.bot_user_id.is_not(None))
+        .union(select(BotUser.id).where(BotUser.activision_key.in_(touched_keys)))
+    )
+
+
+def to_report_columns(rows, now: float) -> ReportColumns:
+    """
+    Turn report rows into columns. The IDs are Discord snowflakes, which do not fit in the
+    mantissa of a float64, so they are kept as int64 and only the scores are made floats.
+
+    :param rows: The rows of report_columns_query.
+    :param now: The current UNIX timestamp, used for the age of the reports.
+    """
+    count = len(rows)
+    reporter = np.fromiter((row[0] for row in rows), dtype=np.int64, count=count)
+    suspect_user = np.fromiter((row[1] for row in rows), dtype=np.int64, count=count)
+    distinct_reporters = np.fromiter((row[2] for row in rows), dtype=np.int64, count=count)
+    timestamp = np.fromiter((float(row[3]) for row in rows), dtype=np.float64, count=count)
+    return ReportColumns(
+        reporter=reporter,
+        suspect_user=suspect_user,
+        corroborated=(distinct_reporters >= CORROBORATION_THRESHOLD).astype(np.float64),
+        age_days=np.maximum(now - timestamp, 0.0) / 86400.0
+    )
+
+
+async def fetch_report_columns(session, since: Optional[datetime]) -> ReportColumns:
+    """
+    Stream the report columns in chunks of CHUNK_SIZE rows into NumPy arrays.
+    """
+    now = datetime.utcnow().timestamp()
+    chunks = []
+    result = await session.stream(
+        report_columns_query(since).execution_options(yield_per=CHUNK_SIZE)
+    )
+    async for partition in result.partitions(CHUNK_SIZE):
+        chunks.append(to_report_columns(partition, now))
+    if not chunks:
+        return to_report_columns([], now)
+    return ReportColumns(*(np.concatenate(column) for column in zip(*chunks)))
+
+
+async def run_scoring(mode: Literal["full", "incremental"] = "full") -> int:
+    """
+    Recompute BotUser.trust_rating and BotUser.notoriety and write them back in bulk.
+
+    The database reads are asynchronous and the NumPy work runs in a worker thread,
+    so the event loop is never blocked for long. The scores are written and committed in
+    chunks of UPDATE_CHUNK_SIZE users.
+
+    :param mode: "full" rescores everyone, "incremental" only the users touched since the last run.
+    :return: The number of users that were rescored.
+    """
+    started_at = datetime.utcnow()
+    async with AioSession() as session:
+        since = None
+        if mode == "incremental":
+            since = await session.scalar(
+                select(func.max(ScoringRun.started_at)).where(ScoringRun.finished_at.is_not(None))
+            )
+            if since is None:
+                mode = "full"
+
+        users = (await session.execute(
+            select(BotUser.id, func.coalesce(BotUser.trust_rating, UNREGISTERED_TRUST)).order_by(BotUser.id)
+        )).all()
+        user_ids = np.array([row[0] for row in users], dtype=np.int64)
+        stored_trust = np.array([row[1] for row in users], dtype=np.float64)
+        if since is None:
+            rescore = np.ones(len(user_ids), dtype=bool)
+        else:
+            affected = (await session.execute(affected_users_query(since))).scalars().all()
+            rescore = np.isin(user_ids, np.array(affected, dtype=np.int64))
+
+        columns = await fetch_report_columns(session, since)
+        trust, notoriety = await asyncio.to_thread(
+            compute_scores, user_ids, stored_trust, rescore, columns
+        )
+
+        indexes = np.flatnonzero(rescore)
+        for offset in range(0, len(indexes), UPDATE_CHUNK_SIZE):
+            chunk = indexes[offset:offset + UPDATE_CHUNK_SIZE]
+            await session.execute(
+                update(BotUser),
+                [
+                    {"id": int(user_ids[i]), "trust_rating": float(trust[i]), "notoriety": float(notoriety[i])}
+                    for i in chunk
+                ]
+            )
+            # Committing every chunk releases the SQLite write lock between them, so the
+            # reports and commands that write in the meantime are not blocked for the whole pass.
+            await session.commit()
+        session.add(ScoringRun(
+            mode=mode,
+            started_at=started_at,
+            finished_at=datetime.utcnow(),
+            users_scored=len(indexes)
+        ))
+        await session.commit()
+    return len(indexes)
@@ -0,0 +1,89 @@
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import DateTime, text
+
+from bounty_hunter_mw2.database.models import AioSession
+
+
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# bm25() weights for suspect_activision and message.
+SEARCH_QUERY = text(
+    """
+    SELECT report.id, report.suspect_activision, report.platform, report.timestamp,
+           report.guild_id, snippet(report_fts, 1, '**', '**', '...', 12) AS excerpt
+    FROM report_fts
+    JOIN report ON report.id = report_fts.rowid
+    WHERE report_fts MATCH :match
+      AND (:guild_id IS NULL OR report.guild_id = :guild_id)
+    ORDER BY bm25(report_fts, 10.0, 1.0)
+    LIMIT :limit OFFSET :offset
+    """
+).columns(timestamp=DateTime)
+
+COUNT_QUERY = text(
+    """
+    SELECT count(*)
+    FROM report_fts
+    JOIN report ON report.id = report_fts.rowid
+    WHERE report_fts MATCH :match
+      AND (:guild_id IS NULL OR report.guild_id = :guild_id)
+    """
+)
+
+
+class SearchResult(NamedTuple):
+    id: int
+    suspect_activision: str
+    platform: str
+    timestamp: object
+    guild_id: int
+    excerpt: str
+
+
+def build_match(query: str) -> Optional[str]:
+    """
+    Turn free text typed by a user into a safe FTS5 MATCH expression.
+    Every word is quoted so FTS5 operators are not interpreted, and the last one
+    is matched as a prefix so partial names still find results.
+
+    :param query: The text the user searched for.
+    :return: The MATCH expression, or None if the query contains no words.
+    """
+    tokens = TOKEN_RE.findall(query)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+async def search_reports(
+    query: str,
+    *,
+    guild_id: Optional[int] = None,
+    page: int = 0,
+    per_page: int = 10
+) -> Tuple[List[SearchResult], int]:
+    """
+    Search the suspect and message of reports, best matches first. Admin notes are not indexed.
+
+    :param query: The text to search for.
+    :param guild_id: Only return reports made in this guild, if given.
+    :param page: The zero based page of results to return.
+    :param per_page: The number of results per page.
+    :return: The results of the page and the total number of matches.
+    """
+    match = build_match(query)
+    if match is None:
+        return [], 0
+    params = {"match": match, "guild_id": guild_id}
+    async with AioSession() as session:
+        total = await session.scalar(COUNT_QUERY, params)
+        result = await session.execute(
+            SEARCH_QUERY,
+            {**params, "limit": per_page, "offset": page * per_page}
+        )
+        return [SearchResult(*row) for row in result.all()], total
@@ -0,0 +1,219 @@
+from typing import List, Optional
+
+from sqlalchemy import Column, MetaData, Table, case, func, literal, select, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from bounty_hunter_mw2.database import retention
+from bounty_hunter_mw2.database.models import (
+    AioSession, SuspectGuild, SuspectReporter, SuspectSummary, engine, normalize_activision
+)
+
+
+
+PLATFORMS = ("Playstation", "Xbox", "Battle.net")
+
+# Columns compared by the consistency check, display is cosmetic and left out.
+CHECKED_COLUMNS = """
+    suspect_key, report_count, playstation_count, xbox_count, battlenet_count,
+    unknown_count, distinct_reporters, distinct_guilds, first_seen, last_seen
+"""
+
+EXPECTED = MetaData()
+
+
+def expected_table(model) -> Table:
+    """
+    A temporary table shaped like the table of model, the aggregates a check or rebuild
+    computes from the reports are collected in it.
+    """
+    return Table(
+        f"expected_{model.__tablename__}",
+        EXPECTED,
+        *(Column(column.name, column.type, primary_key=column.primary_key) for column in model.__table__.columns),
+        prefixes=["TEMPORARY"]
+    )
+
+
+expected_summary = expected_table(SuspectSummary)
+expected_reporter = expected_table(SuspectReporter)
+expected_guild = expected_table(SuspectGuild)
+
+
+def count_where(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+
+def add_counts(table: Table, rows):
+    """
+    Insert aggregated rows into an expected_* table, the counts of a key that an earlier
+    archive group already had are added up and first_seen/last_seen are widened.
+    """
+    statement = insert(table).from_select([column.name for column in table.columns], rows)
+    merged = {
+        column.name: column + statement.excluded[column.name]
+        for column in table.columns
+        if column.name.endswith("_count")
+    }
+    if "first_seen" in table.c:
+        merged["first_seen"] = func.min(table.c.first_seen, statement.excluded.first_seen)
+        merged["last_seen"] = func.max(table.c.last_seen, statement.excluded.last_seen)
+    return statement.on_conflict_do_update(index_elements=list(table.primary_key.columns), set_=merged)
+
+
+async def aggregate_reports(conn: AsyncConnection) -> None:
+    """
+    Compute the suspect_summary, suspect_reporter and suspect_guild rows from scratch into
+    their expected_* temporary tables, over the hot report table and every archive.
+
+    The archives are attached a group at a time, each group is aggregated on its own and
+    added to what the earlier groups counted.
+
+    :param conn: The connection the temporary tables are created on, no transaction may be open on it.
+    """
+    await conn.run_sync(EXPECTED.drop_all)
+    await conn.run_sync(EXPECTED.create_all)
+    for i, months in enumerate(retention.archive_batches() or [[]]):
+        async with retention.attached_reports(conn, months, include_hot=i == 0) as reports:
+            known = reports.suspect_key.isnot(None)
+            await conn.execute(add_counts(expected_summary, select(
+                reports.suspect_key,
+                func.max(reports.suspect_activision),
+                func.count(),
+                *(count_where(reports.platform == platform) for platform in PLATFORMS),
+                count_where(func.coalesce(reports.platform, "").notin_(PLATFORMS)),
+                literal(0),
+                literal(0),
+                func.min(reports.timestamp),
+                func.max(reports.timestamp)
+            ).where(known).group_by(reports.suspect_key)))
+            await conn.execute(add_counts(expected_reporter, select(
+                reports.suspect_key, reports.bot_user_id, func.count()
+            ).where(known, reports.bot_user_id.isnot(None)).group_by(
+                reports.suspect_key, reports.bot_user_id
+            )))
+            await conn.execute(add_counts(expected_guild, select(
+                reports.suspect_key, reports.guild_id, func.count()
+            ).where(known, reports.guild_id.isnot(None)).group_by(
+                reports.suspect_key, reports.guild_id
+            )))
+            # Committed before the archives are detached, which SQLite refuses inside a transaction.
+            await conn.commit()
+    await conn.execute(text(
+        """
+        UPDATE expected_suspect_summary SET
+            distinct_reporters = (
+                SELECT count(*) FROM expected_suspect_reporter r
+                WHERE r.suspect_key = expected_suspect_summary.suspect_key
+            ),
+            distinct_guilds = (
+                SELECT count(*) FROM expected_suspect_guild g
+                WHERE g.suspect_key = expected_suspect_summary.suspect_key
+            )
+        """
+    ))
+    await conn.commit()
+
+
+async def get_suspect_summary(activision_id: str) -> Optional[SuspectSummary]:
+    """
+    Return the aggregated report counts of a suspect.
+
+    :param activision_id: The Activision ID of the suspect, normalized before the lookup.
+    """
+    key = normalize_activision(activision_id)
+    if not key:
+        return None
+    async with AioSession() as session:
+        return await session.get(SuspectSummary, key)
+
+
+async def rebuild(conn: AsyncConnection) -> int:
+    """
+    Regenerate suspect_summary, suspect_reporter and suspect_guild on a connection.
+    The tables are replaced in one transaction once every archive has been counted.
+
+    :return: The number of suspects in the rebuilt table.
+    """
+    try:
+        await aggregate_reports(conn)
+        for table in ("suspect_summary", "suspect_reporter", "suspect_guild"):
+            await conn.execute(text(f"DELETE FROM {table}"))
+            await conn.execute(text(f"INSERT INTO {table} SELECT * FROM expected_{table}"))
+        total = await conn.scalar(text("SELECT count(*) FROM suspect_summary"))
+        await conn.commit()
+        return total
+    finally:
+        await conn.rollback()
+        await conn.run_sync(EXPECTED.drop_all)
+        await conn.commit()
+
+
+async def find_mismatches(conn: AsyncConnection, limit: int = 25) -> List[str]:
+    """
+    Compare suspect_summary, suspect_reporter and suspect_guild against a fresh aggregation
+    of the hot report table and every archive, on a connection.
+
+    :param limit: The maximum number of inconsistent suspects to return.
+    :return: The keys of suspects whose rows are missing, stale or orphaned.
+    """
+    try:
+        await aggregate_reports(conn)
+        result = await conn.execute(text(
+            f"""
+            SELECT suspect_key FROM (
+                SELECT {CHECKED_COLUMNS} FROM expected_suspect_summary
+                EXCEPT
+                SELECT {CHECKED_COLUMNS} FROM suspect_summary
+            )
+            UNION
+            SELECT suspect_key FROM (
+                SELECT {CHECKED_COLUMNS} FROM suspect_summary
+                EXCEPT
+                SELECT {CHECKED_COLUMNS} FROM expected_suspect_summary
+            )
+            UNION
+            SELECT suspect_key FROM (
+                SELECT * FROM expected_suspect_reporter EXCEPT SELECT * FROM suspect_reporter
+            )
+            UNION
+            SELECT suspect_key FROM (
+                SELECT * FROM suspect_reporter EXCEPT SELECT * FROM expected_suspect_reporter
+            )
+            UNION
+            SELECT suspect_key FROM (
+                SELECT * FROM expected_suspect_guild EXCEPT SELECT * FROM suspect_guild
+            )
+            UNION
+            SELECT suspect_key FROM (
+                SELECT * FROM suspect_guild EXCEPT SELECT * FROM expected_suspect_guild
+            )
+            LIMIT :limit
+            """
+        ), {"limit": limit})
+        return list(result.scalars().all())
+    finally:
+        await conn.rollback()
+        await conn.run_sync(EXPECTED.drop_all)
+        await conn.commit()
+
+
+async def rebuild_suspect_summary() -> int:
+    """
+    Regenerate suspect_summary from the hot report table and every archive.
+
+    :return: The number of suspects in the rebuilt table.
+    """
+    async with engine.connect() as conn:
+        return await rebuild(conn)
+
+
+async def check_suspect_summary(limit: int = 25) -> List[str]:
+    """
+    Compare suspect_summary against a fresh aggregation of the hot report table and every archive.
+
+    :param limit: The maximum number of inconsistent suspects to return.
+    :return: The keys of suspects whose summary row is missing, stale or orphaned.
+    """
+    async with engine.connect() as conn:
+        return await find_mismatches(conn, limit)
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bounty_hunter_mw2.database.models import AioSession
+from bounty_hunter_mw2.helpers.metrics import untimed
+
+
+
+logger = logging.getLogger("discord_bot")
+
+
+class WriteBehindQueue(object):
+    """
+    Collects model instances (Report, BotUser, ...) and inserts them in batches.
+
+    A batch is flushed in a single transaction once max_batch rows are waiting or
+    max_delay seconds after the first row of the batch arrived, whichever comes first.
+    submit() returns a future that resolves once the row has been committed.
+    """
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = AioSession,
+        *,
+        max_batch: int = 200,
+        max_delay: float = 0.005
+    ):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._closed = False
+        self.flushes = 0
+        self.rows_written = 0
+
+    def submit(self, row) -> asyncio.Future:
+        """
+        Queue a row for insertion.
+
+        :param row: The model instance that should be inserted.
+        :return: A future that resolves to the row once it is durable.
+        """
+        if self._closed:
+            raise RuntimeError("The write-behind queue is closed.")
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(untimed(self._run()))
+        future = loop.create_future()
+        self._queue.put_nowait((row, future))
+        return future
+
+    def __len__(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _collect(self) -> List[Tuple[object, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_delay
+        # drain() queues None last, the rows before it are flushed without waiting for max_delay.
+        while len(batch) < self.max_batch and batch[-1] is not None:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            try:
+                rows = [item for item in batch if item is not None]
+                if rows:
+                    await self._flush(rows)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: List[Tuple[object, asyncio.Future]]) -> None:
+        try:
+            async with self.session_factory() as session:
+                async with session.begin():
+                    session.add_all([row for row, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                row, future = batch[0]
+                if not future.done():
+                    future.set_exception(e)
+                return
+            # One bad row must not fail everyone else's insert, retry them one by one.
+            logger.warning(f"Batched insert of {len(batch)} rows failed, retrying individually")
+            for item in batch:
+                await self._flush([item])
+            return
+
+        self.flushes += 1
+        self.rows_written += len(batch)
+        for row, future in batch:
+            if not future.done():
+                future.set_result(row)
+
+    async def drain(self) -> None:
+        """
+        Stop accepting rows and wait until everything queued so far is committed.
+        """
+        self._closed = True
+        if self._worker is None:
+            return
+        if not self._worker.done():
+            self._queue.put_nowait(None)
+            await self._queue.join()
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+
+
+report_writer = WriteBehindQueue()
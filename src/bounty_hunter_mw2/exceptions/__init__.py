@@ -1,8 +1,8 @@
-from discord.ext import Commands
+from discord.ext import commands
 
 
 
-class UserBlackListed(commands.CheckFailure):
+class UserBlacklisted(commands.CheckFailure):
     """
     Thrown when a user is attempting something, but is blacklisted.
     """
@@ -19,3 +19,14 @@ class UserNotOwner(commands.CheckFailure):
     def __init__(self, message="User is not owner of this bot."):
         self.message = message
         super().__init__(self.message)
+
+
+class RateLimited(commands.CommandOnCooldown):
+    """
+    Thrown when a user is attempting a command, but one of its token buckets is empty.
+    """
+    def __init__(self, scope: str, capacity: int, per: float, retry_after: float):
+        self.scope = scope
+        self.capacity = capacity
+        self.per = per
+        super().__init__(commands.Cooldown(capacity, per), retry_after, commands.BucketType.default)
@@ -1,12 +1,13 @@
 import json
 import os
 from dotenv import load_dotenv
-from typing import Callable, TypeVar
+from typing import Callable, Optional, Tuple, TypeVar
 
 from discord.ext import commands
 
-from exceptions import *
+from bounty_hunter_mw2.exceptions import *
 from bounty_hunter_mw2.helpers import db_manager
+from bounty_hunter_mw2.helpers.ratelimit import Limit, RateLimiter
 from bounty_hunter_mw2.config import Config
 
 
@@ -14,7 +15,7 @@ from bounty_hunter_mw2.config import Config
 #load_dotenv()
 #config_path = os.environ.get("BOT_CONFIG_PATH")
 T = TypeVar("T")
-config = Config.todict()
+config = Config.to_dict()
 
 
 def is_owner() -> Callable[[T], T]:
@@ -33,10 +34,36 @@ def is_owner() -> Callable[[T], T]:
 def not_blacklisted() -> Callable[[T], T]:
     """
     This is a custom check to see if the user executing the command is blacklisted.
+    The lookup is served from the in-memory blacklist cache.
     """
     async def predicate(context: commands.Context) -> bool:
-        if await db_manager.is_blacklisted(context.author.id):
+        if await db_manager.blacklist_cache.contains(context.author.id):
             raise UserBlacklisted
         return True
 
     return commands.check(predicate)
+
+
+def rate_limit(
+    user: Optional[Tuple[int, float]] = None,
+    guild: Optional[Tuple[int, float]] = None,
+    global_: Optional[Tuple[int, float]] = None
+) -> Callable[[T], T]:
+    """
+    This is a custom check that limits how often the command can be used, with token buckets
+    per user, per guild and for the whole bot. Each limit is a (uses, seconds) tuple.
+    Put it below checks.not_blacklisted() so blacklisted users do not use up tokens.
+    """
+    limiter = RateLimiter(
+        user=Limit(*user) if user else None,
+        guild=Limit(*guild) if guild else None,
+        global_=Limit(*global_) if global_ else None
+    )
+
+    async def predicate(context: commands.Context) -> bool:
+        decision = limiter.hit(context.author.id, context.guild.id if context.guild else None)
+        if not decision.allowed:
+            raise RateLimited(decision.scope, decision.limit.capacity, decision.limit.per, decision.retry_after)
+        return True
+
+    return commands.check(predicate)
@@ -0,0 +1,141 @@
+import ast
+import importlib
+import os
+import sys
+from typing import Dict, Iterable, List, NamedTuple, Set
+
+
+
+COMMAND_DECORATORS = {"command", "hybrid_command", "group", "hybrid_group"}
+APP_COMMAND_DECORATORS = {"hybrid_command", "hybrid_group"}
+
+
+class CogInfo(NamedTuple):
+    name: str
+    requires: List[str]
+    commands: List[str]
+    # Whether the cog adds slash commands, those have to be in the tree when it is synced.
+    app_commands: bool = False
+    # The modules the cog imports from outside of the bot.
+    imports: List[str] = []
+
+
+def decorator_owner(decorator: ast.expr) -> str:
+    """
+    :return: The name a decorator is looked up on, "commands" for @commands.command(...).
+    """
+    if isinstance(decorator, ast.Call):
+        decorator = decorator.func
+    if isinstance(decorator, ast.Attribute) and isinstance(decorator.value, ast.Name):
+        return decorator.value.id
+    return ""
+
+
+def scan_cog(path: str) -> CogInfo:
+    """
+    Read what a cog file declares without importing it: the cogs listed in its module
+    level REQUIRES constant, the names of its top-level commands, whether it has slash
+    commands and the modules it imports from outside of the bot.
+
+    :param path: The path of the cog file.
+    """
+    name = os.path.basename(path)[:-3]
+    try:
+        with open(path, encoding="utf-8") as file:
+            tree = ast.parse(file.read(), filename=path)
+    except SyntaxError:
+        # Loading the extension will fail and report the error properly.
+        return CogInfo(name, [], [])
+
+    # Modules next to the cogs directory belong to the bot, cogs import them as helpers or exceptions.
+    package_path = os.path.dirname(os.path.dirname(os.path.realpath(path)))
+    local = {"cogs", os.path.basename(package_path)}
+    local.update(
+        entry[:-3] if entry.endswith(".py") else entry
+        for entry in os.listdir(package_path)
+    )
+
+    requires: List[str] = []
+    names: List[str] = []
+    imports: List[str] = []
+    app_commands = False
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            imports.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            imports.append(node.module)
+        elif isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == "REQUIRES" for target in node.targets
+        ):
+            requires = list(ast.literal_eval(node.value))
+
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        for decorator in node.decorator_list:
+            owner = decorator_owner(decorator)
+            if not owner:
+                continue
+            attribute = (decorator.func if isinstance(decorator, ast.Call) else decorator).attr
+            if owner == "app_commands" or (owner == "commands" and attribute in APP_COMMAND_DECORATORS):
+                app_commands = True
+            # Subcommands are decorated with @<group>.command, only commands.<decorator> are top-level.
+            if not isinstance(decorator, ast.Call) or owner != "commands" or attribute not in COMMAND_DECORATORS:
+                continue
+            names.append(next(
+                (k.value.value for k in decorator.keywords if k.arg == "name" and isinstance(k.value, ast.Constant)),
+                node.name
+            ))
+
+    imports = [module for module in dict.fromkeys(imports) if module.partition(".")[0] not in local]
+    return CogInfo(name, requires, names, app_commands, imports)
+
+
+def warm_imports(modules: Iterable[str]) -> None:
+    """
+    Import the modules that are not imported yet. Meant to run in a thread, so the
+    dependencies of a cog are imported without blocking the event loop.
+    """
+    for module in modules:
+        if module in sys.modules:
+            continue
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            # Loading the extension will fail and report the error properly.
+            pass
+
+
+def scan_cogs(cog_path: str) -> Dict[str, CogInfo]:
+    """
+    Scan every cog file in a directory.
+    """
+    return {
+        info.name: info
+        for info in (
+            scan_cog(os.path.join(cog_path, file))
+            for file in sorted(os.listdir(cog_path))
+            if file.endswith(".py") and not file.startswith("_")
+        )
+    }
+
+
+def load_waves(cogs: Dict[str, CogInfo]) -> List[List[str]]:
+    """
+    Group cogs into waves that can be loaded concurrently, every cog comes after the
+    cogs it requires. Requirements on cogs that are not in cogs are ignored.
+
+    :raises ValueError: If the requirements contain a cycle.
+    """
+    remaining = {name: {r for r in info.requires if r in cogs} for name, info in cogs.items()}
+    loaded: Set[str] = set()
+    waves = []
+    while remaining:
+        wave = sorted(name for name, requires in remaining.items() if requires <= loaded)
+        if not wave:
+            raise ValueError(f"Cyclic cog requirements between {', '.join(sorted(remaining))}")
+        waves.append(wave)
+        loaded.update(wave)
+        for name in wave:
+            del remaining[name]
+    return waves
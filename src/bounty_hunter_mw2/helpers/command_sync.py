@@ -0,0 +1,58 @@
+import json
+from hashlib import sha256
+from typing import Optional
+
+import discord
+from discord import app_commands
+
+from bounty_hunter_mw2.database.models import AioSession, CommandSync
+
+
+
+def sync_scope(guild: Optional[discord.abc.Snowflake]) -> str:
+    return "global" if guild is None else f"guild:{guild.id}"
+
+
+def tree_hash(tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake] = None) -> str:
+    """
+    Hash the payload a sync of the command tree would upload, it is stable across restarts
+    as long as the commands, their options and their localizations stay the same.
+
+    :param tree: The command tree of the bot.
+    :param guild: The guild whose commands are hashed, None for the global commands.
+    """
+    payload = []
+    for command in tree.get_commands(guild=guild):
+        try:
+            payload.append(command.to_dict(tree))
+        except TypeError:
+            # discord.py before 2.4 serializes commands without the tree.
+            payload.append(command.to_dict())
+    payload.sort(key=lambda command: (command.get("type", 1), command["name"]))
+    return sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+async def sync_if_changed(
+    tree: app_commands.CommandTree,
+    guild: Optional[discord.abc.Snowflake] = None,
+    force: bool = False
+) -> bool:
+    """
+    Sync the command tree, unless it has not changed since the last sync of the same scope.
+
+    :param tree: The command tree of the bot.
+    :param guild: The guild to sync, None for the global commands.
+    :param force: Sync even if the hash did not change.
+    :return: True if the tree was synced, False if the sync was skipped.
+    """
+    scope = sync_scope(guild)
+    current = tree_hash(tree, guild)
+    async with AioSession() as session:
+        last = await session.get(CommandSync, scope)
+    if not force and last is not None and last.tree_hash == current:
+        return False
+    await tree.sync(guild=guild)
+    async with AioSession() as session:
+        async with session.begin():
+            await session.merge(CommandSync(scope=scope, tree_hash=current))
+    return True
@@ -0,0 +1,129 @@
+from datetime import timezone
+from typing import List, Set, Tuple
+
+from sqlalchemy import delete, func, select
+
+from bounty_hunter_mw2.database.models import AioSession, Blacklist, close_db
+from bounty_hunter_mw2.database.writer import report_writer
+
+
+
+class BlacklistCache(object):
+    """
+    A process-wide, in-memory copy of the blacklist table.
+
+    The set is loaded once at startup and kept current by the add/remove
+    helpers below, so membership checks never have to touch the database.
+    Until it has been loaded, lookups fall back to the database.
+    """
+    def __init__(self):
+        self._user_ids: Set[int] = set()
+        self.loaded = False
+        self.hits = 0
+        self.fallbacks = 0
+
+    async def load(self) -> None:
+        """
+        Replace the cached set with the current contents of the blacklist table.
+        """
+        async with AioSession() as session:
+            result = await session.execute(select(Blacklist.user_id))
+            self._user_ids = set(result.scalars().all())
+        self.loaded = True
+
+    async def contains(self, user_id: int) -> bool:
+        """
+        Check if a user is blacklisted, using the database only if the cache is not loaded yet.
+
+        :param user_id: The ID of the user that should be checked.
+        """
+        if self.loaded:
+            self.hits += 1
+            return user_id in self._user_ids
+        self.fallbacks += 1
+        return await is_blacklisted(user_id)
+
+    def add(self, user_id: int) -> None:
+        self._user_ids.add(user_id)
+
+    def discard(self, user_id: int) -> None:
+        self._user_ids.discard(user_id)
+
+    def __len__(self) -> int:
+        return len(self._user_ids)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._user_ids),
+            "hits": self.hits,
+            "fallbacks": self.fallbacks
+        }
+
+
+blacklist_cache = BlacklistCache()
+
+
+async def get_blacklisted_users() -> List[Tuple[int, int]]:
+    """
+    This function will return the list of all blacklisted users.
+
+    :return: A list of (user_id, unix timestamp it was blacklisted at) tuples.
+    """
+    async with AioSession() as session:
+        result = await session.execute(
+            select(Blacklist.user_id, Blacklist.created_at).order_by(Blacklist.created_at)
+        )
+        return [
+            (user_id, int(created_at.replace(tzinfo=timezone.utc).timestamp()) if created_at else 0)
+            for user_id, created_at in result.all()
+        ]
+
+
+async def is_blacklisted(user_id: int) -> bool:
+    """
+    This function will check if a user is blacklisted by querying the database.
+
+    :param user_id: The ID of the user that should be checked.
+    :return: True if the user is blacklisted, False if not.
+    """
+    async with AioSession() as session:
+        return await session.get(Blacklist, user_id) is not None
+
+
+async def add_user_to_blacklist(user_id: int) -> int:
+    """
+    This function will add a user based on its ID in the blacklist.
+
+    :param user_id: The ID of the user that should be added into the blacklist.
+    :return: The number of users in the blacklist.
+    """
+    async with AioSession() as session:
+        async with session.begin():
+            session.add(Blacklist(user_id=user_id))
+        total = await session.scalar(select(func.count()).select_from(Blacklist))
+    blacklist_cache.add(user_id)
+    return total
+
+
+async def remove_user_from_blacklist(user_id: int) -> int:
+    """
+    This function will remove a user based on its ID from the blacklist.
+
+    :param user_id: The ID of the user that should be removed from the blacklist.
+    :return: The number of users in the blacklist.
+    """
+    async with AioSession() as session:
+        async with session.begin():
+            await session.execute(delete(Blacklist).where(Blacklist.user_id == user_id))
+        total = await session.scalar(select(func.count()).select_from(Blacklist))
+    blacklist_cache.discard(user_id)
+    return total
+
+
+async def shutdown() -> None:
+    """
+    This function will flush pending writes and release the database resources held by the bot,
+    called right before the bot closes.
+    """
+    await report_writer.drain()
+    await close_db()
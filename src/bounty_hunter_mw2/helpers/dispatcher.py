@@ -0,0 +1,167 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Tuple
+
+import discord
+
+from bounty_hunter_mw2.helpers.metrics import untimed
+from bounty_hunter_mw2.helpers.ratelimit import Limit, TokenBuckets
+
+
+
+# Discord accepts at most 10 embeds per message, with at most 6000 characters across them.
+MAX_EMBEDS = 10
+MAX_EMBED_CHARACTERS = 6000
+
+Transport = Callable[[int, List[discord.Embed]], Awaitable[Any]]
+
+
+def channel_transport(client: discord.Client) -> Transport:
+    """
+    Build a transport that sends the embeds to a channel by ID, without fetching the channel.
+
+    :param client: The client the messages are sent with.
+    """
+    async def send(channel_id: int, embeds: List[discord.Embed]) -> discord.Message:
+        return await client.get_partial_messageable(channel_id).send(embeds=embeds)
+    return send
+
+
+class OutboundDispatcher(object):
+    """
+    Sends embeds to channels through per-channel queues, for notifications that go to many channels.
+
+    Each channel with pending embeds has one worker task. Before each send it waits for a token
+    from the channel's bucket and from the global bucket. Embeds that queue up in the meantime
+    are merged into one message, up to Discord's per-message limits. discord.py sleeps through
+    short rate limits itself, one longer than the client's max_ratelimit_timeout raises
+    discord.RateLimited: the batch then goes back to the front of the queue and is retried
+    after retry_after.
+    """
+    def __init__(
+        self,
+        transport: Transport,
+        *,
+        channel_limit: Limit = Limit(5, 5.0),
+        global_limit: Limit = Limit(50, 1.0),
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep
+    ):
+        self.transport = transport
+        self.clock = clock
+        self.sleep = sleep
+        self.channel_buckets = TokenBuckets(channel_limit, clock)
+        self.global_buckets = TokenBuckets(global_limit, clock)
+        self._queues: Dict[int, Deque[Tuple[discord.Embed, asyncio.Future]]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self.messages_sent = 0
+        self.embeds_sent = 0
+        self.rate_limited = 0
+        self.failed = 0
+
+    def send(self, channel_id: int, embed: discord.Embed) -> asyncio.Future:
+        """
+        Queue an embed for a channel.
+
+        :param channel_id: The ID of the channel the embed is sent to.
+        :param embed: The embed to send.
+        :return: A future resolved with what the transport returned for the message the embed
+            was sent in, or with the exception that made the send fail.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(channel_id, deque()).append((embed, future))
+        if channel_id not in self._workers:
+            self._workers[channel_id] = asyncio.create_task(untimed(self._run(channel_id)))
+        return future
+
+    def broadcast(self, channel_ids: List[int], embed: discord.Embed) -> List[asyncio.Future]:
+        """
+        Queue the same embed for several channels.
+        """
+        return [self.send(channel_id, embed) for channel_id in channel_ids]
+
+    async def _acquire(self, channel_id: int) -> None:
+        """
+        Wait until both the channel's bucket and the global bucket have a token, then take them.
+        """
+        while True:
+            now = self.clock()
+            channel_tokens = self.channel_buckets.peek(channel_id, now)
+            global_tokens = self.global_buckets.peek(None, now)
+            if channel_tokens >= 1 and global_tokens >= 1:
+                self.channel_buckets.take(channel_id, channel_tokens, now)
+                self.global_buckets.take(None, global_tokens, now)
+                return
+            await self.sleep(max(
+                (1 - channel_tokens) / self.channel_buckets.limit.rate,
+                (1 - global_tokens) / self.global_buckets.limit.rate
+            ))
+
+    @staticmethod
+    def _take_batch(queue: Deque[Tuple[discord.Embed, asyncio.Future]]) -> List[Tuple[discord.Embed, asyncio.Future]]:
+        batch = [queue.popleft()]
+        characters = len(batch[0][0])
+        while queue and len(batch) < MAX_EMBEDS and characters + len(queue[0][0]) <= MAX_EMBED_CHARACTERS:
+            characters += len(queue[0][0])
+            batch.append(queue.popleft())
+        return batch
+
+    async def _run(self, channel_id: int) -> None:
+        queue = self._queues[channel_id]
+        try:
+            while queue:
+                await self._acquire(channel_id)
+                batch = self._take_batch(queue)
+                try:
+                    result = await self.transport(channel_id, [embed for embed, _ in batch])
+                except discord.RateLimited as error:
+                    self.rate_limited += 1
+                    queue.extendleft(reversed(batch))
+                    await self.sleep(error.retry_after)
+                    continue
+                except Exception as error:
+                    self.failed += len(batch)
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(error)
+                    continue
+                self.messages_sent += 1
+                self.embeds_sent += len(batch)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            del self._workers[channel_id]
+            if not queue:
+                del self._queues[channel_id]
+
+    async def drain(self) -> None:
+        """
+        Wait until every queued embed has been sent.
+        """
+        while self._workers:
+            await asyncio.gather(*self._workers.values(), return_exceptions=True)
+
+    def depth(self) -> int:
+        """
+        :return: The number of embeds waiting to be sent, across all channels.
+        """
+        return sum(len(queue) for queue in self._queues.values())
+
+    def render_prometheus(self) -> List[str]:
+        lines = [
+            "# HELP bot_outbound_queue_depth Embeds waiting to be sent, per channel with pending embeds.",
+            "# TYPE bot_outbound_queue_depth gauge",
+            f'bot_outbound_queue_depth{{channel="all"}} {self.depth()}'
+        ]
+        for channel_id, queue in sorted(self._queues.items()):
+            if queue:
+                lines.append(f'bot_outbound_queue_depth{{channel="{channel_id}"}} {len(queue)}')
+        lines.append("# HELP bot_outbound_total Messages and embeds sent, sends rate limited by Discord and embeds that failed.")
+        lines.append("# TYPE bot_outbound_total counter")
+        lines.append(f'bot_outbound_total{{kind="messages"}} {self.messages_sent}')
+        lines.append(f'bot_outbound_total{{kind="embeds"}} {self.embeds_sent}')
+        lines.append(f'bot_outbound_total{{kind="rate_limited"}} {self.rate_limited}')
+        lines.append(f'bot_outbound_total{{kind="failed"}} {self.failed}')
+        return lines
@@ -0,0 +1,127 @@
+from typing import Iterable, List, Optional
+
+import discord
+from discord.ext import commands
+from sqlalchemy import select
+
+from bounty_hunter_mw2.config import Config
+from bounty_hunter_mw2.database.models import AioSession, GuildSettings
+from bounty_hunter_mw2.helpers.cache import LRUCache
+
+
+
+SETTINGS_FIELDS = ("prefix", "report_channel_id", "report_threshold")
+
+
+class GuildSettingsCache(object):
+    """
+    Resolves the settings of a guild through a bounded LRU cache, so the prefix lookup done
+    for every command stays in memory and only a cache miss reads the guild_settings table.
+
+    Guilds without a row are cached too, as an unsaved GuildSettings with every column None.
+    Entries expire after ttl seconds and are invalidated whenever the settings are updated.
+    """
+    def __init__(self, default_prefix: str, default_threshold: int, maxsize: int = 5000, ttl: float = 300):
+        self.default_prefix = default_prefix
+        self.default_threshold = default_threshold
+        self.settings: LRUCache[GuildSettings] = LRUCache(maxsize, ttl)
+
+    async def get(self, guild_id: int) -> GuildSettings:
+        """
+        Get the settings of a guild.
+
+        :param guild_id: The ID of the guild.
+        :return: The stored settings, or settings with every column None if the guild has not changed any.
+        """
+        settings = self.settings.get(guild_id)
+        if settings is None:
+            async with AioSession() as session:
+                settings = await session.get(GuildSettings, guild_id) or GuildSettings(guild_id=guild_id)
+            self.settings.set(guild_id, settings)
+        return settings
+
+    async def update(self, guild_id: int, **values) -> GuildSettings:
+        """
+        Change some settings of a guild, passing None resets a setting to its default.
+
+        :param guild_id: The ID of the guild.
+        :param values: The settings to change, any of SETTINGS_FIELDS.
+        :return: The updated settings.
+        """
+        unknown = set(values) - set(SETTINGS_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown guild settings: {', '.join(sorted(unknown))}")
+        async with AioSession() as session:
+            async with session.begin():
+                settings = await session.get(GuildSettings, guild_id)
+                if settings is None:
+                    settings = GuildSettings(guild_id=guild_id)
+                    session.add(settings)
+                for key, value in values.items():
+                    setattr(settings, key, value)
+        self.settings.invalidate(guild_id)
+        return settings
+
+    async def prefix(self, guild_id: Optional[int]) -> str:
+        """
+        :param guild_id: The ID of the guild, None for direct messages.
+        :return: The prefix commands use in the guild.
+        """
+        if guild_id is None:
+            return self.default_prefix
+        return (await self.get(guild_id)).prefix or self.default_prefix
+
+    async def report_threshold(self, guild_id: Optional[int]) -> int:
+        """
+        :param guild_id: The ID of the guild, None for direct messages.
+        :return: The number of reports after which a suspect is flagged in the guild.
+        """
+        if guild_id is None:
+            return self.default_threshold
+        threshold = (await self.get(guild_id)).report_threshold
+        return threshold if threshold is not None else self.default_threshold
+
+    async def report_channels(self, guild_ids: Iterable[int]) -> List[int]:
+        """
+        :param guild_ids: The IDs of the guilds to look at.
+        :return: The report channel IDs set by those guilds.
+        """
+        async with AioSession() as session:
+            result = await session.execute(
+                select(GuildSettings.report_channel_id).where(
+                    GuildSettings.guild_id.in_(list(guild_ids)),
+                    GuildSettings.report_channel_id.is_not(None)
+                )
+            )
+            return list(result.scalars().all())
+
+    async def prefixes_in_use(self) -> List[str]:
+        """
+        :return: The default prefix and every custom prefix a guild has set.
+        """
+        async with AioSession() as session:
+            result = await session.execute(
+                select(GuildSettings.prefix).where(GuildSettings.prefix.is_not(None)).distinct()
+            )
+            return [self.default_prefix, *result.scalars().all()]
+
+
+def guild_prefix(settings: GuildSettingsCache):
+    """
+    Build a command_prefix callable that accepts the prefix of the guild a message was sent in,
+    or a mention of the bot.
+
+    :param settings: The cache the prefixes are resolved through.
+    """
+    async def get_prefix(bot: commands.Bot, message: discord.Message) -> Iterable[str]:
+        prefix = await settings.prefix(message.guild.id if message.guild is not None else None)
+        return commands.when_mentioned_or(prefix)(bot, message)
+    return get_prefix
+
+
+guild_settings = GuildSettingsCache(
+    Config.PREFIX,
+    Config.REPORT_THRESHOLD,
+    maxsize=Config.SETTINGS_CACHE_SIZE,
+    ttl=Config.SETTINGS_CACHE_TTL
+)
@@ -0,0 +1,103 @@
+from typing import List, Tuple
+
+import discord
+from discord.ext import commands
+
+from bounty_hunter_mw2.helpers.cache import LRUCache
+
+
+
+# Discord's limits are 25 fields per embed, 1024 characters per field value and 6000 characters
+# per embed, the page limit leaves room for the title, description and footer.
+MAX_FIELDS = 25
+MAX_FIELD_CHARACTERS = 1024
+MAX_PAGE_CHARACTERS = 5500
+
+
+class HelpCache(object):
+    """
+    The rendered pages of the help command per prefix. They only change when the loaded
+    extensions change, so the cache is cleared on every load, unload or reload.
+    """
+    def __init__(self, maxsize: int = 64):
+        self.pages: LRUCache[List[discord.Embed]] = LRUCache(maxsize)
+        self.renders = 0
+
+    def get(self, bot: commands.Bot, prefix: str) -> List[discord.Embed]:
+        """
+        Get the help pages for a prefix, rendering them if they are not cached.
+
+        :param bot: The bot whose commands are listed.
+        :param prefix: The prefix shown in front of the command names.
+        """
+        pages = self.pages.get(prefix)
+        if pages is None:
+            pages = render_help(bot, prefix)
+            self.renders += 1
+            self.pages.set(prefix, pages)
+        return pages
+
+    def invalidate(self) -> None:
+        self.pages.clear()
+
+
+def help_fields(bot: commands.Bot, prefix: str) -> List[Tuple[str, str]]:
+    """
+    :return: (name, value) of the fields listing the commands of every cog, a cog whose
+        commands do not fit in one field is split over several.
+    """
+    fields = []
+    for name, cog in sorted(bot.cogs.items()):
+        lines = []
+        for command in cog.get_commands():
+            description = command.description.partition('\n')[0]
+            lines.append(f"{prefix}{command.name} - {description}"[:MAX_FIELD_CHARACTERS - 8])
+        chunk: List[str] = []
+        size = 0
+        for line in lines:
+            if chunk and size + len(line) + 1 > MAX_FIELD_CHARACTERS - 6:
+                fields.append((name.capitalize(), "```" + "\n".join(chunk) + "```"))
+                chunk, size = [], 0
+            chunk.append(line)
+            size += len(line) + 1
+        if chunk:
+            fields.append((name.capitalize(), "```" + "\n".join(chunk) + "```"))
+    return fields
+
+
+def render_help(bot: commands.Bot, prefix: str) -> List[discord.Embed]:
+    """
+    Render the help pages, each within Discord's embed limits.
+
+    :param bot: The bot whose commands are listed.
+    :param prefix: The prefix shown in front of the command names.
+    """
+    pages: List[List[Tuple[str, str]]] = [[]]
+    size = 0
+    for name, value in help_fields(bot, prefix):
+        if pages[-1] and (len(pages[-1]) == MAX_FIELDS or size + len(name) + len(value) > MAX_PAGE_CHARACTERS):
+            pages.append([])
+            size = 0
+        pages[-1].append((name, value))
+        size += len(name) + len(value)
+
+    embeds = []
+    for number, fields in enumerate(pages, start=1):
+        embed = discord.Embed(
+            title="Help",
+            description="List of available commands:",
+            color=0x9C84EF
+        )
+        for name, value in fields:
+            embed.add_field(
+                name=name,
+                value=value,
+                inline=False
+            )
+        if len(pages) > 1:
+            embed.set_footer(text=f"Page {number}/{len(pages)}")
+        embeds.append(embed)
+    return embeds
+
+
+help_cache = HelpCache()
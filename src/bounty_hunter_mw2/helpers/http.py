@@ -0,0 +1,186 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from bounty_hunter_mw2.helpers.cache import LRUCache
+
+
+
+class HttpError(Exception):
+    """
+    Thrown when an upstream API answers with an error or cannot be reached.
+    """
+    def __init__(self, message: str, status: Optional[int] = None):
+        self.status = status
+        super().__init__(message)
+
+
+class CircuitOpen(HttpError):
+    """
+    Thrown instead of making a request to a host that has been failing.
+    """
+
+
+class CircuitBreaker(object):
+    """
+    Stops requests to a host after failure_threshold failures in a row. After reset_after
+    seconds one trial request is let through, its outcome closes or reopens the circuit.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_after: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at >= self.reset_after:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.trial:
+            self.trial = True
+            return True
+        return False
+
+    def record(self, success: bool) -> None:
+        self.trial = False
+        if success:
+            self.failures = 0
+            self.opened_at = None
+            return
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+
+
+class HttpClient(object):
+    """
+    One aiohttp session shared by every cog, with a pooled connector that caches DNS lookups,
+    a TTL cache of the decoded responses and a circuit breaker per host.
+
+    Identical requests made while one is in flight wait for that request instead of making
+    their own, so N users asking for the same thing cause one upstream call.
+    """
+    def __init__(
+        self,
+        *,
+        timeout: float = 10.0,
+        ttl: float = 60.0,
+        maxsize: int = 1024,
+        connections: int = 100,
+        dns_ttl: int = 300,
+        failure_threshold: int = 5,
+        reset_after: float = 30.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.connections = connections
+        self.dns_ttl = dns_ttl
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.clock = clock
+        self.responses: LRUCache[Any] = LRUCache(maxsize, ttl, clock)
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.upstream_requests = 0
+        self.coalesced = 0
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Created on first use, a session has to be created inside the running event loop.
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connections, ttl_dns_cache=self.dns_ttl)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        host = urlsplit(url).netloc
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_after, self.clock)
+        return self.breakers[host]
+
+    async def get_json(self, url: str, *, params: Optional[Dict[str, str]] = None, ttl: Optional[float] = None) -> Any:
+        """
+        Get a JSON document, from the cache if it was fetched less than ttl seconds ago.
+
+        :param url: The URL of the document.
+        :param params: The query parameters.
+        :param ttl: How long the response is cached, the client's default if None, 0 to not cache it.
+        :return: The decoded JSON document.
+        :raises HttpError: If the upstream answered with an error status or could not be reached.
+        :raises CircuitOpen: If the host has been failing and is not retried yet.
+        """
+        key: Tuple = (url, tuple(sorted((params or {}).items())))
+        cached = self.responses.get(key)
+        if cached is not None:
+            return cached
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            # The request runs in a task no caller owns, so a caller that is cancelled
+            # does not cancel it for the others waiting on it.
+            inflight = asyncio.create_task(self._fetch_and_cache(key, url, params, ttl))
+            self._inflight[key] = inflight
+            inflight.add_done_callback(lambda task: self._finished(key, task))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(inflight)
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved, in case every caller was cancelled.
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch_and_cache(self, key: Hashable, url: str, params: Optional[Dict[str, str]], ttl: Optional[float]) -> Any:
+        data = await self._fetch(url, params)
+        if ttl != 0:
+            self.responses.set(key, data, ttl)
+        return data
+
+    async def _fetch(self, url: str, params: Optional[Dict[str, str]]) -> Any:
+        breaker = self.breaker(url)
+        if not breaker.allow():
+            raise CircuitOpen(f"{urlsplit(url).netloc} is failing, not retrying for now")
+        self.upstream_requests += 1
+        try:
+            async with self.session.get(url, params=params) as response:
+                if response.status >= 400:
+                    # Client errors are the request's fault, only server errors count against the host.
+                    breaker.record(response.status < 500)
+                    raise HttpError(f"{url} answered with status {response.status}", response.status)
+                data = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as error:
+            breaker.record(False)
+            raise HttpError(f"{url} could not be reached: {type(error).__name__}") from error
+        breaker.record(True)
+        return data
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def stats(self) -> dict:
+        return {
+            "upstream_requests": self.upstream_requests,
+            "coalesced": self.coalesced,
+            "cache_hits": self.responses.hits,
+            "open_circuits": sorted(host for host, breaker in self.breakers.items() if breaker.state != "closed")
+        }
+
+
+http_client = HttpClient()
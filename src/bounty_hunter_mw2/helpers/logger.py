@@ -0,0 +1,128 @@
+import copy
+import json
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class LoggingFormatter(logging.Formatter):
+    black="\x1b[30m"
+    red = "\x1b[31m"
+    green = "\x1b[32m"
+    yellow = "\x1b[33m"
+    blue = "\x1b[34m"
+    gray = "\x1b[38m"
+
+    reset = "\x1b[0m"
+    bold = "\x1b[1m"
+
+    COLORS = {
+        logging.DEBUG: gray + bold,
+        logging.INFO: blue + bold,
+        logging.WARNING: yellow + bold,
+        logging.ERROR: red,
+        logging.CRITICAL: red + bold
+    }
+
+    FORMAT = "(black){asctime}(reset) (levelcolor){levelname:<8}(reset) (green){name}(reset) {message}"
+
+    def __init__(self):
+        super().__init__(self.build_format(self.reset), DATE_FORMAT, style="{")
+        # One formatter per level, built once instead of on every record.
+        self.formatters = {
+            level: logging.Formatter(self.build_format(color), DATE_FORMAT, style="{")
+            for level, color in self.COLORS.items()
+        }
+
+    def build_format(self, log_color: str) -> str:
+        format = self.FORMAT.replace("(black)", self.black + self.bold)
+        format = format.replace("(reset)", self.reset)
+        format = format.replace("(levelcolor)", log_color)
+        return format.replace("(green)", self.green + self.bold)
+
+    def format(self, record):
+        formatter = self.formatters.get(record.levelno)
+        if formatter is None:
+            return super().format(record)
+        return formatter.format(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats every record as one JSON object per line.
+    """
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, DATE_FORMAT),
+            "level": record.levelname,
+            "name": record.name,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class LoopSafeQueueHandler(QueueHandler):
+    """
+    A QueueHandler that does as little as possible on the calling thread. Only the message
+    arguments are merged, the formatting itself happens on the listener thread.
+    """
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def setup_logging(
+    logger: logging.Logger,
+    *,
+    filename: str = "discord.log",
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+    json_lines: bool = False,
+    level: int = logging.INFO
+) -> QueueListener:
+    """
+    Route a logger through a queue so the console and file writes happen on a
+    background thread instead of the event loop.
+
+    :param logger: The logger to set up.
+    :param filename: The log file, rotated once it reaches max_bytes.
+    :param max_bytes: The size after which the log file is rotated, 0 disables rotation.
+    :param backup_count: The number of rotated log files that are kept.
+    :param json_lines: Write the log file as JSON lines instead of plain text.
+    :param level: The level of the logger.
+    :return: The started listener, stop it on shutdown to flush the queue.
+    """
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(LoggingFormatter())
+
+    file_handler = RotatingFileHandler(
+        filename=filename,
+        encoding="utf-8",
+        maxBytes=max_bytes,
+        backupCount=backup_count
+    )
+    if json_lines:
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(
+            "[{asctime}] [{levelname:<8}] {name}: {message}",
+            DATE_FORMAT,
+            style="{"
+        ))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    listener.start()
+
+    logger.setLevel(level)
+    logger.addHandler(LoopSafeQueueHandler(log_queue))
+    return listener
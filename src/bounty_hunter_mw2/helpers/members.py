@@ -0,0 +1,110 @@
+import asyncio
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+import discord
+
+from bounty_hunter_mw2.helpers.cache import MISSING, LRUCache
+
+
+
+class MemberCache(object):
+    """
+    Keeps the members that were recently active, so they can be counted per guild without
+    holding every member of every guild in the client cache. Members are forgotten when
+    they leave the guild.
+    """
+    def __init__(self, maxsize: int = 10000):
+        self.members: LRUCache[discord.Member] = LRUCache(maxsize)
+
+    def touch(self, member: discord.Member) -> None:
+        """
+        Remember a member that just did something.
+        """
+        self.members.set((member.guild.id, member.id), member)
+
+    def forget(self, guild_id: int, user_id: int) -> None:
+        """
+        Drop a member that left its guild.
+        """
+        self.members.invalidate((guild_id, user_id))
+
+    def per_guild(self) -> Dict[int, int]:
+        """
+        :return: The number of recently active members held per guild ID.
+        """
+        return dict(Counter(guild_id for guild_id, _ in self.members.keys()))
+
+
+class UserResolver(object):
+    """
+    Resolves user IDs to users in batches: from the client cache, then from an LRU of users
+    fetched before, and the rest with at most `concurrency` fetches in flight at once.
+    Users that no longer exist are remembered as None, so they are not fetched again.
+    """
+    def __init__(self, concurrency: int = 16, maxsize: int = 10000, ttl: Optional[float] = 3600):
+        self.users: LRUCache[Optional[discord.User]] = LRUCache(maxsize, ttl)
+        self.concurrency = concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.fetches = 0
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created on first use, so it belongs to the loop the bot runs in.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def _fetch(self, client: discord.Client, user_id: int) -> Optional[discord.User]:
+        async with self.semaphore:
+            self.fetches += 1
+            try:
+                user = await client.fetch_user(user_id)
+            except discord.NotFound:
+                user = None
+            except discord.HTTPException:
+                return None
+        self.users.set(user_id, user)
+        return user
+
+    async def resolve(self, client: discord.Client, user_ids: Iterable[int]) -> Dict[int, Optional[discord.User]]:
+        """
+        Resolve a batch of user IDs.
+
+        :param client: The client used to look up and fetch the users.
+        :param user_ids: The IDs of the users.
+        :return: The user of every ID, None for the users that could not be found.
+        """
+        users: Dict[int, Optional[discord.User]] = {}
+        missing = []
+        for user_id in user_ids:
+            user = client.get_user(user_id)
+            if user is None:
+                user = self.users.get(user_id, MISSING)
+            if user is MISSING:
+                missing.append(user_id)
+            else:
+                users[user_id] = user
+        fetched = await asyncio.gather(*(self._fetch(client, user_id) for user_id in missing))
+        users.update(zip(missing, fetched))
+        return users
+
+
+def member_cache_flags(mode: str) -> discord.MemberCacheFlags:
+    """
+    Build the client's member cache flags from the MEMBER_CACHE setting.
+
+    :param mode: "all" caches every member, "voice" only members in voice channels,
+        "none" nothing beyond what events carry.
+    """
+    if mode == "all":
+        return discord.MemberCacheFlags.all()
+    if mode == "voice":
+        return discord.MemberCacheFlags(voice=True, joined=False)
+    if mode == "none":
+        return discord.MemberCacheFlags.none()
+    raise ValueError(f"Unknown member cache mode '{mode}', expected 'all', 'voice' or 'none'")
+
+
+member_cache = MemberCache()
+user_resolver = UserResolver()
@@ -0,0 +1,240 @@
+import asyncio
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from discord.ext import commands
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASES = ("check", "db", "send", "total")
+
+
+class Histogram(object):
+    """
+    A cumulative-bucket latency histogram in seconds, like a Prometheus histogram.
+    """
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile by linear interpolation inside its bucket.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for upper, count in zip(BUCKETS, self.counts):
+            if seen + count >= rank and count:
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = upper
+        return BUCKETS[-1]
+
+
+class CommandTimings(object):
+    """
+    The time spent in each phase of one command invocation.
+    """
+    __slots__ = ("start", "end", "check", "db", "send")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.check = 0.0
+        self.db = 0.0
+        self.send = 0.0
+
+    def checks_done(self) -> None:
+        self.check = time.perf_counter() - self.start
+
+    def invoke_done(self) -> None:
+        self.end = time.perf_counter()
+
+
+current_timings: ContextVar[Optional[CommandTimings]] = ContextVar("current_timings", default=None)
+
+T = TypeVar("T")
+
+
+async def untimed(awaitable: Awaitable[T]) -> T:
+    """
+    Await without the timings of the command that created the task.
+    A task copies the context it was created in, so a task spawned by a command would
+    otherwise add its database time to that command, even after the command finished.
+
+    Use it as asyncio.create_task(untimed(coroutine)).
+    """
+    current_timings.set(None)
+    return await awaitable
+
+
+class Metrics(object):
+    """
+    Command latency histograms and outcome counters of the bot.
+    """
+    def __init__(self):
+        self.latency: Dict[Tuple[str, str], Histogram] = defaultdict(Histogram)
+        self.outcomes: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self.collectors: List[Callable[[], List[str]]] = []
+
+    def add_collector(self, collector: Callable[[], List[str]]) -> None:
+        """
+        Add a callable returning more lines in the Prometheus text format, rendered after the command metrics.
+        """
+        self.collectors.append(collector)
+
+    def start_command(self) -> CommandTimings:
+        """
+        Start timing a command, the database and send time of the current task is added to it.
+        """
+        timings = CommandTimings()
+        current_timings.set(timings)
+        return timings
+
+    def finish_command(
+        self,
+        command: str,
+        guild_id: Optional[int],
+        outcome: str,
+        timings: Optional[CommandTimings]
+    ) -> None:
+        """
+        Record the outcome of a command and, if it was timed, its latency per phase.
+
+        :param command: The qualified name of the command.
+        :param guild_id: The guild the command was used in, None in DMs.
+        :param outcome: "success" or the name of the error raised.
+        :param timings: The timings of the invocation, if it was timed.
+        """
+        self.outcomes[(command, str(guild_id) if guild_id is not None else "dm", outcome)] += 1
+        if timings is None:
+            return
+        end = timings.end if timings.end is not None else time.perf_counter()
+        self.latency[(command, "total")].observe(end - timings.start)
+        self.latency[(command, "check")].observe(timings.check)
+        self.latency[(command, "db")].observe(timings.db)
+        self.latency[(command, "send")].observe(timings.send)
+
+    def command_summary(self) -> List[Tuple[str, int, int, float, float]]:
+        """
+        :return: (command, successes, errors, p50 seconds, p95 seconds) of every command, busiest first.
+        """
+        calls: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        for (command, _, outcome), count in self.outcomes.items():
+            calls[command][0 if outcome == "success" else 1] += count
+        rows = []
+        for command, (successes, errors) in calls.items():
+            histogram = self.latency.get((command, "total"), Histogram())
+            rows.append((command, successes, errors, histogram.quantile(0.5), histogram.quantile(0.95)))
+        return sorted(rows, key=lambda row: row[1] + row[2], reverse=True)
+
+    def render_prometheus(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+        """
+        lines = [
+            "# HELP bot_command_duration_seconds Time spent per command and phase.",
+            "# TYPE bot_command_duration_seconds histogram"
+        ]
+        for (command, phase), histogram in sorted(self.latency.items()):
+            labels = f'command="{command}",phase="{phase}"'
+            cumulative = 0
+            for upper, count in zip(BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(f'bot_command_duration_seconds_bucket{{{labels},le="{upper}"}} {cumulative}')
+            lines.append(f'bot_command_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"bot_command_duration_seconds_sum{{{labels}}} {histogram.sum}")
+            lines.append(f"bot_command_duration_seconds_count{{{labels}}} {histogram.count}")
+        lines.append("# HELP bot_commands_total Commands executed, by outcome.")
+        lines.append("# TYPE bot_commands_total counter")
+        for (command, guild, outcome), count in sorted(self.outcomes.items()):
+            lines.append(f'bot_commands_total{{command="{command}",guild="{guild}",outcome="{outcome}"}} {count}')
+        for collector in self.collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class MetricsContext(commands.Context):
+    """
+    A command context that adds the time spent sending messages to the command's timings.
+    """
+    async def send(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().send(*args, **kwargs)
+        finally:
+            timings = current_timings.get()
+            if timings is not None:
+                timings.send += time.perf_counter() - started
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Add the time spent executing SQL statements to the timings of the running command.
+    The start time is kept on the statement's execution context, so a statement that fails
+    leaves nothing behind and its time is counted too.
+    """
+    def add_time(context) -> None:
+        started = getattr(context, "_query_start", None)
+        timings = current_timings.get()
+        if started is not None and timings is not None:
+            timings.db += time.perf_counter() - started
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_start = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        add_time(context)
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(exception_context):
+        add_time(exception_context.execution_context)
+
+
+async def start_metrics_server(host: str, port: int) -> asyncio.AbstractServer:
+    """
+    Serve the metrics in the Prometheus text format on http://host:port/metrics.
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5.0)
+            path = request.split(b" ", 2)[1] if request.count(b" ") >= 2 else b""
+            if request.startswith(b"GET ") and path == b"/metrics":
+                status, body = "200 OK", metrics.render_prometheus().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"Not Found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("ascii") + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,61 @@
+from typing import Optional
+
+import discord
+from discord.ext.commands import Context
+
+
+
+class Paginator(discord.ui.View):
+    """
+    A view with previous/next buttons that renders a page only when it is asked for.
+    Subclasses implement render() and keep just enough state to find the next page.
+    """
+    def __init__(self, context: Context, *, timeout: Optional[float] = 180.0):
+        super().__init__(timeout=timeout)
+        self.context = context
+        self.message: Optional[discord.Message] = None
+
+    async def render(self, direction: Optional[str]) -> Optional[discord.Embed]:
+        """
+        Build the embed of the page in the given direction, None renders the first page.
+        Return None if there is no such page.
+        """
+        raise NotImplementedError
+
+    def update_buttons(self, has_previous: bool, has_next: bool) -> None:
+        self.previous_page.disabled = not has_previous
+        self.next_page.disabled = not has_next
+
+    async def start(self) -> bool:
+        """
+        Send the first page.
+
+        :return: False, without sending anything, if there is nothing to show.
+        """
+        embed = await self.render(None)
+        if embed is None:
+            return False
+        self.message = await self.context.send(embed=embed, view=self)
+        return True
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.context.author.id
+
+    async def on_timeout(self) -> None:
+        if self.message is not None:
+            await self.message.edit(view=None)
+
+    async def turn(self, interaction: discord.Interaction, direction: str) -> None:
+        embed = await self.render(direction)
+        if embed is None:
+            await interaction.response.defer()
+            return
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        await self.turn(interaction, "previous")
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        await self.turn(interaction, "next")
@@ -0,0 +1,62 @@
+from typing import Iterable, Optional, Tuple
+
+
+
+class CommandPrefilter(object):
+    """
+    A cheap check on the start of a message that rejects everything which cannot be a prefix command,
+    so ordinary chatter never gets a Context built or the prefix resolved for it.
+
+    The prefixes and the two mention forms of the bot are kept in one tuple, so a match is a
+    single str.startswith call. Until the bot user is known every message is let through.
+    """
+    def __init__(self, prefixes: Iterable[str] = ()):
+        self.prefixes: Tuple[str, ...] = tuple(prefixes)
+        self.user_id: Optional[int] = None
+        self._starts: Tuple[str, ...] = ()
+        self.passed = 0
+        self.rejected = 0
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        starts = set(prefix for prefix in self.prefixes if prefix)
+        if self.user_id is not None:
+            starts.update((f"<@{self.user_id}>", f"<@!{self.user_id}>"))
+        self._starts = tuple(starts)
+
+    def set_user(self, user_id: int) -> None:
+        """
+        Set the ID of the bot user, whose mention counts as a prefix.
+
+        :param user_id: The ID of the bot user.
+        """
+        self.user_id = user_id
+        self._rebuild()
+
+    def set_prefixes(self, prefixes: Iterable[str]) -> None:
+        """
+        Replace the text prefixes that are accepted.
+
+        :param prefixes: The prefixes commands can start with.
+        """
+        self.prefixes = tuple(prefixes)
+        self._rebuild()
+
+    def matches(self, content: str) -> bool:
+        """
+        Check if a message could be a prefix command.
+
+        :param content: The content of the message.
+        :return: True if the message starts with a prefix or a mention of the bot, or if the bot user is not known yet.
+        """
+        if self.user_id is None or content.startswith(self._starts):
+            self.passed += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "passed": self.passed,
+            "rejected": self.rejected
+        }
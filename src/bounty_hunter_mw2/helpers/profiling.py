@@ -0,0 +1,187 @@
+import asyncio
+import linecache
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+
+
+Function = Tuple[str, int, str]
+
+
+class SamplingProfile(object):
+    """
+    How often each function was seen on the stack of a thread, sampled every `interval` seconds.
+    self counts the samples a function was running in, total the samples it was anywhere on the stack.
+    """
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = 0
+        self.self_counts: Counter = Counter()
+        self.total_counts: Counter = Counter()
+
+    def add(self, frame) -> None:
+        self.samples += 1
+        seen = set()
+        leaf = True
+        while frame is not None:
+            code = frame.f_code
+            function = (code.co_filename, code.co_firstlineno, code.co_name)
+            if leaf:
+                self.self_counts[function] += 1
+                leaf = False
+            if function not in seen:
+                seen.add(function)
+                self.total_counts[function] += 1
+            frame = frame.f_back
+
+    def report(self, top: int = 40) -> str:
+        """
+        Render the functions that were seen most, by self time and by total time.
+        """
+        if self.samples == 0:
+            return "No samples were taken.\n"
+        lines = [f"{self.samples} samples, one every {self.interval * 1000:g}ms", ""]
+        for title, counts in (("Self", self.self_counts), ("Total", self.total_counts)):
+            lines.append(f"{title:>7}  function")
+            for (filename, lineno, name), count in counts.most_common(top):
+                lines.append(f"{count / self.samples:>6.1%}  {name} ({short_path(filename)}:{lineno})")
+            lines.append("")
+        return "\n".join(lines)
+
+
+def short_path(filename: str) -> str:
+    """
+    Shorten a path to the part after site-packages or the working directory.
+    """
+    marker = f"site-packages{os.sep}"
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    cwd = os.getcwd() + os.sep
+    return filename[len(cwd):] if filename.startswith(cwd) else filename
+
+
+async def sample_cpu(seconds: float, thread_id: Optional[int] = None, interval: float = 0.005) -> SamplingProfile:
+    """
+    Sample the stack of a thread for a while. Nothing runs before or after, so there is no
+    cost when no profile is being taken.
+
+    :param seconds: How long to sample for.
+    :param thread_id: The thread to sample, the calling thread (the event loop) if None.
+    :param interval: The time between two samples.
+    """
+    thread_id = threading.get_ident() if thread_id is None else thread_id
+    profile = SamplingProfile(interval)
+    stopped = threading.Event()
+
+    def sample() -> None:
+        while not stopped.wait(interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None:
+                profile.add(frame)
+
+    sampler = threading.Thread(target=sample, name="cpu-profiler", daemon=True)
+    sampler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        stopped.set()
+        await asyncio.to_thread(sampler.join)
+    return profile
+
+
+class MemoryProfiler(object):
+    """
+    Takes tracemalloc snapshots of the live process and keeps them for diffing.
+
+    Tracing is only on while a snapshot is being taken, unless it is kept on to find a leak:
+    then later snapshots also hold what was allocated earlier, and a diff shows what grew.
+    """
+    def __init__(self, frames: int = 10, keep_snapshots: int = 10):
+        self.frames = frames
+        self.keep_snapshots = keep_snapshots
+        self.snapshots: Dict[int, tracemalloc.Snapshot] = {}
+        self.next_id = 1
+        self.kept_on = False
+
+    async def capture(self, seconds: float, keep_tracing: bool = False) -> Tuple[int, tracemalloc.Snapshot]:
+        """
+        Trace allocations for a while and take a snapshot.
+
+        :param seconds: How long to trace for before the snapshot.
+        :param keep_tracing: Leave tracing on afterwards, so the next snapshot can be diffed against this one.
+        :return: The ID of the snapshot and the snapshot.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        try:
+            await asyncio.sleep(seconds)
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            self.kept_on = keep_tracing or self.kept_on
+            if not self.kept_on:
+                tracemalloc.stop()
+        # Filtering copies every trace, it runs in a thread like the reports.
+        snapshot = await asyncio.to_thread(snapshot.filter_traces, (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, linecache.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>")
+        ))
+        snapshot_id = self.next_id
+        self.next_id += 1
+        self.snapshots[snapshot_id] = snapshot
+        while len(self.snapshots) > self.keep_snapshots:
+            del self.snapshots[min(self.snapshots)]
+        return snapshot_id, snapshot
+
+    def stop(self) -> None:
+        """
+        Stop tracing and drop the snapshots.
+        """
+        self.kept_on = False
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.snapshots.clear()
+
+    @staticmethod
+    def report(snapshot: tracemalloc.Snapshot, top: int = 40) -> str:
+        """
+        Render the allocation sites holding the most memory, with the stack of the biggest ones.
+        """
+        stats = snapshot.statistics("traceback")
+        total = sum(stat.size for stat in stats)
+        lines = [f"{total / 1024:.1f} KiB in {sum(stat.count for stat in stats)} blocks traced", ""]
+        for stat in stats[:top]:
+            frame = stat.traceback[0]
+            lines.append(f"{stat.size / 1024:>10.1f} KiB {stat.count:>8} blocks  {short_path(frame.filename)}:{frame.lineno}")
+        lines.append("")
+        for stat in stats[:5]:
+            lines.append(f"{stat.size / 1024:.1f} KiB allocated at:")
+            lines.extend(f"    {line}" for line in stat.traceback.format())
+            lines.append("")
+        return "\n".join(lines)
+
+    def diff(self, first: int, second: int, top: int = 40) -> str:
+        """
+        Render the allocation sites that grew the most from one snapshot to another.
+
+        :raises KeyError: If one of the snapshots does not exist.
+        """
+        stats = self.snapshots[second].compare_to(self.snapshots[first], "lineno")
+        lines = [f"Snapshot {first} -> {second}, {sum(stat.size_diff for stat in stats) / 1024:+.1f} KiB", ""]
+        for stat in stats[:top]:
+            frame = stat.traceback[0]
+            lines.append(
+                f"{stat.size_diff / 1024:>+10.1f} KiB {stat.count_diff:>+8} blocks  "
+                f"{short_path(frame.filename)}:{frame.lineno} (now {stat.size / 1024:.1f} KiB)"
+            )
+        return "\n".join(lines) + "\n"
+
+    def snapshot_ids(self) -> List[int]:
+        return sorted(self.snapshots)
+
+
+memory_profiler = MemoryProfiler()
@@ -0,0 +1,124 @@
+import time
+from typing import Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+
+
+class Limit(NamedTuple):
+    """
+    Allow capacity uses in a burst, refilled at capacity uses per period seconds.
+    """
+    capacity: int
+    per: float
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.per
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    scope: Optional[str]
+    remaining: int
+    retry_after: float
+    limit: Optional[Limit]
+
+
+class TokenBuckets(object):
+    """
+    Token buckets for one scope, stored as a dict of key -> (tokens, last refill) tuples.
+
+    A bucket left alone for per seconds is full again, which is the same as
+    having no bucket at all, so buckets idle for that long are evicted on the next sweep.
+    """
+    def __init__(self, limit: Limit, clock: Callable[[], float] = time.monotonic, sweep_every: int = 1024):
+        self.limit = limit
+        self.clock = clock
+        self.sweep_every = sweep_every
+        self._buckets: Dict[Hashable, Tuple[float, float]] = {}
+        self._operations = 0
+        self.evicted = 0
+
+    def peek(self, key: Hashable, now: float) -> float:
+        """
+        :return: The tokens the bucket holds at the given time.
+        """
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return float(self.limit.capacity)
+        tokens, stamp = bucket
+        return min(float(self.limit.capacity), tokens + (now - stamp) * self.limit.rate)
+
+    def take(self, key: Hashable, tokens: float, now: float) -> None:
+        self._buckets[key] = (tokens - 1, now)
+        self._operations += 1
+        if self._operations >= self.sweep_every:
+            self.sweep(now)
+
+    def sweep(self, now: Optional[float] = None) -> None:
+        """
+        Evict the buckets that have been idle long enough to be full again.
+        """
+        now = self.clock() if now is None else now
+        self._operations = 0
+        idle = [key for key, (_, stamp) in self._buckets.items() if now - stamp >= self.limit.per]
+        for key in idle:
+            del self._buckets[key]
+        self.evicted += len(idle)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RateLimiter(object):
+    """
+    Per-user, per-guild and global token buckets for one command. A use is only allowed
+    when every configured scope has a token left, and then one token is taken from each.
+    """
+    def __init__(
+        self,
+        *,
+        user: Optional[Limit] = None,
+        guild: Optional[Limit] = None,
+        global_: Optional[Limit] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.clock = clock
+        self.scopes: Dict[str, TokenBuckets] = {
+            scope: TokenBuckets(limit, clock)
+            for scope, limit in (("user", user), ("guild", guild), ("global", global_))
+            if limit is not None
+        }
+
+    def hit(self, user_id: int, guild_id: Optional[int]) -> Decision:
+        """
+        Try to use the command once.
+
+        :param user_id: The ID of the user using the command.
+        :param guild_id: The ID of the guild it is used in, None for direct messages.
+        :return: Whether the use is allowed, and for the scope with the fewest tokens left
+            how many remain and how long until the next token.
+        """
+        now = self.clock()
+        keys = {"user": user_id, "guild": guild_id, "global": None}
+        available = []
+        for scope, buckets in self.scopes.items():
+            key = keys[scope]
+            if scope == "guild" and key is None:
+                continue
+            available.append((buckets.peek(key, now), scope, key, buckets))
+        if not available:
+            return Decision(True, None, 0, 0.0, None)
+        blocked = [entry for entry in available if entry[0] < 1]
+        if blocked:
+            tokens, scope, _, buckets = max(blocked, key=lambda entry: (1 - entry[0]) / entry[3].limit.rate)
+            return Decision(False, scope, 0, (1 - tokens) / buckets.limit.rate, buckets.limit)
+        for tokens, _, key, buckets in available:
+            buckets.take(key, tokens, now)
+        tokens, scope, _, buckets = min(available, key=lambda entry: entry[0])
+        return Decision(True, scope, int(tokens - 1), 0.0, buckets.limit)
+
+    def stats(self) -> dict:
+        return {
+            scope: {"buckets": len(buckets), "evicted": buckets.evicted}
+            for scope, buckets in self.scopes.items()
+        }
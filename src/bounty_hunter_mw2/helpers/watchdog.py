@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, List, NamedTuple, Optional
+
+from bounty_hunter_mw2.helpers.metrics import BUCKETS, Histogram
+
+
+
+class Stall(NamedTuple):
+    """
+    A moment the event loop did not get to run for longer than the threshold.
+    """
+    at: float
+    lag: float
+    stack: str
+
+
+class LoopWatchdog(object):
+    """
+    Measures how late the event loop wakes up a task that sleeps for `interval` seconds,
+    which is how long everything else on the loop had to wait.
+
+    A daemon thread watches the last time that task ran. When it falls more than `threshold`
+    seconds behind, the thread captures the stack of the loop thread, which shows the call that
+    is blocking it. Both only wake up a few times per second, so it can stay on in production.
+    """
+    def __init__(
+        self,
+        logger: logging.Logger,
+        *,
+        interval: float = 0.25,
+        threshold: float = 0.25,
+        report_every: float = 300.0,
+        history: int = 20
+    ):
+        self.logger = logger
+        self.interval = interval
+        self.threshold = threshold
+        self.report_every = report_every
+        self.lag = Histogram()
+        self.window = Histogram()
+        self.max_lag = 0.0
+        self.stalls: Deque[Stall] = deque(maxlen=history)
+        self.stall_count = 0
+        self.last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """
+        Start measuring, has to be called from the event loop that is watched.
+        """
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self.last_beat = time.monotonic()
+        self._task = asyncio.create_task(self._measure())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _measure(self) -> None:
+        reported = time.monotonic()
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.last_beat = now
+            lag = max(0.0, now - expected)
+            self.lag.observe(lag)
+            self.window.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if now - reported >= self.report_every:
+                self.report()
+                reported = now
+
+    def _watch(self) -> None:
+        captured_for = None
+        while not self._stopped.wait(self.threshold / 2):
+            beat = self.last_beat
+            behind = time.monotonic() - beat - self.interval
+            # One stack per stall, the loop has not run since it was captured.
+            if behind < self.threshold or captured_for == beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            captured_for = beat
+            self.stall_count += 1
+            self.stalls.append(Stall(time.time(), behind, stack))
+            self.logger.warning(
+                f"Event loop blocked for more than {behind * 1000:.0f}ms, it is running:\n{stack}"
+            )
+
+    def report(self) -> None:
+        """
+        Log the lag percentiles since the last report.
+        """
+        window, self.window = self.window, Histogram()
+        if window.count == 0:
+            return
+        self.logger.info(
+            f"Event loop lag p50 {window.quantile(0.5) * 1000:.1f}ms, p95 {window.quantile(0.95) * 1000:.1f}ms, "
+            f"p99 {window.quantile(0.99) * 1000:.1f}ms over {window.count} samples, {self.stall_count} stalls so far"
+        )
+
+    def render_prometheus(self) -> List[str]:
+        lines = [
+            "# HELP bot_event_loop_lag_seconds How late the event loop ran a sleeping task.",
+            "# TYPE bot_event_loop_lag_seconds histogram"
+        ]
+        cumulative = 0
+        for upper, count in zip(BUCKETS, self.lag.counts):
+            cumulative += count
+            lines.append(f'bot_event_loop_lag_seconds_bucket{{le="{upper}"}} {cumulative}')
+        lines.append(f'bot_event_loop_lag_seconds_bucket{{le="+Inf"}} {self.lag.count}')
+        lines.append(f"bot_event_loop_lag_seconds_sum {self.lag.sum}")
+        lines.append(f"bot_event_loop_lag_seconds_count {self.lag.count}")
+        lines.append("# HELP bot_event_loop_stalls_total Times the event loop was blocked for longer than the threshold.")
+        lines.append("# TYPE bot_event_loop_stalls_total counter")
+        lines.append(f"bot_event_loop_stalls_total {self.stall_count}")
+        return lines
@@ -0,0 +1,113 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from bounty_hunter_mw2.database import browse, retention
+from bounty_hunter_mw2.database.models import Base, Report, make_engine
+
+
+# Three reports share every timestamp, so only the id tells them apart.
+TIMESTAMPS = [datetime(2024, month, 15, 12) for month in (1, 2, 3)] + [datetime(2030, 1, 1)]
+ROWS = [
+    {
+        "id": 1 + i * 3 + j,
+        "suspect_activision": "Sn1per#1234",
+        "platform": "Xbox",
+        "timestamp": timestamp,
+        "message": "",
+        "admin_notes": "",
+        "guild_id": 100,
+        "bot_user_id": 10
+    }
+    for i, timestamp in enumerate(TIMESTAMPS)
+    for j in range(3)
+]
+NEWEST_FIRST = [row["id"] for row in sorted(ROWS, key=lambda row: (row["timestamp"], row["id"]), reverse=True)]
+
+
+async def walk(per_page: int, include_archive: bool):
+    """
+    Page through every report going older, then back to the first page going newer.
+    """
+    older, newer = [], []
+    page = await browse.fetch_page(guild_id=100, per_page=per_page, include_archive=include_archive)
+    pages = [page]
+    while page.has_older:
+        page = await browse.fetch_page(
+            guild_id=100, cursor=page.last, per_page=per_page, include_archive=include_archive
+        )
+        pages.append(page)
+    for page in pages:
+        older.append([report.id for report in page.reports])
+    while page.has_newer:
+        page = await browse.fetch_page(
+            guild_id=100, cursor=page.first, direction="newer", per_page=per_page, include_archive=include_archive
+        )
+        newer.append([report.id for report in page.reports])
+    return older, newer
+
+
+@pytest.mark.parametrize("archived", [False, True])
+def test_pages_cover_every_report_once_in_both_directions(tmp_path, monkeypatch, archived):
+    monkeypatch.setattr(retention, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    # One archive per group, so the archived pages are filled from several groups.
+    monkeypatch.setattr(retention, "MAX_ATTACHED", 1)
+    (tmp_path / "archive").mkdir()
+
+    async def main():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'reports.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(Report), ROWS)
+        if archived:
+            async with engine.connect() as conn:
+                while await retention.archive_batch(conn, datetime(2025, 1, 1), batch_size=2):
+                    pass
+            assert retention.list_archives() == ["2024-01", "2024-02", "2024-03"]
+        monkeypatch.setattr(browse, "AioSession", sessionmaker(engine, class_=AsyncSession))
+        try:
+            older, newer = await walk(per_page=4, include_archive=archived)
+        finally:
+            await engine.dispose()
+
+        # The last page is the one the walk back starts from, every other page is seen again.
+        assert sum(older, []) == NEWEST_FIRST
+        assert [len(page) for page in older] == [4, 4, 4]
+        assert newer == older[-2::-1]
+
+    asyncio.run(main())
+
+
+def test_archived_reports_are_only_listed_when_asked(tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    (tmp_path / "archive").mkdir()
+
+    async def main():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'reports.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(Report), ROWS)
+        async with engine.connect() as conn:
+            while await retention.archive_batch(conn, datetime(2025, 1, 1), batch_size=100):
+                pass
+        monkeypatch.setattr(browse, "AioSession", sessionmaker(engine, class_=AsyncSession))
+        try:
+            page = await browse.fetch_page(guild_id=100, per_page=20)
+            assert [report.id for report in page.reports] == NEWEST_FIRST[:3]
+            assert not page.has_older
+            page = await browse.fetch_page(guild_id=200, per_page=20, include_archive=True)
+            assert page.reports == []
+        finally:
+            await engine.dispose()
+
+    asyncio.run(main())
+
+
+def test_cursor_orders_equal_timestamps_by_id():
+    first = browse.Cursor(TIMESTAMPS[0], 2)
+    assert browse.Cursor(TIMESTAMPS[0], 1) < first < browse.Cursor(TIMESTAMPS[0], 3)
+    assert first < browse.Cursor(TIMESTAMPS[1], 1)
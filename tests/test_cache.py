@@ -0,0 +1,40 @@
+from bounty_hunter_mw2.helpers.cache import LRUCache
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = LRUCache(maxsize=10, ttl=5.0, clock=clock)
+    cache.set("a", 1)
+    clock.now = 4.9
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_invalidate_and_stats():
+    cache = LRUCache(maxsize=10)
+    cache.set("a", None)
+    assert "a" in cache
+    cache.invalidate("a")
+    assert cache.get("a", "missing") == "missing"
+    assert cache.stats() == {"size": 0, "maxsize": 10, "hits": 1, "misses": 1}
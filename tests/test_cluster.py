@@ -0,0 +1,117 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import bounty_hunter_mw2
+from bounty_hunter_mw2 import cluster
+
+
+def fake_gateway_worker(cluster_id, shard_ids, shard_count, heartbeats):
+    """
+    Stands in for a bot process: reports its shards as connected, like a gateway would,
+    and the first run of cluster 1 crashes to exercise restarts.
+    """
+    marker = os.path.join(os.environ["FAKE_GATEWAY_DIR"], f"crashed-{cluster_id}")
+    if cluster_id == 1 and not os.path.exists(marker):
+        open(marker, "w").close()
+        raise SystemExit(1)
+    while True:
+        heartbeats.put(cluster.Heartbeat(
+            cluster_id,
+            os.getpid(),
+            [cluster.ShardStatus(shard_id, 0.05 + shard_id / 1000, False, shard_id * 10) for shard_id in shard_ids],
+            time.time()
+        ))
+        time.sleep(0.1)
+
+
+def test_shard_ranges_are_contiguous_and_balanced():
+    assert cluster.shard_ranges(10, 3) == [[0, 1, 2, 3], [4, 5, 6], [7, 8, 9]]
+    assert cluster.shard_ranges(2, 4) == [[0], [1]]
+    ranges = cluster.shard_ranges(1000, 7)
+    assert sum(ranges, []) == list(range(1000))
+    assert max(map(len, ranges)) - min(map(len, ranges)) <= 1
+
+
+def test_cluster_reports_every_shard_and_restarts_crashed_workers(tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_GATEWAY_DIR", str(tmp_path))
+    group = cluster.Cluster(6, 3, target=fake_gateway_worker, heartbeat_timeout=5.0, restart_backoff=0.2)
+    group.start()
+    try:
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            group.poll(0.2)
+            if len(group.shard_statuses()) == 6 and group.restarts[1] == 1:
+                break
+        statuses = group.shard_statuses()
+        assert [shard.shard_id for shard in statuses] == list(range(6))
+        assert not any(shard.closed for shard in statuses)
+        assert group.restarts == {0: 0, 1: 1, 2: 0}
+    finally:
+        group.stop()
+
+
+def test_silent_worker_is_restarted(monkeypatch):
+    restarted = []
+    group = cluster.Cluster(2, 1, heartbeat_timeout=0.0, restart_backoff=0.0)
+    group.processes[0] = type("Alive", (), {"is_alive": lambda self: True, "pid": 1})()
+    group.started_at[0] = time.time() - 10
+    monkeypatch.setattr(group, "restart", lambda cluster_id, reason: restarted.append((cluster_id, reason)))
+    group.poll(0)
+    assert restarted and restarted[0][0] == 0
+    assert "heartbeat" in restarted[0][1]
+
+
+LAUNCHER = '''
+import json
+import os
+
+import discord
+
+from bounty_hunter_mw2 import bot, cluster
+
+
+def record_instead_of_connecting(self, token, **kwargs):
+    with open(f"worker-{self.cluster_id}.json", "w") as file:
+        json.dump({"cluster_id": self.cluster_id, "shard_ids": self.shard_ids, "shard_count": self.shard_count}, file)
+
+
+def worker(cluster_id, shard_ids, shard_count, heartbeats):
+    discord.Client.run = record_instead_of_connecting
+    cluster.run_worker(cluster_id, shard_ids, shard_count, heartbeats)
+
+
+if __name__ == "__main__":
+    group = cluster.Cluster(4, 2, target=worker)
+    group.start()
+    for process in group.processes.values():
+        process.join(60)
+'''
+
+
+def test_spawned_workers_build_the_bot_for_their_own_shards(tmp_path):
+    (tmp_path / "launcher.py").write_text(LAUNCHER)
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.path.dirname(os.path.dirname(bounty_hunter_mw2.__file__)),
+        "PREFIX": "!",
+        "BOT_TOKEN": "token",
+        "PERMISSIONS_INTEGER": "0",
+        "APPLICATION_ID": "1",
+        "OWNER": "1",
+        "DATABASE_URL": f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}",
+        "CLUSTER_PROCESSES": "2",
+        "SHARD_COUNT": "4"
+    }
+    env.pop("CLUSTER_ID", None)
+    env.pop("SHARD_IDS", None)
+    subprocess.run([sys.executable, "launcher.py"], cwd=tmp_path, env=env, check=True, timeout=120)
+
+    workers = [json.loads((tmp_path / f"worker-{cluster_id}.json").read_text()) for cluster_id in (0, 1)]
+    assert workers == [
+        {"cluster_id": 0, "shard_ids": [0, 1], "shard_count": 4},
+        {"cluster_id": 1, "shard_ids": [2, 3], "shard_count": 4}
+    ]
+    assert (tmp_path / "cluster-1-discord.log").exists()
@@ -0,0 +1,53 @@
+from bounty_hunter_mw2.helpers.cog_loader import load_waves, scan_cog
+
+
+SLASH_COG = '''
+import numpy
+from discord.ext import commands
+from helpers import checks
+
+REQUIRES = ["general"]
+
+class Slash(commands.Cog):
+    @commands.hybrid_command(name="bitcoin")
+    async def price(self, context):
+        pass
+'''
+
+PREFIX_COG = '''
+from discord.ext import commands
+
+class Prefix(commands.Cog):
+    @commands.command()
+    async def ping(self, context):
+        pass
+'''
+
+
+def write_cog(tmp_path, name, source):
+    cogs = tmp_path / "cogs"
+    cogs.mkdir(exist_ok=True)
+    (tmp_path / "helpers").mkdir(exist_ok=True)
+    path = cogs / f"{name}.py"
+    path.write_text(source)
+    return str(path)
+
+
+def test_scan_finds_slash_commands_and_dependencies(tmp_path):
+    info = scan_cog(write_cog(tmp_path, "slash", SLASH_COG))
+    assert info.requires == ["general"]
+    assert info.commands == ["bitcoin"]
+    assert info.app_commands
+    assert info.imports == ["numpy", "discord.ext"]
+
+    info = scan_cog(write_cog(tmp_path, "prefix", PREFIX_COG))
+    assert info.commands == ["ping"]
+    assert not info.app_commands
+
+
+def test_waves_follow_requirements(tmp_path):
+    cogs = {
+        "slash": scan_cog(write_cog(tmp_path, "slash", SLASH_COG)),
+        "general": scan_cog(write_cog(tmp_path, "general", PREFIX_COG))
+    }
+    assert load_waves(cogs) == [["general"], ["slash"]]
@@ -0,0 +1,32 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from bounty_hunter_mw2.helpers.command_sync import tree_hash
+
+
+def make_tree(description: str) -> app_commands.CommandTree:
+    bot = commands.Bot(command_prefix="!", intents=discord.Intents.default())
+
+    @app_commands.command(name="suspect", description=description)
+    async def suspect(interaction: discord.Interaction, activision_id: str) -> None:
+        pass
+
+    @app_commands.command(name="lookup", description="Find a player.")
+    async def lookup(interaction: discord.Interaction) -> None:
+        pass
+
+    bot.tree.add_command(suspect)
+    bot.tree.add_command(lookup)
+    return bot.tree
+
+
+def test_hash_only_changes_with_the_commands():
+    tree = make_tree("Show how often a suspect has been reported.")
+    assert tree_hash(tree) == tree_hash(make_tree("Show how often a suspect has been reported."))
+    assert tree_hash(tree) != tree_hash(make_tree("Show a suspect."))
+    guild = discord.Object(id=1)
+    empty = tree_hash(tree, guild)
+    tree.copy_global_to(guild=guild)
+    assert tree_hash(tree, guild) != empty
+    assert tree_hash(tree, guild) == tree_hash(tree)
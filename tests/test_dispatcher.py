@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import discord
+
+from bounty_hunter_mw2.helpers.dispatcher import OutboundDispatcher
+from bounty_hunter_mw2.helpers.ratelimit import Limit
+
+
+class FakeHTTP(object):
+    """
+    Stands in for Discord: records every message with the time it was sent, and answers
+    with a rate limit when a channel gets more than 5 messages per window seconds.
+    """
+    def __init__(self, window: float = 5.0):
+        self.window = window
+        self.messages = []
+
+    async def send(self, channel_id, embeds):
+        await asyncio.sleep(0)
+        now = time.monotonic()
+        recent = [sent for channel, _, sent in self.messages if channel == channel_id and now - sent < self.window]
+        if len(recent) >= 5:
+            raise discord.RateLimited(self.window - (now - recent[0]))
+        self.messages.append((channel_id, [embed.title for embed in embeds], now))
+        return len(self.messages)
+
+
+def test_pending_embeds_are_merged_and_sent_in_order():
+    async def main():
+        http = FakeHTTP()
+        dispatcher = OutboundDispatcher(http.send)
+        futures = [dispatcher.send(1, discord.Embed(title=str(i))) for i in range(25)]
+        await dispatcher.drain()
+        assert [titles for _, titles, _ in http.messages] == [
+            [str(i) for i in range(0, 10)],
+            [str(i) for i in range(10, 20)],
+            [str(i) for i in range(20, 25)]
+        ]
+        assert [future.result() for future in futures] == [1] * 10 + [2] * 10 + [3] * 5
+        assert dispatcher.depth() == 0
+    asyncio.run(main())
+
+
+def test_sends_are_spread_out_to_stay_within_the_buckets():
+    async def main():
+        http = FakeHTTP(window=0.2)
+        dispatcher = OutboundDispatcher(http.send, channel_limit=Limit(10, 0.2), global_limit=Limit(3, 0.1))
+        for channel_id in range(6):
+            dispatcher.send(channel_id, discord.Embed(title="alert"))
+        await dispatcher.drain()
+        assert len(http.messages) == 6
+        times = [sent for _, _, sent in http.messages]
+        # A burst of 3, then one message every 1/30 seconds, with a little slack for the timer.
+        assert times[-1] - times[0] >= 0.09
+    asyncio.run(main())
+
+
+def test_rate_limited_batch_is_retried():
+    async def main():
+        http = FakeHTTP(window=0.2)
+        # The channel bucket allows more messages than the fake does, so it answers with a rate limit.
+        dispatcher = OutboundDispatcher(http.send, channel_limit=Limit(20, 0.2), global_limit=Limit(100, 0.1))
+        for i in range(7):
+            dispatcher.send(0, discord.Embed(title=str(i)))
+            await asyncio.sleep(0.01)
+        await dispatcher.drain()
+        assert dispatcher.rate_limited >= 1
+        assert [title for _, titles, _ in http.messages for title in titles] == [str(i) for i in range(7)]
+        assert 'bot_outbound_total{kind="embeds"} 7' in dispatcher.render_prometheus()
+    asyncio.run(main())
+
+
+def test_failed_send_fails_only_its_batch():
+    async def main():
+        async def send(channel_id, embeds):
+            if channel_id == 2:
+                raise discord.DiscordException("Missing access")
+            return channel_id
+
+        dispatcher = OutboundDispatcher(send)
+        ok, failed = dispatcher.broadcast([1, 2], discord.Embed(title="alert"))
+        await dispatcher.drain()
+        assert ok.result() == 1
+        assert isinstance(failed.exception(), discord.DiscordException)
+        assert dispatcher.failed == 1
+    asyncio.run(main())
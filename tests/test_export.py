@@ -0,0 +1,99 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from bounty_hunter_mw2.database import export
+from bounty_hunter_mw2.database.models import Base, BotUser, Report, make_engine
+
+
+START = datetime(2024, 1, 1)
+PASSKEY_HASH = "secret-passkey-hash"
+
+
+async def export_parts(tmp_path, monkeypatch, kind, fmt, guild_id=100, **options):
+    engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'export.db'}")
+    rng = random.Random(0)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Report), [
+            {
+                "id": i,
+                "suspect_activision": f"Suspect#{i}",
+                "platform": "Xbox",
+                "timestamp": START + timedelta(minutes=i),
+                # Random text barely compresses, so the parts fill up quickly.
+                "message": rng.randbytes(60).hex(),
+                "admin_notes": "",
+                "guild_id": 100 if i % 4 else 200,
+                "bot_user_id": 10
+            }
+            for i in range(1, 401)
+        ])
+        await conn.execute(insert(BotUser), [
+            {"id": i, "guild_id": 100, "activision_id": f"User#{i}", "passkey_hash": PASSKEY_HASH}
+            for i in range(1, 31)
+        ])
+    monkeypatch.setattr(export, "AioSession", sessionmaker(engine, class_=AsyncSession))
+    monkeypatch.setattr(export, "CHUNK_SIZE", 10)
+    try:
+        parts = []
+        async for part in export.export_rows(kind, fmt, guild_id=guild_id, **options):
+            with part.file:
+                parts.append((part, part.file.read()))
+        return parts
+    finally:
+        await engine.dispose()
+
+
+def test_reports_are_split_into_parts_under_the_limit(tmp_path, monkeypatch):
+    parts = asyncio.run(export_parts(tmp_path, monkeypatch, "reports", "csv", max_part_bytes=6000))
+
+    assert len(parts) > 2
+    assert [part.filename.rsplit("-", 1)[1] for part, _ in parts] == [
+        f"part{number}.csv.gz" for number in range(1, len(parts) + 1)
+    ]
+    rows = []
+    for part, data in parts:
+        assert len(data) <= 6000
+        part_rows = list(csv.reader(io.StringIO(gzip.decompress(data).decode("utf-8"))))
+        assert part_rows[0] == export.REPORT_COLUMNS
+        assert len(part_rows) - 1 == part.rows
+        rows.extend(part_rows[1:])
+    assert [int(row[0]) for row in rows] == [i for i in range(1, 401) if i % 4]
+    assert rows[0][3] == (START + timedelta(minutes=1)).isoformat()
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_users_are_exported_without_passkey_hash(tmp_path, monkeypatch, fmt):
+    parts = asyncio.run(export_parts(tmp_path, monkeypatch, "users", fmt))
+
+    assert len(parts) == 1
+    part, data = parts[0]
+    text = gzip.decompress(data).decode("utf-8")
+    assert "passkey_hash" not in text
+    assert PASSKEY_HASH not in text
+    if fmt == "csv":
+        rows = list(csv.DictReader(io.StringIO(text)))
+    else:
+        rows = [json.loads(line) for line in text.splitlines()]
+        assert all(list(row) == export.BOT_USER_COLUMNS for row in rows)
+    assert part.rows == len(rows) == 30
+    assert [row["activision_id"] for row in rows] == [f"User#{i}" for i in range(1, 31)]
+
+
+def test_empty_export_still_yields_one_part(tmp_path, monkeypatch):
+    parts = asyncio.run(export_parts(tmp_path, monkeypatch, "reports", "csv", guild_id=300))
+
+    assert len(parts) == 1
+    part, data = parts[0]
+    assert part.rows == 0
+    assert gzip.decompress(data).decode("utf-8").splitlines() == [",".join(export.REPORT_COLUMNS)]
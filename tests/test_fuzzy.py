@@ -0,0 +1,31 @@
+from bounty_hunter_mw2.database.fuzzy import (
+    candidate_match, candidate_trigrams, rank, required_shared, similarity, trigrams
+)
+
+
+def test_rarest_trigrams_are_searched_within_the_budget():
+    counts = {"the": 90000, "sni": 300, "nip": 500, "ipe": 4000, "per": 20000, "zzz": 0}
+    assert candidate_trigrams(counts, budget=5000) == ["sni", "nip", "ipe"]
+    assert candidate_trigrams(counts, budget=10) == ["sni", "nip"]
+    assert candidate_trigrams(counts, budget=10 ** 6, most=4) == ["sni", "nip", "ipe", "per"]
+    assert candidate_trigrams({"zzz": 0}) == []
+
+
+def test_candidates_share_two_rare_trigrams():
+    assert candidate_match(["abc", "bcd", "cde"], 2) == (
+        '("abc" AND "bcd") OR ("abc" AND "cde") OR ("bcd" AND "cde")'
+    )
+    assert candidate_match(["abc", "bcd"], 1) == '"abc" OR "bcd"'
+    # sniper has 4 trigrams, a fifth of them rounds up to one.
+    assert required_shared("sniper", 0.2) == 1
+    assert required_shared("snipergod1", 0.2) == 2
+
+
+def test_rank_matches_similarity():
+    key = "snipergod"
+    rows = [(name, name.upper(), 1) for name in ("snipergod", "snlpergod", "sniperking", "xxgodxx", "abc")]
+    suggestions = rank(key, rows, 3, 0.2)
+    assert [s.name_key for s in suggestions] == ["snipergod", "snlpergod", "sniperking"]
+    assert [s.score for s in suggestions] == [similarity(key, s.name_key) for s in suggestions]
+    assert all(s.score >= 0.2 for s in rank(key, rows, 10, 0.2))
+    assert len(trigrams(key)) == 7
@@ -0,0 +1,95 @@
+import asyncio
+import os
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+# The settings module reads Config on import, which needs these to be set.
+for name, value in (("PERMISSIONS_INTEGER", "0"), ("APPLICATION_ID", "1"), ("OWNER", "1")):
+    os.environ.setdefault(name, value)
+
+from bounty_hunter_mw2.database.models import Base, GuildSettings, make_engine
+from bounty_hunter_mw2.helpers import guild_settings as guild_settings_module
+from bounty_hunter_mw2.helpers.cache import LRUCache
+from bounty_hunter_mw2.helpers.guild_settings import GuildSettingsCache
+from bounty_hunter_mw2.helpers.prefilter import CommandPrefilter
+
+
+def run_with_settings(tmp_path, monkeypatch, test):
+    async def main():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'settings.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        monkeypatch.setattr(
+            guild_settings_module, "AioSession", sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+        )
+        try:
+            await test(engine, GuildSettingsCache("!", 3, maxsize=10, ttl=300))
+        finally:
+            await engine.dispose()
+    asyncio.run(main())
+
+
+def test_updates_invalidate_the_cached_settings(tmp_path, monkeypatch):
+    async def test(engine, settings):
+        assert await settings.prefix(1) == "!"
+        # Guilds without a row are cached too, a change behind the cache's back is not seen.
+        async with engine.begin() as conn:
+            await conn.execute(GuildSettings.__table__.insert().values(guild_id=1, prefix="$"))
+        assert await settings.prefix(1) == "!"
+
+        await settings.update(1, prefix="?", report_threshold=5)
+        assert await settings.prefix(1) == "?"
+        assert await settings.report_threshold(1) == 5
+        await settings.update(1, prefix=None)
+        assert await settings.prefix(1) == "!"
+        assert await settings.report_threshold(1) == 5
+        assert await settings.prefix(None) == "!"
+        assert await settings.report_threshold(2) == 3
+
+    run_with_settings(tmp_path, monkeypatch, test)
+
+
+def test_entries_expire_after_the_ttl(tmp_path, monkeypatch):
+    async def test(engine, settings):
+        now = [0.0]
+        settings.settings = LRUCache(10, 60, clock=lambda: now[0])
+        await settings.update(1, prefix="?")
+        assert await settings.prefix(1) == "?"
+        # Another process of the cluster changed the prefix.
+        async with engine.begin() as conn:
+            await conn.execute(update(GuildSettings).where(GuildSettings.guild_id == 1).values(prefix="$"))
+        assert await settings.prefix(1) == "?"
+        now[0] = 61.0
+        assert await settings.prefix(1) == "$"
+
+    run_with_settings(tmp_path, monkeypatch, test)
+
+
+def test_unknown_settings_are_rejected(tmp_path, monkeypatch):
+    async def test(engine, settings):
+        with pytest.raises(ValueError):
+            await settings.update(1, passkey="1234")
+        assert await settings.prefix(1) == "!"
+
+    run_with_settings(tmp_path, monkeypatch, test)
+
+
+def test_new_prefixes_reach_the_prefilter(tmp_path, monkeypatch):
+    async def test(engine, settings):
+        prefilter = CommandPrefilter(await settings.prefixes_in_use())
+        prefilter.set_user(42)
+        assert not prefilter.matches("?report Sn1per")
+
+        await settings.update(1, prefix="?")
+        await settings.update(2, prefix="?")
+        await settings.update(3, prefix=">>")
+        assert sorted(await settings.prefixes_in_use()) == sorted(["!", "?", ">>"])
+        prefilter.set_prefixes(await settings.prefixes_in_use())
+        assert prefilter.matches("?report Sn1per")
+        assert prefilter.matches(">>help")
+        assert prefilter.matches("!help")
+
+    run_with_settings(tmp_path, monkeypatch, test)
@@ -0,0 +1,39 @@
+import asyncio
+
+import discord
+from discord.ext import commands
+
+from bounty_hunter_mw2.helpers.help import MAX_FIELDS, HelpCache
+
+
+def make_cog(name: str, count: int) -> commands.Cog:
+    async def callback(self, context):
+        pass
+
+    attributes = {
+        f"command{i}": commands.command(name=f"{name}{i}", description="Look up a suspect by their Activision ID and show every report.")(callback)
+        for i in range(count)
+    }
+    return type(name.capitalize(), (commands.Cog,), attributes, name=name)()
+
+
+def test_pages_stay_within_embed_limits_and_are_cached():
+    async def main():
+        bot = commands.Bot(command_prefix="!", intents=discord.Intents.default())
+        await bot.add_cog(make_cog("general", 5))
+        await bot.add_cog(make_cog("reports", 400))
+        cache = HelpCache()
+        pages = cache.get(bot, "!")
+        assert len(pages) > 1
+        assert all(len(page) <= 6000 and len(page.fields) <= MAX_FIELDS for page in pages)
+        assert all(len(field.value) <= 1024 for page in pages for field in page.fields)
+        listed = sum(field.value.count("\n") + 1 for page in pages for field in page.fields)
+        assert listed == 405
+        assert pages[-1].footer.text == f"Page {len(pages)}/{len(pages)}"
+        assert cache.get(bot, "!") is pages
+        assert cache.get(bot, "?") is not pages
+        cache.invalidate()
+        await bot.remove_cog("reports")
+        assert len(cache.get(bot, "!")) == 1
+        assert cache.renders == 3
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from bounty_hunter_mw2.helpers.http import CircuitOpen, HttpClient, HttpError
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class StubServer(object):
+    """
+    A local HTTP server standing in for an upstream API, /price answers slowly and /broken fails.
+    """
+    def __init__(self):
+        self.hits = {"price": 0, "broken": 0}
+        self.runner = None
+        self.url = None
+
+    async def price(self, request):
+        self.hits["price"] += 1
+        await asyncio.sleep(0.05)
+        return web.json_response({"usd": 42, "currency": request.query.get("currency")}, content_type="application/javascript")
+
+    async def broken(self, request):
+        self.hits["broken"] += 1
+        return web.Response(status=503)
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get("/price", self.price)
+        app.router.add_get("/broken", self.broken)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.runner.cleanup()
+
+
+def test_concurrent_requests_share_one_fetch_and_are_cached():
+    async def main():
+        clock = FakeClock()
+        client = HttpClient(ttl=60, clock=clock)
+        async with StubServer() as server:
+            results = await asyncio.gather(*(client.get_json(f"{server.url}/price") for _ in range(20)))
+            assert all(result == {"usd": 42, "currency": None} for result in results)
+            assert server.hits["price"] == 1
+            assert client.coalesced == 19
+            await client.get_json(f"{server.url}/price")
+            assert server.hits["price"] == 1
+            await client.get_json(f"{server.url}/price", params={"currency": "EUR"})
+            assert server.hits["price"] == 2
+            clock.now = 61
+            await client.get_json(f"{server.url}/price")
+            assert server.hits["price"] == 3
+            await client.close()
+    asyncio.run(main())
+
+
+def test_failing_host_opens_the_circuit_until_reset():
+    async def main():
+        clock = FakeClock()
+        client = HttpClient(failure_threshold=3, reset_after=30, clock=clock)
+        async with StubServer() as server:
+            for _ in range(3):
+                with pytest.raises(HttpError) as error:
+                    await client.get_json(f"{server.url}/broken")
+                assert error.value.status == 503
+            with pytest.raises(CircuitOpen):
+                await client.get_json(f"{server.url}/price")
+            assert server.hits == {"price": 0, "broken": 3}
+            assert client.stats()["open_circuits"] == [server.url.split("//")[1]]
+            clock.now = 30
+            assert await client.get_json(f"{server.url}/price") == {"usd": 42, "currency": None}
+            assert client.stats()["open_circuits"] == []
+            await client.close()
+    asyncio.run(main())
+
+
+def test_cancelling_the_first_caller_does_not_fail_the_others():
+    async def main():
+        client = HttpClient(ttl=60)
+        async with StubServer() as server:
+            leader = asyncio.create_task(client.get_json(f"{server.url}/price"))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(client.get_json(f"{server.url}/price"))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            assert await follower == {"usd": 42, "currency": None}
+            assert leader.cancelled()
+            assert server.hits["price"] == 1
+            assert client.coalesced == 1
+            assert not client._inflight
+            await client.close()
+    asyncio.run(main())
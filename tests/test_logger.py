@@ -0,0 +1,86 @@
+import json
+import logging
+import queue
+
+import pytest
+
+from bounty_hunter_mw2.helpers.logger import (
+    JsonFormatter, LoggingFormatter, LoopSafeQueueHandler, setup_logging
+)
+
+
+@pytest.fixture
+def logger(request):
+    logger = logging.getLogger(f"test_logger.{request.node.name}")
+    logger.propagate = False
+    yield logger
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+
+
+def test_json_records_reach_the_file_through_the_listener(tmp_path, logger):
+    filename = tmp_path / "bot.log"
+    listener = setup_logging(logger, filename=str(filename), json_lines=True)
+    try:
+        members = ["alice"]
+        logger.info("Guild %s has %s", "Bounty", members)
+        # The message is merged on the calling thread, later changes to the arguments do not show up.
+        members.append("bob")
+        logger.debug("Below the level of the logger")
+        try:
+            raise ValueError("broken \"quote\"")
+        except ValueError:
+            logger.exception("Report failed for %s", "Sn1per#1234")
+    finally:
+        listener.stop()
+
+    entries = [json.loads(line) for line in filename.read_text(encoding="utf-8").splitlines()]
+    assert [entry["level"] for entry in entries] == ["INFO", "ERROR"]
+    assert entries[0]["message"] == "Guild Bounty has ['alice']"
+    assert entries[0]["name"] == logger.name
+    assert "exception" not in entries[0]
+    assert entries[1]["message"] == "Report failed for Sn1per#1234"
+    assert entries[1]["exception"].endswith('ValueError: broken "quote"')
+
+
+def test_plain_text_log_file(tmp_path, logger):
+    filename = tmp_path / "bot.log"
+    listener = setup_logging(logger, filename=str(filename), level=logging.WARNING)
+    try:
+        logger.info("Not written")
+        logger.warning("Watchdog saw a %dms stall", 250)
+    finally:
+        listener.stop()
+
+    lines = filename.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    assert lines[0].endswith(f"] [WARNING ] {logger.name}: Watchdog saw a 250ms stall")
+
+
+def test_prepare_leaves_the_original_record_alone():
+    handler = LoopSafeQueueHandler(queue.SimpleQueue())
+    record = logging.LogRecord("bot", logging.INFO, __file__, 1, "%s reports", ("3",), None)
+    prepared = handler.prepare(record)
+    assert prepared is not record
+    assert (prepared.msg, prepared.args) == ("3 reports", None)
+    assert (record.msg, record.args) == ("%s reports", ("3",))
+
+
+def test_console_formatter_builds_one_formatter_per_level():
+    formatter = LoggingFormatter()
+    assert set(formatter.formatters) == set(LoggingFormatter.COLORS)
+    cached = dict(formatter.formatters)
+
+    info = logging.LogRecord("bot", logging.INFO, __file__, 1, "ready", None, None)
+    custom = logging.LogRecord("bot", 25, __file__, 1, "custom", None, None)
+    assert LoggingFormatter.blue + LoggingFormatter.bold + "INFO" in formatter.format(info)
+    # Levels without a color fall back to the uncolored format.
+    assert LoggingFormatter.reset + "Level 25" in formatter.format(custom)
+    assert formatter.formatters == cached
+
+
+def test_json_formatter_output_is_valid_json():
+    record = logging.LogRecord("bot", logging.WARNING, __file__, 1, "line\nbreak é", None, None)
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "line\nbreak é"
+    assert entry["level"] == "WARNING"
@@ -0,0 +1,56 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+
+from bounty_hunter_mw2.helpers.members import MemberCache, UserResolver
+
+
+class FakeClient(object):
+    """
+    Fetches users with a delay, like a round trip to Discord, and tracks how many fetches run at once.
+    """
+    def __init__(self):
+        self.running = 0
+        self.most_running = 0
+        self.fetched = []
+
+    def get_user(self, user_id):
+        return None
+
+    async def fetch_user(self, user_id):
+        self.running += 1
+        self.most_running = max(self.most_running, self.running)
+        try:
+            await asyncio.sleep(0.01)
+            self.fetched.append(user_id)
+            if user_id % 10 == 0:
+                raise discord.NotFound(SimpleNamespace(status=404, reason="Not Found"), "Unknown User")
+            return SimpleNamespace(id=user_id)
+        finally:
+            self.running -= 1
+
+
+def test_users_are_fetched_concurrently_and_cached():
+    async def main():
+        client = FakeClient()
+        resolver = UserResolver(concurrency=8)
+        users = await resolver.resolve(client, range(1, 101))
+        assert len(users) == 100
+        assert users[7].id == 7
+        assert users[10] is None
+        assert client.most_running == 8
+        assert len(client.fetched) == 100
+        users = await resolver.resolve(client, range(1, 101))
+        assert users[10] is None and users[11].id == 11
+        assert len(client.fetched) == 100
+    asyncio.run(main())
+
+
+def test_members_are_forgotten_when_they_leave():
+    cache = MemberCache(maxsize=10)
+    for guild_id, user_id in ((1, 10), (1, 11), (2, 10)):
+        cache.touch(SimpleNamespace(id=user_id, guild=SimpleNamespace(id=guild_id)))
+    assert cache.per_guild() == {1: 2, 2: 1}
+    cache.forget(1, 10)
+    assert cache.per_guild() == {1: 1, 2: 1}
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from bounty_hunter_mw2.database.models import Base, Blacklist
+from bounty_hunter_mw2.database.writer import WriteBehindQueue
+from bounty_hunter_mw2.helpers.metrics import CommandTimings, current_timings, instrument_engine, metrics
+
+
+def test_failed_statements_do_not_skew_the_db_time():
+    async def main():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        instrument_engine(engine)
+        timings = CommandTimings()
+        current_timings.set(timings)
+        async with engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                await conn.exec_driver_sql("SELECT * FROM missing_table")
+            failed = timings.db
+            assert failed > 0
+            await conn.exec_driver_sql("SELECT 1")
+            assert 0 < timings.db - failed < 0.1
+            assert not any(key.startswith("query") for key in conn.sync_connection.info)
+        await engine.dispose()
+    asyncio.run(main())
+
+
+def test_tasks_spawned_by_a_command_are_not_timed_with_it():
+    async def main():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        instrument_engine(engine)
+        queue = WriteBehindQueue(sessionmaker(engine, expire_on_commit=False, class_=AsyncSession), max_delay=0.01)
+
+        async def command():
+            timings = metrics.start_command()
+            # The first row starts the worker from inside the command.
+            await queue.submit(Blacklist(user_id=1))
+            return timings
+
+        timings = await asyncio.create_task(command())
+        assert current_timings.get() is None
+        assert timings.db == 0.0
+        await queue.submit(Blacklist(user_id=2))
+        assert timings.db == 0.0
+        await queue.drain()
+        await engine.dispose()
+    asyncio.run(main())
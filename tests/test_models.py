@@ -0,0 +1,55 @@
+import asyncio
+
+from sqlalchemy import text
+
+from bounty_hunter_mw2.database.models import make_engine
+
+
+async def pragmas(conn) -> dict:
+    return {
+        name: await conn.scalar(text(f"PRAGMA {name}"))
+        for name in ("journal_mode", "busy_timeout", "synchronous", "cache_size", "temp_store")
+    }
+
+
+def test_every_pooled_connection_gets_the_pragmas(tmp_path):
+    async def main():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}", cache_size_kib=4096, busy_timeout_ms=1234)
+        try:
+            # Both connections are held at once, so the second one is a new connection, not the first reused.
+            async with engine.connect() as first, engine.connect() as second:
+                assert first.sync_connection.connection.dbapi_connection is not \
+                    second.sync_connection.connection.dbapi_connection
+                for conn in (first, second):
+                    assert await pragmas(conn) == {
+                        "journal_mode": "wal",
+                        "busy_timeout": 1234,
+                        # NORMAL
+                        "synchronous": 1,
+                        "cache_size": -4096,
+                        # MEMORY
+                        "temp_store": 2
+                    }
+
+                # In WAL mode a reader is not blocked by an open write transaction.
+                await first.execute(text("CREATE TABLE t (x INTEGER)"))
+                await first.commit()
+                await first.execute(text("INSERT INTO t VALUES (1)"))
+                assert await second.scalar(text("SELECT count(*) FROM t")) == 0
+                await first.commit()
+                assert await second.scalar(text("SELECT count(*) FROM t")) == 1
+        finally:
+            await engine.dispose()
+    asyncio.run(main())
+
+
+def test_wal_can_be_turned_off(tmp_path):
+    async def main():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}", wal=False)
+        try:
+            async with engine.connect() as conn:
+                assert await conn.scalar(text("PRAGMA journal_mode")) == "delete"
+                assert await conn.scalar(text("PRAGMA synchronous")) == 1
+        finally:
+            await engine.dispose()
+    asyncio.run(main())
@@ -0,0 +1,20 @@
+from bounty_hunter_mw2.helpers.prefilter import CommandPrefilter
+
+
+def test_everything_passes_until_the_bot_user_is_known():
+    prefilter = CommandPrefilter(["!"])
+    assert prefilter.matches("just chatting")
+
+
+def test_only_prefixes_and_mentions_pass():
+    prefilter = CommandPrefilter(["!"])
+    prefilter.set_user(42)
+    assert prefilter.matches("!ping")
+    assert prefilter.matches("<@42> ping")
+    assert prefilter.matches("<@!42> ping")
+    assert not prefilter.matches("ping")
+    assert not prefilter.matches("<@43> ping")
+    assert not prefilter.matches("")
+    prefilter.set_prefixes(["?"])
+    assert prefilter.matches("?ping")
+    assert not prefilter.matches("!ping")
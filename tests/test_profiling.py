@@ -0,0 +1,43 @@
+import asyncio
+import time
+import tracemalloc
+
+from bounty_hunter_mw2.helpers.profiling import MemoryProfiler, sample_cpu
+
+
+def spin(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_cpu_profile_finds_the_busy_function():
+    async def main():
+        async def work():
+            for _ in range(10):
+                spin(0.03)
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(work())
+        profile = await sample_cpu(0.3)
+        await task
+        assert profile.samples > 10
+        (_, _, name), _ = profile.self_counts.most_common(1)[0]
+        assert name == "spin"
+    asyncio.run(main())
+
+
+def test_memory_diff_shows_what_grew_and_tracing_stops():
+    async def main():
+        profiler = MemoryProfiler()
+        first, _ = await profiler.capture(0, keep_tracing=True)
+        retained = [bytearray(1024) for _ in range(500)]
+        second, _ = await profiler.capture(0)
+        report = profiler.diff(first, second)
+        assert "test_profiling.py" in report.splitlines()[2]
+        assert tracemalloc.is_tracing()
+        profiler.stop()
+        assert not tracemalloc.is_tracing()
+        assert profiler.snapshot_ids() == []
+        del retained
+    asyncio.run(main())
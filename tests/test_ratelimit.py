@@ -0,0 +1,47 @@
+from bounty_hunter_mw2.helpers.ratelimit import Limit, RateLimiter, TokenBuckets
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_user_bucket_refills_over_time():
+    clock = FakeClock()
+    limiter = RateLimiter(user=Limit(2, 10), clock=clock)
+    assert limiter.hit(1, None).remaining == 1
+    assert limiter.hit(1, None).allowed
+    decision = limiter.hit(1, None)
+    assert not decision.allowed
+    assert decision.scope == "user"
+    assert decision.retry_after == 5
+    assert limiter.hit(2, None).allowed
+    clock.now = 5
+    assert limiter.hit(1, None).allowed
+
+
+def test_rejected_use_takes_no_tokens_from_other_scopes():
+    clock = FakeClock()
+    limiter = RateLimiter(user=Limit(1, 60), guild=Limit(3, 60), clock=clock)
+    assert limiter.hit(1, 100).allowed
+    assert not limiter.hit(1, 100).allowed
+    assert limiter.hit(2, 100).allowed
+    assert limiter.hit(3, 100).allowed
+    decision = limiter.hit(4, 100)
+    assert not decision.allowed
+    assert decision.scope == "guild"
+
+
+def test_idle_buckets_are_evicted():
+    clock = FakeClock()
+    buckets = TokenBuckets(Limit(5, 10), clock, sweep_every=1000)
+    for user_id in range(100):
+        buckets.take(user_id, buckets.peek(user_id, clock.now), clock.now)
+    clock.now = 10
+    buckets.take(100, 5.0, clock.now)
+    buckets.sweep()
+    assert len(buckets) == 1
+    assert buckets.evicted == 100
@@ -0,0 +1,11 @@
+from bounty_hunter_mw2.database.retention import MAX_ATTACHED, archive_batches
+
+
+def test_archives_are_attached_in_groups_newest_first():
+    months = [f"{2020 + i // 12}-{i % 12 + 1:02d}" for i in range(20)]
+    groups = archive_batches(months)
+    assert [len(group) for group in groups] == [MAX_ATTACHED, MAX_ATTACHED, 2]
+    assert groups[0][-1] == "2021-08"
+    assert groups[-1] == ["2020-01", "2020-02"]
+    assert sum(groups[::-1], []) == months
+    assert archive_batches([]) == []
@@ -0,0 +1,95 @@
+import asyncio
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from bounty_hunter_mw2.database import scoring
+from bounty_hunter_mw2.database.models import Base, BotUser, Report, make_engine, normalize_activision
+from bounty_hunter_mw2.database.scoring import compute_scores, to_report_columns
+
+
+# Real Discord IDs are above 2**53, where consecutive integers are no longer distinct as float64.
+ALICE = 1100000000000000001
+BOB = 1100000000000000002
+CAROL = 1100000000000000003
+
+
+def test_snowflake_ids_survive_the_columns():
+    now = 1_000_000.0
+    rows = [
+        (ALICE, BOB, 2, str(int(now))),
+        (CAROL, BOB, 2, str(int(now))),
+        (ALICE, -1, 1, str(int(now - 86400)))
+    ]
+    columns = to_report_columns(rows, now)
+    assert columns.reporter.dtype == np.int64
+    assert columns.reporter.tolist() == [ALICE, CAROL, ALICE]
+    assert columns.suspect_user.tolist() == [BOB, BOB, -1]
+    assert columns.corroborated.tolist() == [1.0, 1.0, 0.0]
+    assert columns.age_days.tolist() == [0.0, 0.0, 1.0]
+
+    user_ids = np.array([ALICE, BOB, CAROL], dtype=np.int64)
+    trust, notoriety = compute_scores(
+        user_ids,
+        np.full(3, 0.5),
+        np.ones(3, dtype=bool),
+        columns,
+        half_life_days=1.0
+    )
+    # Alice had one of two reports corroborated, Carol the only one they made, Bob made none.
+    assert trust.tolist() == [0.5, 0.5, 2 / 3]
+    assert notoriety.tolist() == [0.0, 0.5 + 2 / 3, 0.0]
+
+
+def test_no_rows():
+    columns = to_report_columns([], 0.0)
+    assert len(columns.reporter) == 0
+    assert columns.reporter.dtype == np.int64
+
+
+def test_look_alike_ids_do_not_count_a_report_twice(tmp_path, monkeypatch):
+    # Both IDs normalize to the same key, the report against it must only be counted once.
+    assert normalize_activision("Sn1per#1234") == normalize_activision("SNIPER#5678")
+
+    async def main():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'scores.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(BotUser), [
+                {"id": user_id, "activision_id": activision_id, "activision_key": normalize_activision(activision_id)}
+                for user_id, activision_id in ((BOB, "SNIPER#5678"), (ALICE, "Sn1per#1234"), (CAROL, "Carol#1"))
+            ])
+            await conn.execute(insert(Report), [{
+                "id": 1,
+                "suspect_activision": "Sn1per#1234",
+                "suspect_key": normalize_activision("Sn1per#1234"),
+                "platform": "Xbox",
+                "timestamp": datetime.utcnow(),
+                "message": "",
+                "admin_notes": "",
+                "guild_id": 100,
+                "bot_user_id": CAROL
+            }])
+        monkeypatch.setattr(scoring, "AioSession", sessionmaker(engine, class_=AsyncSession))
+        try:
+            assert await scoring.run_scoring("full") == 3
+            async with engine.connect() as conn:
+                scores = {
+                    user_id: (trust, notoriety)
+                    for user_id, trust, notoriety in await conn.execute(
+                        select(BotUser.id, BotUser.trust_rating, BotUser.notoriety)
+                    )
+                }
+        finally:
+            await engine.dispose()
+
+        # Carol made one uncorroborated report, it lands on one of the look-alikes only.
+        assert scores[CAROL] == (pytest.approx(1 / 3), 0.0)
+        assert scores[ALICE][1] == pytest.approx(1 / 3, rel=1e-3)
+        assert scores[BOB][1] == 0.0
+
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from bounty_hunter_mw2.database import search
+from bounty_hunter_mw2.database.models import Base, Report, make_engine
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("spin", '"spin"*'),
+    ("spin bot", '"spin" "bot"*'),
+    ("  Sn1per#1234 ", '"Sn1per" "1234"*'),
+    ('aim" OR message:*', '"aim" "OR" "message"*'),
+    ("NEAR(wall hack)", '"NEAR" "wall" "hack"*'),
+    ("élan", '"élan"*'),
+])
+def test_build_match_quotes_every_word_and_prefixes_the_last(query, expected):
+    assert search.build_match(query) == expected
+
+
+@pytest.mark.parametrize("query", ["", "   ", "!!!", '"*()-:^'])
+def test_build_match_without_words_returns_none(query):
+    assert search.build_match(query) is None
+
+
+def test_admin_notes_are_not_searchable_and_old_indexes_are_replaced(tmp_path, monkeypatch):
+    async def main():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'reports.db'}")
+        async with engine.begin() as conn:
+            # An index from before admin notes were dropped from it.
+            await conn.execute(text(
+                "CREATE VIRTUAL TABLE report_fts USING fts5("
+                "suspect_activision, message, admin_notes, content='report', content_rowid='id')"
+            ))
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(Report), [{
+                "id": 1,
+                "suspect_activision": "Sn1per#1234",
+                "platform": "Xbox",
+                "timestamp": datetime.utcnow(),
+                "message": "wallhacks all game",
+                "admin_notes": "banned by moderator",
+                "guild_id": 100,
+                "bot_user_id": 10
+            }])
+        monkeypatch.setattr(search, "AioSession", sessionmaker(engine, class_=AsyncSession))
+        try:
+            assert (await search.search_reports("wallhack", guild_id=100))[1] == 1
+            assert (await search.search_reports("moderator", guild_id=100))[1] == 0
+            assert (await search.search_reports("wallhack", guild_id=200))[1] == 0
+        finally:
+            await engine.dispose()
+
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from bounty_hunter_mw2.database import retention, summary
+from bounty_hunter_mw2.database.models import Base, Report, SuspectSummary, make_engine
+
+
+NOW = datetime.utcnow()
+
+
+def report(report_id: int, days_ago: int, bot_user_id: int, guild_id: int, platform: str = "Xbox") -> dict:
+    return {
+        "id": report_id,
+        "suspect_activision": "Sn1per#1234",
+        "suspect_key": "snlper",
+        "platform": platform,
+        "timestamp": NOW - timedelta(days=days_ago),
+        "message": "",
+        "admin_notes": "",
+        "guild_id": guild_id,
+        "bot_user_id": bot_user_id
+    }
+
+
+async def suspect(conn) -> SuspectSummary:
+    return (await conn.execute(select(SuspectSummary.__table__))).one()
+
+
+def test_archived_reports_stay_counted_through_check_and_rebuild(tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    (tmp_path / "archive").mkdir()
+
+    async def main():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'reports.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(Report), [
+                report(1, 400, bot_user_id=10, guild_id=100),
+                report(2, 390, bot_user_id=11, guild_id=101),
+                report(3, 10, bot_user_id=12, guild_id=100, platform="Playstation")
+            ])
+        async with engine.connect() as conn:
+            while await retention.archive_batch(conn, NOW - timedelta(days=365), 1):
+                pass
+            assert (await conn.scalar(select(Report.id))) == 3
+            assert (await suspect(conn)).report_count == 3
+            await conn.commit()
+
+            # Reporter 11 and guild 101 only have archived reports left, they are not new.
+            async with engine.begin() as writer:
+                await writer.execute(insert(Report), [report(4, 0, bot_user_id=11, guild_id=101)])
+            row = await suspect(conn)
+            await conn.commit()
+            assert (row.report_count, row.distinct_reporters, row.distinct_guilds) == (4, 3, 2)
+            assert (row.xbox_count, row.playstation_count) == (3, 1)
+            assert row.first_seen == NOW - timedelta(days=400)
+
+            assert await summary.find_mismatches(conn) == []
+            assert await summary.rebuild(conn) == 1
+            assert await suspect(conn) == row
+            assert await summary.find_mismatches(conn) == []
+
+            async with engine.begin() as writer:
+                await writer.exec_driver_sql("UPDATE suspect_summary SET report_count = 2")
+                await writer.exec_driver_sql("DELETE FROM suspect_guild WHERE guild_id = 101")
+            assert await summary.find_mismatches(conn) == ["snlper"]
+            await summary.rebuild(conn)
+            assert await suspect(conn) == row
+        await engine.dispose()
+    asyncio.run(main())
+
+
+def test_triggers_match_a_rebuild_after_inserts_and_deletes(tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "ARCHIVE_DIR", str(tmp_path / "archive"))
+
+    async def main():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'reports.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(Report), [
+                {**report(i, days_ago=i, bot_user_id=10 + i % 3, guild_id=100 + i % 2, platform=platform),
+                 "suspect_key": key}
+                for i, (key, platform) in enumerate([
+                    ("snlper", "Xbox"), ("snlper", "Playstation"), ("snlper", None), ("ghost", "Battle.net"),
+                    ("snlper", "Xbox"), ("ghost", "Unknown"), ("snlper", "Battle.net"), ("lone", "Xbox")
+                ])
+            ])
+        async with engine.begin() as conn:
+            # The first and the last report of snlper, and the only one of lone.
+            await conn.exec_driver_sql("DELETE FROM report WHERE id IN (0, 6, 7)")
+
+        async with engine.connect() as conn:
+            maintained = (await conn.execute(
+                select(SuspectSummary.__table__).order_by(SuspectSummary.suspect_key)
+            )).all()
+            await conn.commit()
+            assert [row.suspect_key for row in maintained] == ["ghost", "snlper"]
+            assert await summary.find_mismatches(conn) == []
+            assert await summary.rebuild(conn) == 2
+            rebuilt = (await conn.execute(
+                select(SuspectSummary.__table__).order_by(SuspectSummary.suspect_key)
+            )).all()
+            assert rebuilt == maintained
+        await engine.dispose()
+    asyncio.run(main())
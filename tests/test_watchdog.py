@@ -0,0 +1,23 @@
+import asyncio
+import logging
+import time
+
+from bounty_hunter_mw2.helpers.watchdog import LoopWatchdog
+
+
+def block_the_loop():
+    time.sleep(0.3)
+
+
+def test_blocking_call_is_captured_with_its_stack():
+    async def main():
+        watchdog = LoopWatchdog(logging.getLogger("test"), interval=0.02, threshold=0.1)
+        watchdog.start()
+        await asyncio.sleep(0.1)
+        block_the_loop()
+        await asyncio.sleep(0.1)
+        watchdog.stop()
+        assert any("block_the_loop" in stall.stack for stall in watchdog.stalls)
+        assert watchdog.max_lag >= 0.25
+        assert watchdog.lag.count >= 5
+    asyncio.run(main())
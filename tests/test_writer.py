@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from bounty_hunter_mw2.database.models import Base, Blacklist, make_engine
+from bounty_hunter_mw2.database.writer import WriteBehindQueue
+
+
+async def open_queue(tmp_path, **options):
+    engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'writes.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    return engine, sessions, WriteBehindQueue(sessions, **options)
+
+
+async def stored(sessions) -> int:
+    async with sessions() as session:
+        return await session.scalar(select(func.count()).select_from(Blacklist))
+
+
+def test_rows_submitted_together_are_committed_in_one_batch(tmp_path):
+    async def main():
+        engine, sessions, queue = await open_queue(tmp_path, max_batch=3, max_delay=0.05)
+        rows = await asyncio.gather(*(queue.submit(Blacklist(user_id=i)) for i in range(7)))
+        assert [row.user_id for row in rows] == list(range(7))
+        assert (queue.flushes, queue.rows_written) == (3, 7)
+        assert await stored(sessions) == 7
+        await queue.drain()
+        await engine.dispose()
+    asyncio.run(main())
+
+
+def test_a_failing_row_only_fails_its_own_caller(tmp_path):
+    async def main():
+        engine, sessions, queue = await open_queue(tmp_path, max_delay=0.05)
+        await queue.submit(Blacklist(user_id=1))
+        results = await asyncio.gather(
+            queue.submit(Blacklist(user_id=2)),
+            queue.submit(Blacklist(user_id=1)),
+            queue.submit(Blacklist(user_id=3)),
+            return_exceptions=True
+        )
+        assert [row.user_id for row in (results[0], results[2])] == [2, 3]
+        assert isinstance(results[1], IntegrityError)
+        assert await stored(sessions) == 3
+        await queue.drain()
+        await engine.dispose()
+    asyncio.run(main())
+
+
+def test_drain_commits_the_pending_rows_and_closes_the_queue(tmp_path):
+    async def main():
+        engine, sessions, queue = await open_queue(tmp_path, max_batch=2, max_delay=10.0)
+        futures = [queue.submit(Blacklist(user_id=i)) for i in range(5)]
+        await queue.drain()
+        assert all(future.done() and future.exception() is None for future in futures)
+        assert await stored(sessions) == 5
+        with pytest.raises(RuntimeError):
+            queue.submit(Blacklist(user_id=6))
+        await engine.dispose()
+    asyncio.run(main())